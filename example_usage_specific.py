@@ -1,4 +1,12 @@
 from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.output_specs import (
+    INSURANCE_PRODUCT_ANALYSIS,
+    INSURANCE_PRODUCT_JUDGE,
+    INSURANCE_PRODUCT_KEYWORDS,
+    INSURANCE_PRODUCT_REVIEWS,
+    INSURANCE_PRODUCT_SALES_PITCH,
+    INSURANCE_PRODUCT_SWITCH_PITCH
+)
 from src.chat.get_prompt import (
     get_insurance_product_keywords_prompt,
     get_insurance_product_analysis_prompt,
@@ -8,12 +16,12 @@ from src.chat.get_prompt import (
     get_insurance_product_switch_pitch_prompt,
     get_web_research_summarize_prompt
 )
+from src.webscraping.web_scraping import WebScraper
+from src.websearch.replay_search import ReplaySearchEngine
 from src.websearch.web_search import WebSearch
 from src.tiktoken import count_tokens
-import json
 from dotenv import load_dotenv
 import os
-import time
 
 # 開発対象
 # 1. 特定の情報源から指定された形式で情報を取得する機能
@@ -39,43 +47,44 @@ def main():
     # OpenAIアダプターとWebSearchのインスタンスを作成
     openai = OpenaiAdapter()
     web_search = WebSearch(default_engine="google")
+    # config.iniのllm_modeがrecordの場合は検索結果とスクレイピングで取得したHTMLも記録し、
+    # replayの場合は記録済みのものを使用する（ネットワークに接続せずに計測できる。HTMLの解析と変換は実際に実行）。
+    # LLMの応答と同じfixture_dirのストアに記録・再生する
+    if openai.mode == "record":
+        web_search.fixture_recorder = openai.fixture_store
+        web_search.scraper = WebScraper(fixture_recorder=openai.fixture_store)
+    elif openai.mode == "replay":
+        web_search.register_engine("replay", ReplaySearchEngine(openai.fixture_store, latency_profile="recorded"))
+        web_search.default_engine = "replay"
+        web_search.scraper = WebScraper(replay_store=openai.fixture_store, replay_latency_profile="recorded")
     # web_search.scraper = WebScraper(verify_ssl=False)  # SSL検証を無効化
     
     print("チャットボットを起動しました。終了するには 'quit' と入力してください。")
     
     while True:
-        start_time_total = time.time()
-        
         # ユーザー入力を受け取る
         user_input = input("\nユーザー: ")
         
         # 終了コマンドの確認
         if user_input.lower() == 'quit':
             print("チャットボットを終了します。")
+            openai.close()
             break
         
+        # このターンの呼び出しごとの時間とトークン数を集計
+        turn = openai.start_turn()
+        
         # 個別の保険商品に関する質問かどうかを判定
-        start_time = time.time()
-        judge_response = openai.openai_chat(
-            openai_model="gpt-4o",
+        judge_result = openai.openai_chat_structured(
+            spec=INSURANCE_PRODUCT_JUDGE,
+            stage="judge",
             prompt=get_insurance_product_judge_prompt() + f"\n\nユーザーの入力: {user_input}"
         )
-        print(f"\n商品判定処理時間: {time.time() - start_time:.2f}秒")
         
-        # 判断結果の解析
-        is_insurance_product_query = False
-        if "<decision>" in judge_response and "</decision>" in judge_response:
-            decision_start = judge_response.find("<decision>") + len("<decision>")
-            decision_end = judge_response.find("</decision>")
-            decision = judge_response[decision_start:decision_end].strip()
-            is_insurance_product_query = decision == "1"
-            
-            # 判断理由の表示（オプション）
-            if "<reasoning>" in judge_response and "</reasoning>" in judge_response:
-                reasoning_start = judge_response.find("<reasoning>") + len("<reasoning>")
-                reasoning_end = judge_response.find("</reasoning>")
-                reasoning = judge_response[reasoning_start:reasoning_end].strip()
-                # print(f"\n判断理由: {reasoning}")
+        # 判断結果（判定に失敗した場合は個別の保険商品ではないものとして扱う）
+        is_insurance_product_query = bool(judge_result) and judge_result["decision"]
+        # if judge_result:
+        #     print(f"\n判断理由: {judge_result['reasoning']}")
         
         if not is_insurance_product_query:
             print("\n個別の保険商品を入力してください。")
@@ -84,31 +93,25 @@ def main():
         print("\n保険商品の分析を開始します")
         
         # 検索キーワードを生成
-        start_time = time.time()
-        keywords_response = openai.openai_chat(
-            openai_model="gpt-4o",
+        keywords_list = openai.openai_chat_structured(
+            spec=INSURANCE_PRODUCT_KEYWORDS,
+            stage="keywords",
             prompt=get_insurance_product_keywords_prompt() + f"\n\nユーザーの質問: {user_input}"
         )
-        print(f"キーワード生成処理時間: {time.time() - start_time:.2f}秒")
         
         try:
-            # キーワードの抽出
-            keywords_start = keywords_response.find("[")
-            keywords_end = keywords_response.find("]") + 1
-            if keywords_start != -1 and keywords_end != -1:
-                keywords_list = json.loads(keywords_response[keywords_start:keywords_end])
-                if keywords_list:
-                    keyword = keywords_list[0]  # 最初のキーワードのみを使用
-                    # print(f"\n生成された検索キーワード: {keyword}")
-                    
-                    # Web検索を実行
-                    start_time = time.time()
-                    scrape_options = {
-                        "save_json": False,
-                        "save_markdown": False,
-                        "exclude_links": True, # リンクを除外
-                        "max_depth": 20
-                    }
+            if keywords_list:
+                keyword = keywords_list[0]  # 最初のキーワードのみを使用
+                # print(f"\n生成された検索キーワード: {keyword}")
+                
+                # Web検索を実行
+                scrape_options = {
+                    "save_json": False,
+                    "save_markdown": False,
+                    "exclude_links": True, # リンクを除外
+                    "max_depth": 20
+                }
+                with turn.span("web_search"):
                     search_result = web_search.search_and_standardize(
                         keyword,
                         scrape_urls=True,
@@ -116,226 +119,170 @@ def main():
                         max_results=5,
                         custom_search_engine_id=custom_search_engine_id
                     )
-                    print(f"Web検索処理時間: {time.time() - start_time:.2f}秒")
-                    
-                    # 検索結果の整理
-                    research_content = f"検索キーワード: {keyword}\n\n"
-                    current_chunk = research_content
-                    intermediate_summaries = []
-                    
-                    if search_result.get("scraped_data"):
-                        for url, data in search_result["scraped_data"].items():
-                            if data and "markdown_data" in data:
-                                new_content = f"\n---\nURL: {url}\n{data['markdown_data']}\n"
-                                # トークン数を計算
-                                if count_tokens(current_chunk + new_content) > 30000:
-                                    # 現在のチャンクを中間要約
-                                    intermediate_summary = openai.openai_chat(
-                                        openai_model="gpt-4o",
-                                        prompt=get_web_research_summarize_prompt() + f"\n\n{current_chunk}"
-                                    )
-                                    intermediate_summaries.append(intermediate_summary)
-                                    # 新しいチャンクを開始
-                                    current_chunk = new_content
-                                else:
-                                    current_chunk += new_content
+                
+                # 検索結果の整理
+                research_content = f"検索キーワード: {keyword}\n\n"
+                current_chunk = research_content
+                chunks = []
+                
+                if search_result.get("scraped_data"):
+                    for url, data in search_result["scraped_data"].items():
+                        if data and "markdown_data" in data:
+                            new_content = f"\n---\nURL: {url}\n{data['markdown_data']}\n"
+                            # トークン数を計算
+                            if count_tokens(current_chunk + new_content) > 30000:
+                                # 現在のチャンクを確定し、新しいチャンクを開始
+                                chunks.append(current_chunk)
+                                current_chunk = new_content
+                            else:
+                                current_chunk += new_content
+                
+                # 最後のチャンクを確定
+                if current_chunk:
+                    chunks.append(current_chunk)
+                
+                # 各チャンクの中間要約は互いに依存しないため、同時に実行
+                intermediate_summaries = openai.openai_chat_many([
+                    {
+                        "prompt": get_web_research_summarize_prompt() + f"\n\n{chunk}",
+                        "stage": "summarize"
+                    }
+                    for chunk in chunks
+                ])
+                
+                # すべての中間要約を結合
+                combined_research = "\n\n".join(intermediate_summaries)
+                
+                # 保険商品の分析
+                analysis_data = openai.openai_chat_structured(
+                    spec=INSURANCE_PRODUCT_ANALYSIS,
+                    stage="analysis",
+                    prompt=get_insurance_product_analysis_prompt() + f"\n\n{combined_research}"
+                )
+                
+                if analysis_data:
+                    # print("\n分析結果:")
+                    # print(f"保険会社: {analysis_data['company']}")
+                    # print(f"商品名: {analysis_data['product_name']}")
+                    # print(f"保険種別: {analysis_data['category']}")
                     
-                    # 最後のチャンクを処理
-                    if current_chunk:
-                        intermediate_summary = openai.openai_chat(
-                            openai_model="gpt-4o",
-                            prompt=get_web_research_summarize_prompt() + f"\n\n{current_chunk}"
+                    # 口コミの検索と分析
+                    # print("\n(口コミ情報の収集を開始します)")
+                    product_name = analysis_data["product_name"]
+                    if product_name:
+                        review_keyword = f"{product_name} 口コミ"
+                        # print(f"\n生成された検索キーワード: {review_keyword}")
+                        
+                        # 口コミのWeb検索を実行
+                        with turn.span("review_search"):
+                            review_search_result = web_search.search_and_standardize(
+                                review_keyword,
+                                scrape_urls=True,
+                                scrape_options=scrape_options,
+                                max_results=10,
+                                custom_search_engine_id=custom_search_engine_id
+                            )
+                        
+                        # 検索結果の整理
+                        review_content = f"検索キーワード: {review_keyword}\n\n"
+                        current_chunk = review_content
+                        chunks = []
+                        
+                        if review_search_result.get("scraped_data"):
+                            for url, data in review_search_result["scraped_data"].items():
+                                if data and "markdown_data" in data:
+                                    new_content = f"\n---\nURL: {url}\n{data['markdown_data']}\n"
+                                    # トークン数を計算
+                                    if count_tokens(current_chunk + new_content) > 30000:
+                                        # 現在のチャンクを確定し、新しいチャンクを開始
+                                        chunks.append(current_chunk)
+                                        current_chunk = new_content
+                                    else:
+                                        current_chunk += new_content
+                        
+                        # 最後のチャンクを確定
+                        if current_chunk:
+                            chunks.append(current_chunk)
+                        
+                        # 各チャンクの中間要約は互いに依存しないため、同時に実行
+                        intermediate_summaries = openai.openai_chat_many([
+                            {
+                                "prompt": get_web_research_summarize_prompt() + f"\n\n{chunk}",
+                                "stage": "summarize"
+                            }
+                            for chunk in chunks
+                        ])
+                        
+                        # すべての中間要約を結合
+                        combined_reviews = "\n\n".join(intermediate_summaries)
+                        
+                        # 口コミの分析
+                        reviews_data = openai.openai_chat_structured(
+                            spec=INSURANCE_PRODUCT_REVIEWS,
+                            stage="reviews",
+                            prompt=get_insurance_product_reviews_prompt() + f"\n\n{combined_reviews}"
                         )
-                        intermediate_summaries.append(intermediate_summary)
-                    
-                    # すべての中間要約を結合
-                    combined_research = "\n\n".join(intermediate_summaries)
-                    
-                    # 保険商品の分析
-                    start_time = time.time()
-                    analysis_response = openai.openai_chat(
-                        openai_model="gpt-4o",
-                        prompt=get_insurance_product_analysis_prompt() + f"\n\n{combined_research}"
-                    )
-                    print(f"商品分析処理時間: {time.time() - start_time:.2f}秒")
-                    
-                    # 分析結果の解析
-                    if "<analysis>" in analysis_response and "</analysis>" in analysis_response:
-                        analysis_start = analysis_response.find("<analysis>") + len("<analysis>")
-                        analysis_end = analysis_response.find("</analysis>")
-                        analysis_json = analysis_response[analysis_start:analysis_end].strip()
-                        try:
-                            analysis_data = json.loads(analysis_json)
-                            # print("\n分析結果:")
-                            # print(f"保険会社: {analysis_data.get('company', 'unknown')}")
-                            # print(f"商品名: {analysis_data.get('product_name', 'unknown')}")
-                            # print(f"保険種別: {analysis_data.get('category', 'unknown')}")
+                        
+                        if reviews_data:
+                            # 販売トークと乗り換えトークは互いに依存しないため、同時に生成
+                            sales_pitch_data, switch_pitch_data = openai.openai_chat_many([
+                                {
+                                    "spec": INSURANCE_PRODUCT_SALES_PITCH,
+                                    "stage": "pitch",
+                                    "prompt": get_insurance_product_sales_pitch_prompt() + f"\n\n商品情報:\n{combined_research}\n\n強み:\n" + "\n".join([f"・{s}" for s in reviews_data["strengths"]])
+                                },
+                                {
+                                    "spec": INSURANCE_PRODUCT_SWITCH_PITCH,
+                                    "stage": "pitch",
+                                    "prompt": get_insurance_product_switch_pitch_prompt() + f"\n\n商品情報:\n{combined_research}\n\n弱み:\n" + "\n".join([f"・{w}" for w in reviews_data["weaknesses"]])
+                                }
+                            ])
                             
-                            # 口コミの検索と分析
-                            # print("\n(口コミ情報の収集を開始します)")
-                            product_name = analysis_data.get('product_name', '')
-                            if product_name:
-                                review_keyword = f"{product_name} 口コミ"
-                                # print(f"\n生成された検索キーワード: {review_keyword}")
-                                
-                                # 口コミのWeb検索を実行
-                                start_time = time.time()
-                                review_search_result = web_search.search_and_standardize(
-                                    review_keyword,
-                                    scrape_urls=True,
-                                    scrape_options=scrape_options,
-                                    max_results=10,
-                                    custom_search_engine_id=custom_search_engine_id
-                                )
-                                print(f"口コミ検索処理時間: {time.time() - start_time:.2f}秒")
-                                
-                                # 検索結果の整理
-                                review_content = f"検索キーワード: {review_keyword}\n\n"
-                                current_chunk = review_content
-                                intermediate_summaries = []
+                            if not sales_pitch_data:
+                                print("\nエラー: 販売トークの解析に失敗しました。")
+                            elif not switch_pitch_data:
+                                print("\nエラー: 乗り換えトークの解析に失敗しました。")
+                            else:
+                                # 結果を整形して表示
+                                print(f"\n{keyword}について検索しました。")
+                                print(f"商品名：{analysis_data['product_name'] or '不明'}")
+                                print(f"会社名：{analysis_data['company'] or '不明'}")
+                                print("\n【口コミ】")
+                                for review in reviews_data["reviews"]:
+                                    print(f"・内容：{review['content']}")
+                                    print(f"  情報源：{review['source']}")
+                                    print(f"  感情：{review['sentiment']}\n")
                                 
-                                if review_search_result.get("scraped_data"):
-                                    for url, data in review_search_result["scraped_data"].items():
-                                        if data and "markdown_data" in data:
-                                            new_content = f"\n---\nURL: {url}\n{data['markdown_data']}\n"
-                                            # トークン数を計算
-                                            if count_tokens(current_chunk + new_content) > 30000:
-                                                # 現在のチャンクを中間要約
-                                                intermediate_summary = openai.openai_chat(
-                                                    openai_model="gpt-4o",
-                                                    prompt=get_web_research_summarize_prompt() + f"\n\n{current_chunk}"
-                                                )
-                                                intermediate_summaries.append(intermediate_summary)
-                                                # 新しいチャンクを開始
-                                                current_chunk = new_content
-                                            else:
-                                                current_chunk += new_content
+                                print("\n【強み】")
+                                for strength in reviews_data["strengths"]:
+                                    print(f"・{strength}")
                                 
-                                # 最後のチャンクを処理
-                                if current_chunk:
-                                    intermediate_summary = openai.openai_chat(
-                                        openai_model="gpt-4o",
-                                        prompt=get_web_research_summarize_prompt() + f"\n\n{current_chunk}"
-                                    )
-                                    intermediate_summaries.append(intermediate_summary)
+                                print("\n【弱み】")
+                                for weakness in reviews_data["weaknesses"]:
+                                    print(f"・{weakness}")
                                 
-                                # すべての中間要約を結合
-                                combined_reviews = "\n\n".join(intermediate_summaries)
+                                print("\n【強みを生かした販売トーク】")
+                                print(f"{sales_pitch_data['pitch']}")
                                 
-                                # 口コミの分析
-                                start_time = time.time()
-                                reviews_response = openai.openai_chat(
-                                    openai_model="gpt-4o",
-                                    prompt=get_insurance_product_reviews_prompt() + f"\n\n{combined_reviews}"
-                                )
-                                print(f"口コミ分析処理時間: {time.time() - start_time:.2f}秒")
+                                print("\n【弱みを使った乗換トーク】")
+                                print(f"{switch_pitch_data['pitch']}")
                                 
-                                # 分析結果の解析
-                                if "<analysis>" in reviews_response and "</analysis>" in reviews_response:
-                                    analysis_start = reviews_response.find("<analysis>") + len("<analysis>")
-                                    analysis_end = reviews_response.find("</analysis>")
-                                    reviews_json = reviews_response[analysis_start:analysis_end].strip()
-                                    try:
-                                        reviews_data = json.loads(reviews_json)
-                                        # print("\n口コミ分析結果:")
-                                        # print("\n【口コミ情報】")
-                                        for review in reviews_data.get("reviews", []):
-                                            # print(f"・内容：{review.get('content', '')}")
-                                            # print(f"  情報源：{review.get('source', '')}")
-                                            # print(f"  感情：{review.get('sentiment', '')}\n")
-                                            pass
-                                        
-                                        # print("\n【強み】")
-                                        for strength in reviews_data.get("strengths", []):
-                                            # print(f"・{strength}")
-                                            pass
-                                        
-                                        # print("\n【弱み】")
-                                        for weakness in reviews_data.get("weaknesses", []):
-                                            # print(f"・{weakness}")
-                                            pass
-
-                                        # 販売トークの生成
-                                        start_time = time.time()
-                                        sales_pitch_response = openai.openai_chat(
-                                            openai_model="gpt-4o",
-                                            prompt=get_insurance_product_sales_pitch_prompt() + f"\n\n商品情報:\n{combined_research}\n\n強み:\n" + "\n".join([f"・{s}" for s in reviews_data.get("strengths", [])])
-                                        )
-                                        print(f"販売トーク生成処理時間: {time.time() - start_time:.2f}秒")
-
-                                        if "<sales_pitch>" in sales_pitch_response and "</sales_pitch>" in sales_pitch_response:
-                                            pitch_start = sales_pitch_response.find("<sales_pitch>") + len("<sales_pitch>")
-                                            pitch_end = sales_pitch_response.find("</sales_pitch>")
-                                            sales_pitch_json = sales_pitch_response[pitch_start:pitch_end].strip()
-                                            try:
-                                                sales_pitch_data = json.loads(sales_pitch_json)
-                                                # print("\n【販売トーク】")
-                                                # print(f"\n{sales_pitch_data.get('pitch', '')}")
-                                            except json.JSONDecodeError:
-                                                print("\nエラー: 販売トークの解析に失敗しました。")
-
-                                        # 乗り換えトークの生成
-                                        start_time = time.time()
-                                        switch_pitch_response = openai.openai_chat(
-                                            openai_model="gpt-4o",
-                                            prompt=get_insurance_product_switch_pitch_prompt() + f"\n\n商品情報:\n{combined_research}\n\n弱み:\n" + "\n".join([f"・{w}" for w in reviews_data.get("weaknesses", [])])
-                                        )
-                                        print(f"乗り換えトーク生成処理時間: {time.time() - start_time:.2f}秒")
-
-                                        if "<switch_pitch>" in switch_pitch_response and "</switch_pitch>" in switch_pitch_response:
-                                            switch_start = switch_pitch_response.find("<switch_pitch>") + len("<switch_pitch>")
-                                            switch_end = switch_pitch_response.find("</switch_pitch>")
-                                            switch_pitch_json = switch_pitch_response[switch_start:switch_end].strip()
-                                            try:
-                                                switch_pitch_data = json.loads(switch_pitch_json)
-                                                # print("\n【乗り換えトーク】")
-                                                # print(f"\n{switch_pitch_data.get('pitch', '')}")
-                                                
-                                                # 結果を整形して表示
-                                                print(f"\n{keyword}について検索しました。")
-                                                print(f"商品名：{analysis_data.get('product_name', '不明')}")
-                                                print(f"会社名：{analysis_data.get('company', '不明')}")
-                                                print("\n【口コミ】")
-                                                for review in reviews_data.get("reviews", []):
-                                                    print(f"・内容：{review.get('content', '')}")
-                                                    print(f"  情報源：{review.get('source', '')}")
-                                                    print(f"  感情：{review.get('sentiment', '')}\n")
-                                                
-                                                print("\n【強み】")
-                                                for strength in reviews_data.get("strengths", []):
-                                                    print(f"・{strength}")
-                                                
-                                                print("\n【弱み】")
-                                                for weakness in reviews_data.get("weaknesses", []):
-                                                    print(f"・{weakness}")
-                                                
-                                                print("\n【強みを生かした販売トーク】")
-                                                print(f"{sales_pitch_data.get('pitch', '')}")
-                                                
-                                                print("\n【弱みを使った乗換トーク】")
-                                                print(f"{switch_pitch_data.get('pitch', '')}")
-                                                
-                                                print("\n注意書き：商品の誹謗中傷はやめましょう。")
-                                                print(f"\n総処理時間: {time.time() - start_time_total:.2f}秒")
-                                            except json.JSONDecodeError:
-                                                print("\nエラー: 乗り換えトークの解析に失敗しました。")
-
-                                    except json.JSONDecodeError:
-                                        print("\nエラー: 口コミ分析結果の解析に失敗しました。")
-                                else:
-                                    print("\nエラー: 口コミ分析結果の形式が不正です。")
-                            else:
-                                print("\nエラー: 商品名が取得できなかったため、口コミ検索をスキップします。")
-                        except json.JSONDecodeError:
-                            print("\nエラー: 分析結果の解析に失敗しました。")
+                                print("\n注意書き：商品の誹謗中傷はやめましょう。")
+                                turn.finish()
+                                print(f"\n{turn.report()}")
+                        else:
+                            print("\nエラー: 口コミ分析結果の解析に失敗しました。")
                     else:
-                        print("\nエラー: 分析結果の形式が不正です。")
+                        print("\nエラー: 商品名が取得できなかったため、口コミ検索をスキップします。")
                 else:
-                    print("\nエラー: 検索キーワードの生成に失敗しました。")
-        except json.JSONDecodeError:
-            print("\nエラー: 検索キーワードの解析に失敗しました。")
+                    print("\nエラー: 分析結果の解析に失敗しました。")
+            else:
+                print("\nエラー: 検索キーワードの生成に失敗しました。")
         except Exception as e:
             print(f"\nエラー: 処理中にエラーが発生しました: {str(e)}")
+    
+    # パイプライン実行で使用したスクレイピングのスレッドプールと、検索エンジンのクライアントを終了
+    web_search.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,304 @@
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from src.chat.retry_policy import ChatError, truncation_error
+from src.replay.fixture_store import FixtureStore
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# バッチが終了したことを表す状態
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def make_batch_line(custom_id, request):
+    """
+    Batch APIの入力ファイル（JSONL）の1行を生成します。
+
+    Args:
+        custom_id (str): 結果と対応付けるためのID
+        request (dict): リクエストの内容（model, messages, temperature など）
+
+    Returns:
+        dict: JSONLの1行の内容
+    """
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": request}
+
+
+def parse_batch_output(text):
+    """
+    Batch APIの出力ファイル（JSONL）をcustom_idごとの結果に変換します。
+
+    Args:
+        text (str): 出力ファイル（またはエラーファイル）の内容
+
+    Returns:
+        dict: custom_id -> 応答のテキスト（失敗した場合はChatError）
+    """
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        custom_id = item.get("custom_id")
+        response = item.get("response") or {}
+        error = item.get("error")
+        status_code = response.get("status_code")
+        if error or status_code != 200:
+            error = error or (response.get("body") or {}).get("error") or {}
+            results[custom_id] = ChatError(
+                kind=error.get("code") or "batch",
+                message=error.get("message") or f"バッチのリクエストが失敗しました（status: {status_code}）",
+                status_code=status_code,
+            )
+            continue
+        choice = response["body"]["choices"][0]
+        if choice.get("finish_reason") == "length":
+            results[custom_id] = truncation_error(response["body"].get("max_completion_tokens"))
+            continue
+        results[custom_id] = choice["message"]["content"]
+    return results
+
+
+class BatchJob:
+    """
+    OpenAIのBatch APIで、対話的な応答が不要な大量の呼び出しをまとめて実行するクラス。
+    リクエストをJSONLファイルに書き出して送信し、完了するまで状態を確認してから、
+    結果をcustom_idで元のリクエストに対応付けます（通常の呼び出しより料金が安く、レート制限の枠も別）。
+    clientにはOpenAIクライアント、またはローカルで動作を確認するためのLocalBatchClientを指定します。
+    """
+
+    def __init__(self, client, work_dir=".cache/batches", poll_interval=30.0, completion_window="24h"):
+        """
+        Args:
+            client: files, batchesを持つクライアント（OpenAIまたはLocalBatchClient）
+            work_dir (str): 入力ファイル（JSONL）を書き出すディレクトリ
+            poll_interval (float): 状態を確認する間隔（秒）
+            completion_window (str): 完了までの期限
+        """
+        self.client = client
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+
+    def write_requests(self, requests, path=None):
+        """
+        リクエストをJSONLファイルに書き出します。
+
+        Args:
+            requests (dict): custom_id -> リクエストの内容
+            path (str, optional): 書き出すファイルのパス。指定がない場合はwork_dir内に作成
+
+        Returns:
+            str: 書き出したファイルのパス
+        """
+        if not requests:
+            raise ValueError("requestsが空です。")
+        if path is None:
+            os.makedirs(self.work_dir, exist_ok=True)
+            path = os.path.join(self.work_dir, f"batch_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for custom_id, request in requests.items():
+                f.write(json.dumps(make_batch_line(custom_id, request), ensure_ascii=False) + "\n")
+        return path
+
+    def submit(self, path, metadata=None):
+        """
+        入力ファイルをアップロードし、バッチを作成します。
+
+        Args:
+            path (str): 入力ファイル（JSONL）のパス
+            metadata (dict, optional): バッチに付与するメタデータ
+
+        Returns:
+            str: バッチのID
+        """
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        params = {
+            "input_file_id": input_file.id,
+            "endpoint": BATCH_ENDPOINT,
+            "completion_window": self.completion_window,
+        }
+        if metadata:
+            params["metadata"] = metadata
+        batch = self.client.batches.create(**params)
+        print(f"バッチを送信しました: {batch.id}（{path}）")
+        return batch.id
+
+    def wait(self, batch_id, timeout=None):
+        """
+        バッチが終了するまで状態を確認します。
+
+        Args:
+            batch_id (str): バッチのID
+            timeout (float, optional): 待機する最大の秒数。指定がない場合は終了するまで待機
+
+        Returns:
+            バッチの情報（status, output_file_id, error_file_id などを含む）
+
+        Raises:
+            TimeoutError: timeout秒を過ぎても終了しない場合
+        """
+        start_time = time.monotonic()
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL_STATUSES:
+                return batch
+            if timeout is not None and time.monotonic() - start_time > timeout:
+                raise TimeoutError(f"バッチが{timeout}秒以内に終了しませんでした: {batch_id}（{batch.status}）")
+            time.sleep(self.poll_interval)
+
+    def results(self, batch):
+        """
+        終了したバッチの結果を取得します。
+
+        Args:
+            batch: waitが返したバッチの情報
+
+        Returns:
+            dict: custom_id -> 応答のテキスト（失敗した場合はChatError）
+        """
+        results = {}
+        # 期限切れ・キャンセルの場合も、完了したリクエストの結果は出力ファイルに含まれる
+        for file_id in (getattr(batch, "output_file_id", None), getattr(batch, "error_file_id", None)):
+            if file_id:
+                results.update(parse_batch_output(self.client.files.content(file_id).text))
+        return results
+
+    def run(self, requests, timeout=None, metadata=None):
+        """
+        リクエストを書き出して送信し、終了まで待機して結果を返します。
+
+        Args:
+            requests (dict): custom_id -> リクエストの内容
+            timeout (float, optional): 待機する最大の秒数
+            metadata (dict, optional): バッチに付与するメタデータ
+
+        Returns:
+            dict: custom_id -> 応答のテキスト。結果がないリクエストはChatError
+        """
+        batch_id = self.submit(self.write_requests(requests), metadata=metadata)
+        batch = self.wait(batch_id, timeout=timeout)
+        print(f"バッチが終了しました: {batch_id}（{batch.status}）")
+        results = self.results(batch)
+        for custom_id in requests:
+            if custom_id not in results:
+                results[custom_id] = ChatError(
+                    kind=batch.status,
+                    message=f"バッチの結果がありません（{batch.status}）",
+                )
+        return results
+
+
+class LocalBatchClient:
+    """
+    Batch APIのローカルでの代替（オフラインでの動作確認用）。
+    OpenAIクライアントのfiles.create, files.content, batches.create, batches.retrieveと同じ呼び出し方で、
+    各リクエストにresponderで応答し、processing_time秒後に完了したものとして扱います。
+    """
+
+    def __init__(self, responder=None, fixture_store=None, processing_time=0.0):
+        """
+        Args:
+            responder (callable, optional): リクエストの内容（body）を受け取り、応答のテキストを返す関数。
+                指定がない場合は記録済みの応答（フィクスチャ）を返す
+            fixture_store (FixtureStore, optional): responderの指定がない場合に使用するストア。
+                指定がない場合は "fixtures" ディレクトリ
+            processing_time (float): バッチが完了するまでの秒数
+        """
+        if responder is None:
+            fixture_store = fixture_store or FixtureStore()
+            responder = lambda body: fixture_store.require("chat", body)["response"]
+        self.responder = responder
+        self.processing_time = processing_time
+        self._files = {}
+        self._batches = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}-local-{next(self._ids)}"
+
+    def _create_file(self, file, purpose):
+        content = file.read()
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        file_id = self._new_id("file")
+        self._files[file_id] = content
+        return SimpleNamespace(id=file_id, purpose=purpose, bytes=len(content))
+
+    def _file_content(self, file_id):
+        if file_id not in self._files:
+            raise KeyError(f"ファイルが存在しません: {file_id}")
+        content = self._files[file_id]
+        return SimpleNamespace(text=content, content=content.encode("utf-8"))
+
+    def _create_batch(self, input_file_id, endpoint, completion_window, metadata=None):
+        if endpoint != BATCH_ENDPOINT:
+            raise ValueError(f"endpointには {BATCH_ENDPOINT} を指定してください。")
+        batch = SimpleNamespace(
+            id=self._new_id("batch"),
+            status="in_progress",
+            input_file_id=input_file_id,
+            endpoint=endpoint,
+            completion_window=completion_window,
+            metadata=metadata,
+            output_file_id=None,
+            error_file_id=None,
+            request_counts=SimpleNamespace(total=0, completed=0, failed=0),
+            created_at=time.time(),
+        )
+        self._batches[batch.id] = batch
+        return batch
+
+    def _retrieve_batch(self, batch_id):
+        batch = self._batches[batch_id]
+        if batch.status == "in_progress" and time.time() - batch.created_at >= self.processing_time:
+            self._process(batch)
+        return batch
+
+    def _process(self, batch):
+        """入力ファイルの各リクエストに応答し、出力ファイルとエラーファイルを作成する"""
+        outputs, errors = [], []
+        for line in self._files[batch.input_file_id].splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            result = {"id": self._new_id("batch_req"), "custom_id": item["custom_id"]}
+            try:
+                text = self.responder(item["body"])
+            except Exception as error:
+                result["response"] = None
+                result["error"] = {"code": type(error).__name__, "message": str(error)}
+                errors.append(result)
+                continue
+            result["response"] = {
+                "status_code": 200,
+                "body": {
+                    "model": item["body"].get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+                },
+            }
+            result["error"] = None
+            outputs.append(result)
+
+        batch.request_counts = SimpleNamespace(
+            total=len(outputs) + len(errors), completed=len(outputs), failed=len(errors)
+        )
+        if outputs:
+            batch.output_file_id = self._store_output(outputs)
+        if errors:
+            batch.error_file_id = self._store_output(errors)
+        batch.status = "completed"
+
+    def _store_output(self, lines):
+        file_id = self._new_id("file")
+        self._files[file_id] = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+        return file_id
@@ -0,0 +1,311 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 段階の指定がない呼び出しの段階名
+DEFAULT_STAGE = "chat"
+
+
+class CallRecord:
+    """
+    LLMの呼び出し1回分の計測結果。
+    段階名、モデル、トークン数、待機時間、最初のトークンまでの時間、全体の時間、再試行の回数を記録します。
+    """
+
+    def __init__(self, stage, model, streaming=False):
+        """
+        Args:
+            stage (str): 処理段階の名前（judge, keywords, summarize など）
+            model (str): モデル名
+            streaming (bool): ストリーミングでの呼び出しかどうか
+        """
+        self.stage = stage or DEFAULT_STAGE
+        self.model = model
+        self.streaming = streaming
+        # api: APIを呼び出した / cache: 応答のキャッシュ / replay: 記録済みの応答 / batch: Batch API
+        self.source = "api"
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        # RPM/TPMの制御と同時実行数の枠を待った時間の合計（秒）
+        self.queue_time = 0.0
+        self.time_to_first_token = None
+        self.latency = None
+        self.attempts = 0
+        self.success = False
+        self.error_kind = None
+        self.started_at = time.time()
+        self._start_time = time.monotonic()
+
+    @property
+    def retries(self):
+        """再試行の回数"""
+        return max(self.attempts - 1, 0)
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def set_usage(self, usage):
+        """
+        応答で報告された使用量を記録します。
+
+        Args:
+            usage: APIの応答のusage（Noneの場合は記録しない）
+        """
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        self.cached_tokens = getattr(details, "cached_tokens", 0) or 0
+
+    def mark_first_token(self):
+        """最初のトークンを受信した時点を記録する"""
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.monotonic() - self._start_time
+
+    def finish(self, error_kind=None):
+        """
+        呼び出しの終了を記録します。
+
+        Args:
+            error_kind (str, optional): 失敗した場合のエラーの種類
+        """
+        self.latency = time.monotonic() - self._start_time
+        self.success = error_kind is None
+        self.error_kind = error_kind
+
+    def to_dict(self):
+        """計測結果を辞書形式で返します。"""
+        return {
+            "stage": self.stage,
+            "model": self.model,
+            "source": self.source,
+            "streaming": self.streaming,
+            "success": self.success,
+            "error_kind": self.error_kind,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "queue_time": self.queue_time,
+            "time_to_first_token": self.time_to_first_token,
+            "latency": self.latency,
+            "retries": self.retries,
+            "started_at": self.started_at,
+        }
+
+
+class TelemetrySink:
+    """
+    計測結果の送信先の基底クラス。何もしないシンクとしても利用できます。
+    """
+
+    def record(self, record):
+        """
+        呼び出し1回分の計測結果を受け取ります。
+
+        Args:
+            record (CallRecord): 計測結果
+        """
+        pass
+
+
+class CallbackTelemetrySink(TelemetrySink):
+    """計測結果を任意のコールバック関数に渡すシンク"""
+
+    def __init__(self, callback):
+        """
+        Args:
+            callback (callable): 計測結果（CallRecord）を受け取る関数
+        """
+        self.callback = callback
+
+    def record(self, record):
+        self.callback(record)
+
+
+class LoggingTelemetrySink(TelemetrySink):
+    """計測結果をloggingで出力するシンク"""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        """
+        Args:
+            logger (logging.Logger, optional): 出力先のロガー
+            level (int): ログレベル
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def record(self, record):
+        ttft = f" ttft={record.time_to_first_token:.3f}s" if record.time_to_first_token is not None else ""
+        self.logger.log(
+            self.level,
+            f"LLM呼び出し計測: stage={record.stage} model={record.model} source={record.source} "
+            f"success={record.success} latency={record.latency:.3f}s queue={record.queue_time:.3f}s{ttft} "
+            f"prompt={record.prompt_tokens} cached={record.cached_tokens} completion={record.completion_tokens} "
+            f"retries={record.retries}"
+        )
+
+
+class JsonlTelemetrySink(TelemetrySink):
+    """計測結果をJSONL形式でファイルに追記するシンク（後から段階ごとのコストを集計する場合に使用）"""
+
+    def __init__(self, path=".cache/llm_telemetry.jsonl"):
+        """
+        Args:
+            path (str): 出力先のファイルのパス
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, record):
+        line = json.dumps(record.to_dict(), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class TurnTelemetry(TelemetrySink):
+    """
+    1ターン（ユーザーの1回の入力に対する処理）の計測結果を集計するシンク。
+    OpenaiAdapter.start_turnで開始すると、終了するまでの呼び出しの計測結果を受け取ります。
+    Web検索などLLM以外の処理の時間はspanで記録します。
+    """
+
+    def __init__(self):
+        self.records = []
+        self.spans = {}
+        self.wall_time = None
+        self._start_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.wall_time is not None
+
+    def record(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    @contextmanager
+    def span(self, name):
+        """
+        with文で囲んだ処理の所要時間を、指定の名前で記録します。
+
+        Args:
+            name (str): 処理の名前（web_search など）
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.monotonic() - start)
+
+    def add_span(self, name, seconds):
+        """
+        LLM以外の処理の所要時間を、指定の名前に加算します（with文で囲めない処理の場合に使用）。
+
+        Args:
+            name (str): 処理の名前
+            seconds (float): 所要時間（秒）
+        """
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def finish(self):
+        """ターンの終了を記録します（2回目以降の呼び出しは無視）"""
+        if self.wall_time is None:
+            self.wall_time = time.monotonic() - self._start_time
+
+    def summary(self):
+        """
+        段階ごとの集計結果を返します。
+
+        Returns:
+            dict: stages（段階名 -> 呼び出し回数、キャッシュ・記録済みの応答の回数、失敗の回数、トークン数、
+                  待機時間・全体の時間の合計と最大、最初のトークンまでの時間、再試行の回数。最初に呼び出した順）、
+                  spans（LLM以外の処理の時間）、total（全段階の合計）、wall_time（ターン全体の秒数）
+        """
+        with self._lock:
+            records = list(self.records)
+            spans = dict(self.spans)
+        stages = {}
+        total = _empty_stage()
+        for record in records:
+            stage = stages.setdefault(record.stage, _empty_stage())
+            for item in (stage, total):
+                item["calls"] += 1
+                item["models"].add(record.model)
+                item["reused"] += record.source in ("cache", "replay")
+                item["failures"] += not record.success
+                item["prompt_tokens"] += record.prompt_tokens
+                item["completion_tokens"] += record.completion_tokens
+                item["cached_tokens"] += record.cached_tokens
+                item["queue_time"] += record.queue_time
+                item["latency"] += record.latency or 0.0
+                item["max_latency"] = max(item["max_latency"], record.latency or 0.0)
+                item["retries"] += record.retries
+                if record.time_to_first_token is not None and item["time_to_first_token"] is None:
+                    item["time_to_first_token"] = record.time_to_first_token
+        wall_time = self.wall_time if self.wall_time is not None else time.monotonic() - self._start_time
+        return {"stages": stages, "spans": spans, "total": total, "wall_time": wall_time}
+
+    def report(self):
+        """
+        集計結果を表示用の文字列で返します。
+        同時に実行した呼び出しは時間が重なるため、段階ごとの時間の合計はターン全体の時間を超えることがあります。
+
+        Returns:
+            str: 段階ごとの時間とトークン数、合計
+        """
+        summary = self.summary()
+        lines = ["【処理時間の内訳】"]
+        for name, stage in summary["stages"].items():
+            calls = f"{stage['calls']}回" + (f"（うち再利用 {stage['reused']}回）" if stage["reused"] else "")
+            line = (
+                f"{name}: {', '.join(sorted(stage['models']))} {calls} "
+                f"{stage['latency']:.2f}秒（最大 {stage['max_latency']:.2f}秒, 待機 {stage['queue_time']:.2f}秒）"
+            )
+            if stage["time_to_first_token"] is not None:
+                line += f" 最初のトークンまで {stage['time_to_first_token']:.2f}秒"
+            line += f" 入力 {stage['prompt_tokens']}（キャッシュ {stage['cached_tokens']}）/ 出力 {stage['completion_tokens']}トークン"
+            if stage["retries"]:
+                line += f" 再試行 {stage['retries']}回"
+            if stage["failures"]:
+                line += f" 失敗 {stage['failures']}回"
+            lines.append(line)
+        for name, seconds in summary["spans"].items():
+            lines.append(f"{name}: {seconds:.2f}秒")
+
+        total = summary["total"]
+        cached_ratio = total["cached_tokens"] / total["prompt_tokens"] if total["prompt_tokens"] else 0.0
+        lines.append(
+            f"合計: LLM呼び出し {total['calls']}回, 入力 {total['prompt_tokens']}トークン"
+            f"（キャッシュ {cached_ratio:.0%}）/ 出力 {total['completion_tokens']}トークン, "
+            f"総処理時間 {summary['wall_time']:.2f}秒"
+        )
+        return "\n".join(lines)
+
+
+def _empty_stage():
+    return {
+        "calls": 0,
+        "models": set(),
+        "reused": 0,
+        "failures": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "queue_time": 0.0,
+        "latency": 0.0,
+        "max_latency": 0.0,
+        "time_to_first_token": None,
+        "retries": 0,
+    }
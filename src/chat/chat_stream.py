@@ -0,0 +1,188 @@
+import time
+from src.chat.retry_policy import ChatError, TruncatedResponseError
+
+
+class _StreamState:
+    """ChatStreamとAsyncChatStreamで共通の、受信したテキストと時間の記録"""
+
+    def __init__(self, on_delta=None):
+        self.on_delta = on_delta
+        self.time_to_first_token = None
+        self.total_time = None
+        self.error = None
+        # 応答の終了の理由（"stop": 最後まで受信 / "length": トークン数の上限で打ち切られた / None: エラー・中断）
+        self.finish_reason = None
+        self.completed = False
+        self._parts = []
+        self._start_time = None
+
+    def _start(self):
+        if self._start_time is None:
+            self._start_time = time.monotonic()
+
+    def _receive(self, delta):
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.monotonic() - self._start_time
+        self._parts.append(delta)
+        if self.on_delta is not None:
+            self.on_delta(delta)
+
+    def _finish(self, error=None):
+        if self.completed:
+            return
+        self.completed = True
+        self.total_time = time.monotonic() - self._start_time
+        if error is not None:
+            print(f"GPT呼び出し時にエラーが発生しました:{error}")
+        if isinstance(error, TruncatedResponseError):
+            # 打ち切られた応答は、ストリームでない呼び出しと同じく種類が"length"のChatErrorとする
+            self.finish_reason = "length"
+            error = error.result
+        self.error = error
+
+    def _complete(self):
+        """最後まで受信した場合の終了"""
+        self.finish_reason = "stop"
+        self._finish()
+
+    @property
+    def text(self):
+        """
+        受信したテキスト。トークン数の上限で打ち切られた場合、またはエラーで何も受信できなかった場合は
+        ChatError（偽と評価される空文字列）。打ち切られた場合に受信した分はpartial_textで参照できます
+        """
+        if isinstance(self.error, ChatError):
+            return self.error
+        if self.error is not None and not self._parts:
+            return ChatError.from_exception(self.error)
+        return self.partial_text
+
+    @property
+    def partial_text(self):
+        """エラーや打ち切りの有無にかかわらず、受信したテキスト"""
+        return "".join(self._parts)
+
+    def stats(self):
+        """
+        応答時間を返します。
+
+        Returns:
+            dict: time_to_first_token（最初のトークンまでの秒数）、total_time（全体の秒数）、
+                  chars（受信した文字数）
+        """
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "total_time": self.total_time,
+            "chars": sum(len(part) for part in self._parts),
+        }
+
+
+class ChatStream(_StreamState):
+    """
+    LLMの応答を差分（トークン）単位で受け取るイテレータ。
+    for文で差分を順に受け取り、終了後はtextで全文、stats()で最初のトークンまでの時間と
+    全体の時間を参照できます。エラーが発生した場合は例外を送出せずに終了し、errorに記録します
+    （トークン数の上限で打ち切られた場合は、finish_reasonが"length"、errorが種類"length"のChatErrorとなります）。
+    """
+
+    def __init__(self, deltas, on_delta=None):
+        """
+        Args:
+            deltas (Iterator[str]): 差分を返すイテレータ（最初の要素を要求した時点でリクエストを開始）
+            on_delta (callable, optional): 差分を受け取るたびに呼び出す関数
+        """
+        super().__init__(on_delta)
+        self._deltas = deltas
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.completed:
+            raise StopIteration
+        self._start()
+        try:
+            delta = next(self._deltas)
+        except StopIteration:
+            self._complete()
+            raise
+        except Exception as error:
+            self._finish(error)
+            raise StopIteration
+        self._receive(delta)
+        return delta
+
+    def read(self):
+        """
+        残りの応答をすべて受信し、全文を返します。
+
+        Returns:
+            str: 応答のテキスト。打ち切られた場合、またはエラーで何も受信できなかった場合はChatError
+        """
+        for _ in self:
+            pass
+        return self.text
+
+    def close(self):
+        """
+        受信を中断します。リクエストの予約を解放し、受信済みのテキストで終了します。
+        """
+        if self.completed:
+            return
+        self._start()
+        self._deltas.close()
+        self._finish()
+
+
+class AsyncChatStream(_StreamState):
+    """
+    ChatStreamの非同期版。async for文で差分を順に受け取ります。
+    """
+
+    def __init__(self, deltas, on_delta=None):
+        """
+        Args:
+            deltas (AsyncIterator[str]): 差分を返す非同期イテレータ
+            on_delta (callable, optional): 差分を受け取るたびに呼び出す関数
+        """
+        super().__init__(on_delta)
+        self._deltas = deltas
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.completed:
+            raise StopAsyncIteration
+        self._start()
+        try:
+            delta = await self._deltas.__anext__()
+        except StopAsyncIteration:
+            self._complete()
+            raise
+        except Exception as error:
+            self._finish(error)
+            raise StopAsyncIteration
+        self._receive(delta)
+        return delta
+
+    async def read(self):
+        """
+        残りの応答をすべて受信し、全文を返します。
+
+        Returns:
+            str: 応答のテキスト。打ち切られた場合、またはエラーで何も受信できなかった場合はChatError
+        """
+        async for _ in self:
+            pass
+        return self.text
+
+    async def aclose(self):
+        """
+        受信を中断します。リクエストの予約を解放し、受信済みのテキストで終了します。
+        """
+        if self.completed:
+            return
+        self._start()
+        await self._deltas.aclose()
+        self._finish()
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class BackgroundLoop:
+    """
+    専用のスレッドで動かし続けるイベントループ。
+    同期処理から非同期の処理を実行する場合に、呼び出しごとにasyncio.runでイベントループを生成せず、
+    イベントループに紐づくクライアント（AsyncOpenAIなど）やバックグラウンドのタスクを呼び出しをまたいで使用します。
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): スレッドの名前
+        """
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get_loop(self):
+        """イベントループを返す（最初の呼び出しで専用のスレッドで開始する）"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run(self, coro):
+        """
+        コルーチンをイベントループで実行し、完了を待ちます。
+
+        Args:
+            coro: 実行するコルーチン
+
+        Returns:
+            コルーチンの結果
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+        try:
+            return future.result()
+        except BaseException:
+            # Ctrl+Cなどで待機を中断した場合は、実行中の処理も取り消す
+            future.cancel()
+            raise
+
+    def close(self, shutdown=None):
+        """
+        イベントループを終了します（開始していない場合は何もしない）。
+
+        Args:
+            shutdown (callable, optional): 終了する前にイベントループで実行するコルーチン関数
+                （クライアントを閉じる処理など）
+        """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            if shutdown is not None:
+                asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+class LoopSafeSemaphore:
+    """
+    複数のイベントループ（スレッド）で共有できる非同期のセマフォ。
+    asyncio.Semaphoreはイベントループに紐づくため、ループごとに生成すると同時実行数の上限が
+    ループごとに適用されます。このクラスは上限をすべてのループで共有し、空きを待つ間は
+    イベントループをブロックせず、到着順に枠を割り当てます。async with文で使用します。
+    """
+
+    def __init__(self, value):
+        """
+        Args:
+            value (int): 同時に取得できる数の上限
+        """
+        if value < 1:
+            raise ValueError("valueには1以上の値を指定してください。")
+        self.value = value
+        self._in_use = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def in_use(self):
+        """取得されている枠の数"""
+        with self._lock:
+            return self._in_use
+
+    async def acquire(self):
+        """枠に空きができるまで待機して取得します。"""
+        with self._lock:
+            if self._in_use < self.value and not self._waiters:
+                self._in_use += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiting = future in self._waiters
+                if waiting:
+                    self._waiters.remove(future)
+            # 枠を譲り受けた後に取り消された場合は、次の待機者に譲る
+            # （譲り受ける前に取り消された場合は、_grantが次の待機者に譲る）
+            if not waiting and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        """枠を返却します（待機しているものがあれば、到着順に譲ります）。"""
+        with self._lock:
+            while self._waiters:
+                future = self._waiters.popleft()
+                try:
+                    future.get_loop().call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    # 待機していたイベントループが終了している場合は、次の待機者に譲る
+                    continue
+            self._in_use -= 1
+
+    def _grant(self, future):
+        """待機者のイベントループで、譲られた枠を受け取らせる"""
+        if future.done():
+            self.release()
+            return
+        future.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.release()
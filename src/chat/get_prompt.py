@@ -50,11 +50,7 @@ def get_web_research_system_prompt(conversation_history, web_research_results):
 ただし、Web検索結果が得られなかった場合は、その旨を伝え、一般的な情報を提供してください。"""
     
     # Web検索結果を含める
-    research_text = "\n\nWeb検索結果:\n"
-    for result in web_research_results:
-        research_text += f"\n検索キーワード: {result['keyword']}\n"
-        research_text += f"検索結果の要約:\n{result['summary']}\n"
-    base_prompt += research_text
+    base_prompt += "\n\n" + format_web_research_results(web_research_results)
     
     # 会話履歴がある場合は、それを含める
     if conversation_history:
@@ -67,6 +63,112 @@ def get_web_research_system_prompt(conversation_history, web_research_results):
     
     return base_prompt
 
+def format_web_research_results(web_research_results):
+    """
+    Web検索結果をプロンプトに含める形式の文字列に変換する
+
+    Args:
+        web_research_results (list): Web検索結果（keyword, summaryの辞書）のリスト
+
+    Returns:
+        str: Web検索結果の文字列
+    """
+    research_text = "Web検索結果:\n"
+    for result in web_research_results:
+        research_text += f"\n検索キーワード: {result['keyword']}\n"
+        research_text += f"検索結果の要約:\n{result['summary']}\n"
+    return research_text
+
+def build_messages(instructions, content):
+    """
+    固定の指示をシステムメッセージ、呼び出しごとに変化する内容をユーザーメッセージとしたメッセージのリストを生成する
+    同じ指示を使用する呼び出しはリクエストの先頭が一致するため、API側のプロンプトキャッシュが有効になる
+
+    Args:
+        instructions (str): 固定の指示（get_*_prompt()の戻り値など）
+        content (str): 入力や検索結果など、呼び出しごとに変化する内容
+
+    Returns:
+        list: メッセージのリスト
+    """
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": content}
+    ]
+
+def get_chat_system_prompt():
+    """
+    会話用の固定のシステムプロンプトを返す（会話履歴やWeb検索結果を含まない）
+
+    Returns:
+        str: システムプロンプト
+    """
+    return """あなたは親切で知識豊富なアシスタントです。
+ユーザーの質問に対して、明確で正確な回答を提供してください。
+ユーザーのメッセージにWeb検索結果が含まれる場合は、その情報を考慮して、最新かつ正確な情報に基づいた回答を作成してください。
+ただし、Web検索結果が得られなかった場合は、その旨を伝え、一般的な情報を提供してください。"""
+
+def get_chat_messages(conversation_history, user_input, web_research_results=None):
+    """
+    会話用のメッセージのリストを生成する
+    固定のシステムプロンプト、会話履歴（ターンごとのメッセージ）、今回の入力の順に並べるため、
+    会話が続いても前回までのリクエストと先頭が一致し、API側のプロンプトキャッシュが有効になる
+    （get_system_prompt, get_web_research_system_promptはシステムプロンプトに履歴や検索結果を含むため一致しない）
+
+    Args:
+        conversation_history (list): 会話履歴のリスト
+        user_input (str): ユーザーの入力
+        web_research_results (list, optional): 今回の入力に対するWeb検索結果のリスト
+
+    Returns:
+        list: メッセージのリスト
+    """
+    messages = [{"role": "system", "content": get_chat_system_prompt()}]
+    for turn in conversation_history:
+        messages.append({"role": "user", "content": turn['user']})
+        if turn.get('assistant'):
+            messages.append({"role": "assistant", "content": turn['assistant']})
+
+    # 変化する内容（検索結果、今回の入力）は末尾に置く
+    content = user_input
+    if web_research_results:
+        content = format_web_research_results(web_research_results) + f"\nユーザーの質問: {user_input}"
+    messages.append({"role": "user", "content": content})
+    return messages
+
+def get_web_research_judge_messages(user_input, conversation_history):
+    """
+    Webリサーチが必要かどうかを判断するためのメッセージのリストを生成する
+
+    Args:
+        user_input (str): ユーザーの入力
+        conversation_history (list): 会話履歴のリスト
+
+    Returns:
+        list: メッセージのリスト
+    """
+    history = "\n".join([
+        f"ユーザー: {turn['user']}\n" +
+        f"アシスタント: {turn.get('assistant', '')}\n" +
+        f"ウェブ検索使用: {'はい' if turn.get('used_web_research') else 'いいえ'}"
+        for turn in conversation_history
+    ])
+    return build_messages(get_web_research_judge_prompt(), f"会話履歴:\n{history}\n\nユーザーの入力: {user_input}")
+
+def get_web_research_keywords_messages(user_input, conversation_history):
+    """
+    Web検索のキーワードを生成するためのメッセージのリストを生成する
+
+    Args:
+        user_input (str): ユーザーの入力
+        conversation_history (list): 会話履歴のリスト
+
+    Returns:
+        list: メッセージのリスト
+    """
+    history = "\n".join([f"ユーザー: {turn['user']}\nアシスタント: {turn.get('assistant', '')}" for turn in conversation_history])
+    return build_messages(get_web_research_keywords_prompt(), f"会話履歴:\n{history}\n\nユーザーの質問: {user_input}")
+
 def get_web_research_judge_prompt():
     """
     Webリサーチが必要かどうかを判断するためのプロンプトを返す
@@ -0,0 +1,147 @@
+from src.chat.retry_policy import classify_error
+
+# config.iniで処理段階ごとのルートを指定するセクション名の接頭辞（例: [ROUTE.judge]）
+ROUTE_SECTION_PREFIX = "ROUTE."
+# 処理段階の指定がない場合、または定義されていない処理段階に使用するルートの名前
+DEFAULT_ROUTE = "default"
+# モデルの過負荷として、フォールバックのモデルに切り替えるエラーの種類
+FALLBACK_ERROR_KINDS = ("rate_limit", "server", "timeout")
+
+
+class StageRoute:
+    """
+    処理段階で使用するモデル、応答のトークン数の上限、温度と、過負荷の場合に切り替えるモデル。
+    """
+
+    def __init__(self, model, max_tokens=None, temperature=1, fallback_models=()):
+        """
+        Args:
+            model (str): モデル名
+            max_tokens (int, optional): 応答のトークン数の上限。Noneの場合は指定しない
+            temperature (float): 温度
+            fallback_models (Iterable[str]): 過負荷の場合に順に切り替えるモデル名
+        """
+        if max_tokens is not None and max_tokens < 1:
+            raise ValueError("max_tokensには1以上の値を指定してください。")
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.fallback_models = tuple(name for name in fallback_models if name != model)
+
+    @property
+    def models(self):
+        """試す順のモデル名のリスト"""
+        return [self.model, *self.fallback_models]
+
+    def __repr__(self):
+        return (
+            f"StageRoute(model={self.model!r}, max_tokens={self.max_tokens!r}, "
+            f"temperature={self.temperature!r}, fallback_models={list(self.fallback_models)!r})"
+        )
+
+
+# 処理段階ごとの既定のルート。
+# 判定・キーワード生成・中間要約のような単純な処理は小さく速いモデルを使用し、
+# 判定とキーワード生成は温度を0にして応答をキャッシュできるようにする。
+# 応答のトークン数の上限は既定では指定しない（上限で打ち切られたJSONは解析できないため）。
+# 必要な場合はconfig.iniの [ROUTE.<処理段階>] のmax_tokensで指定し、打ち切られた応答は
+# 種類が"length"のChatErrorとなる
+DEFAULT_ROUTES = {
+    DEFAULT_ROUTE: StageRoute("gpt-4o", fallback_models=["gpt-4o-mini"]),
+    "judge": StageRoute("gpt-4o-mini", temperature=0, fallback_models=["gpt-4o"]),
+    "keywords": StageRoute("gpt-4o-mini", temperature=0, fallback_models=["gpt-4o"]),
+    "summarize": StageRoute("gpt-4o-mini", temperature=0, fallback_models=["gpt-4o"]),
+    "analysis": StageRoute("gpt-4o", temperature=0, fallback_models=["gpt-4o-mini"]),
+    "reviews": StageRoute("gpt-4o", fallback_models=["gpt-4o-mini"]),
+    "pitch": StageRoute("gpt-4o", fallback_models=["gpt-4o-mini"]),
+    "customer_info": StageRoute("gpt-4o-mini", temperature=0, fallback_models=["gpt-4o"]),
+    "icebreak": StageRoute("gpt-4o", fallback_models=["gpt-4o-mini"]),
+    "answer": StageRoute("gpt-4o", fallback_models=["gpt-4o-mini"]),
+}
+
+
+def _parse_max_tokens(value, default):
+    """config.iniのmax_tokensを数値に変換する（空の場合は上限なし）"""
+    if value is None:
+        return default
+    value = value.strip()
+    return int(value) if value else None
+
+
+def _parse_models(value):
+    """カンマ区切りのモデル名をリストに変換する"""
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class ModelRouter:
+    """
+    処理段階（judge, keywords, summarize, analysis, answer など）ごとに、
+    使用するモデル、応答のトークン数の上限、温度、フォールバックのモデルを決定するクラス。
+    """
+
+    def __init__(self, routes=None):
+        """
+        Args:
+            routes (dict, optional): 処理段階 -> StageRoute。指定した処理段階のみDEFAULT_ROUTESを上書き
+        """
+        self.routes = dict(DEFAULT_ROUTES)
+        self.routes.update(routes or {})
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        config.iniの [ROUTE.<処理段階>] セクションで既定のルートを上書きしたModelRouterを生成します。
+        セクションには model, max_tokens（空の場合は上限なし）, temperature,
+        fallback_models（カンマ区切り）を指定でき、指定しない項目は既定のルートの値を使用します。
+
+        Args:
+            config (configparser.ConfigParser): 読み込んだconfig.ini
+
+        Returns:
+            ModelRouter: ルーター
+        """
+        routes = {}
+        for section in config.sections():
+            if not section.startswith(ROUTE_SECTION_PREFIX):
+                continue
+            stage = section[len(ROUTE_SECTION_PREFIX):]
+            base = DEFAULT_ROUTES.get(stage, DEFAULT_ROUTES[DEFAULT_ROUTE])
+            values = config[section]
+            fallback_models = values.get("fallback_models")
+            routes[stage] = StageRoute(
+                values.get("model", base.model),
+                max_tokens=_parse_max_tokens(values.get("max_tokens"), base.max_tokens),
+                temperature=float(values.get("temperature", base.temperature)),
+                fallback_models=base.fallback_models if fallback_models is None else _parse_models(fallback_models)
+            )
+        return cls(routes)
+
+    def route(self, stage=None):
+        """
+        処理段階のルートを返します。
+
+        Args:
+            stage (str, optional): 処理段階の名前
+
+        Returns:
+            StageRoute: ルート（定義されていない処理段階の場合はdefaultのルート）
+        """
+        return self.routes.get(stage) or self.routes[DEFAULT_ROUTE]
+
+    @staticmethod
+    def next_model(models, model, error):
+        """
+        過負荷のエラーの場合に、次に試すモデルを返します。
+
+        Args:
+            models (list): 試す順のモデル名のリスト
+            model (str): エラーが発生したモデル名
+            error (Exception): 発生した例外
+
+        Returns:
+            str or None: 次に試すモデル名。過負荷のエラーでない場合、または残りのモデルがない場合はNone
+        """
+        if classify_error(error) not in FALLBACK_ERROR_KINDS or model not in models:
+            return None
+        index = models.index(model)
+        return models[index + 1] if index + 1 < len(models) else None
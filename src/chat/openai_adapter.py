@@ -1,7 +1,208 @@
+import asyncio
 import configparser
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import os
+import threading
+import time
+import weakref
+from src.chat.batch_job import BatchJob
+from src.chat.call_telemetry import CallRecord, TelemetrySink, TurnTelemetry
+from src.chat.chat_stream import AsyncChatStream, ChatStream
+from src.chat.event_loops import BackgroundLoop, LoopSafeSemaphore
+from src.chat.model_routing import ModelRouter
+from src.chat.rate_governor import RateGovernor
+from src.chat.response_cache import ResponseCache
+from src.chat.retry_policy import ChatError, RetryPolicy, TruncatedResponseError, classify_error, truncation_error
+from src.chat.structured_output import STRUCTURED_OUTPUT_MODES, StructuredOutputError
+from src.replay.fixture_store import FixtureStore, resolve_latency
+
+CHAT_NAMESPACE = "chat"
+MODES = ("live", "record", "replay")
+CACHE_POLICIES = ("auto", "on", "off")
+
+class _ChatCall:
+    """
+    OpenaiAdapterの1回の呼び出しの、APIの呼び出し以外の処理をまとめたクラス。
+    記録済みの応答・キャッシュの参照、試行ごとの計測、RPM/TPMの予約の補正、フォールバックのモデルへの切り替え、
+    再試行の判定、使用量の集計、応答の記録とキャッシュを行います。
+    同期・非同期、ストリーミングの有無による4つの経路で共通に使用し、各経路はAPIの呼び出しと待機のみを行います。
+    """
+
+    def __init__(self, adapter, record, models, prompt, messages, temperature, max_tokens, cache,
+                 response_format=None, streaming=False):
+        """
+        Args:
+            adapter (OpenaiAdapter): 呼び出し元のアダプター
+            record (CallRecord): 計測結果の記録先
+            models (list): 試す順のモデル名のリスト
+            prompt (str, optional): プロンプト
+            messages (list, optional): メッセージのリスト
+            temperature (float): 温度
+            max_tokens (int, optional): 応答のトークン数の上限
+            cache (bool, optional): 応答のキャッシュを使用するかどうか
+            response_format (dict, optional): 出力の形式
+            streaming (bool): ストリーミングでの呼び出しかどうか（エラーの表示はChatStreamで行う）
+        """
+        self.adapter = adapter
+        self.record = record
+        self.models = models
+        self.model = models[0]
+        self.messages = adapter._make_messages(prompt, messages)
+        self.max_tokens = max_tokens
+        self.streaming = streaming
+        # 記録・キャッシュのキーは最初のモデルのリクエストとする（フォールバックのモデルの応答も同じキーで保存）
+        self.request = adapter._make_request(models[0], self.messages, temperature, response_format, max_tokens)
+        self.response_cache = adapter._cache_for(temperature, cache)
+        self.estimated_tokens = 0
+        self.attempt = 0
+        self.start_time = None
+        self._queue_start = None
+        self._parts = []
+        self._usage = None
+        self._finish_reason = None
+
+    def lookup(self):
+        """
+        記録済みの応答（再生モード）またはキャッシュにある応答を返します。
+        APIを呼び出す必要がある場合は、RPM/TPMの制御に使用するトークン数を見積もります。
+
+        Returns:
+            tuple or None: (応答のテキスト, 模擬する応答時間（秒）)。APIを呼び出す場合はNone
+        """
+        adapter = self.adapter
+        if adapter.mode == "replay":
+            # 記録がない場合はFixtureNotFoundErrorを送出する
+            self.record.source = "replay"
+            fixture = adapter.fixture_store.require(CHAT_NAMESPACE, self.request)
+            return fixture["response"], resolve_latency(adapter.latency_profile, fixture)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(self.request)
+            if cached is not None:
+                self.record.source = "cache"
+                return cached, 0.0
+        self.estimated_tokens = adapter._estimate_tokens(self.model, self.messages, self.max_tokens)
+        return None
+
+    def begin_attempt(self):
+        """
+        試行を開始します（RPM/TPMの空きを待つ前に呼び出す）。
+
+        Returns:
+            int: 予約するトークン数
+        """
+        self.attempt += 1
+        self.record.attempts = self.attempt
+        self._queue_start = time.monotonic()
+        self.start_time = None
+        self._parts = []
+        self._usage = None
+        self._finish_reason = None
+        return self.estimated_tokens
+
+    def send(self):
+        """
+        リクエストを送信する直前に呼び出し、RPM/TPMと同時実行数の枠を待った時間を記録します。
+
+        Returns:
+            dict: 送信するリクエスト（試行中のモデル）
+        """
+        self.start_time = time.monotonic()
+        self.record.queue_time += self.start_time - self._queue_start
+        return dict(self.request, model=self.model)
+
+    def receive(self, chunk):
+        """
+        ストリームのチャンクを受け取り、差分を返します。
+
+        Args:
+            chunk: APIのストリームのチャンク
+
+        Returns:
+            str or None: 差分のテキスト（差分を含まないチャンクの場合はNone）
+        """
+        # 使用量は最後の（choicesが空の）チャンクで報告される
+        self._usage = getattr(chunk, "usage", None) or self._usage
+        if not chunk.choices:
+            return None
+        self._finish_reason = getattr(chunk.choices[0], "finish_reason", None) or self._finish_reason
+        delta = chunk.choices[0].delta.content
+        if delta:
+            self._parts.append(delta)
+        return delta
+
+    def retry_delay(self, error):
+        """
+        試行が失敗した場合に、予約を補正し、次の試行までの待機時間を返します。
+        過負荷のエラーの場合はフォールバックのモデルに切り替えます（待機せずに再試行）。
+        ストリームの受信を始めた後のエラーは、受信済みの差分と重複するため再試行しません。
+
+        Args:
+            error (Exception): 発生した例外
+
+        Returns:
+            float or None: 待機時間（秒）。再試行しない場合はNone
+        """
+        if self._parts:
+            self.abort()
+            return None
+        self.adapter.rate_governor.reconcile(self.estimated_tokens, 0)
+        fallback = self.adapter._fallback_model(self.models, self.model, error)
+        if fallback is not None:
+            self.model = self.record.model = fallback
+            return 0.0
+        return self.adapter._retry_delay(error, self.attempt, report=not self.streaming)
+
+    def abort(self):
+        """
+        試行を中断した場合（取り消し、ストリームの受信の中断や受信中のエラー）に予約を補正します。
+        送信前の場合は全額を返却し、送信後はサーバー側で課金される送信済みのプロンプトと受信済みの差分の分を
+        使用量とします。
+        """
+        actual_tokens = 0
+        rate_governor = self.adapter.rate_governor
+        if self.start_time is not None and rate_governor.enabled:
+            actual_tokens = (
+                rate_governor.count_prompt_tokens(self.model, self.messages)
+                + rate_governor.count_text_tokens(self.model, "".join(self._parts))
+            )
+        rate_governor.reconcile(self.estimated_tokens, actual_tokens)
+
+    def complete(self, text, usage, finish_reason):
+        """
+        応答を受信した場合に、使用量を集計し、応答を記録・キャッシュします。
+
+        Args:
+            text (str): 応答のテキスト
+            usage: 応答で報告された使用量
+            finish_reason (str, optional): 応答の終了の理由
+
+        Returns:
+            str: 応答のテキスト。トークン数の上限で打ち切られた場合はtruncation_errorの結果
+        """
+        adapter = self.adapter
+        adapter._settle_usage(usage, self.estimated_tokens, self.record)
+        if finish_reason == "length":
+            # 打ち切られた応答は記録・キャッシュしない
+            error = truncation_error(self.max_tokens, attempts=self.attempt)
+            if not self.streaming:
+                print(f"GPT呼び出し時にエラーが発生しました:{error.message}")
+            return error
+        if adapter.mode == "record":
+            adapter.fixture_store.put(CHAT_NAMESPACE, self.request, text, latency=time.monotonic() - self.start_time)
+        if self.response_cache is not None:
+            self.response_cache.set(self.request, text)
+        return text
+
+    def finish_stream(self):
+        """
+        ストリームを最後まで受信した場合に、completeと同じ処理を行います。
+        トークン数の上限で打ち切られた場合は、受信済みの差分はそのまま残し、TruncatedResponseErrorを送出します。
+        """
+        result = self.complete("".join(self._parts), self._usage, self._finish_reason)
+        if isinstance(result, ChatError):
+            raise TruncatedResponseError(result)
+
 
 class OpenaiAdapter:
 
@@ -9,25 +210,883 @@ class OpenaiAdapter:
     config = configparser.ConfigParser()
     config.read('config.ini')
     retry_limit = int(config.get('CONFIG', 'retry_limit', fallback=5))
+    # 再試行の待機時間（指数バックオフ）の初期値と上限（秒）
+    retry_base_delay = float(config.get('CONFIG', 'retry_base_delay', fallback=0.5))
+    retry_max_delay = float(config.get('CONFIG', 'retry_max_delay', fallback=30))
+    # 1回のリクエストのタイムアウト（秒）
+    request_timeout = float(config.get('CONFIG', 'request_timeout', fallback=60))
+    # aopenai_chatで同時に実行するリクエスト数の上限（すべてのイベントループで共有）
+    max_concurrency = int(config.get('CONFIG', 'max_concurrency', fallback=8))
+    # live: APIを呼び出す / record: APIを呼び出し、応答を記録する / replay: 記録済みの応答を返す
+    llm_mode = config.get('CONFIG', 'llm_mode', fallback='live')
+    fixture_dir = config.get('CONFIG', 'fixture_dir', fallback='fixtures')
+    # 再生時に模擬する応答時間（"recorded" またはLATENCY_PROFILESのキー。空の場合は待機しない）
+    replay_latency = config.get('CONFIG', 'replay_latency', fallback='') or None
+    # 応答のキャッシュ（auto: temperatureが0の呼び出しのみ / on: すべての呼び出し / off: 使用しない）
+    llm_cache = config.get('CONFIG', 'llm_cache', fallback='auto')
+    llm_cache_path = config.get('CONFIG', 'llm_cache_path', fallback='.cache/llm_cache.sqlite3')
+    llm_cache_ttl = float(config.get('CONFIG', 'llm_cache_ttl', fallback=ResponseCache.DEFAULT_TTL))
+    llm_cache_max_entries = int(config.get('CONFIG', 'llm_cache_max_entries', fallback=5000))
+    # 組織の1分あたりのリクエスト数・トークン数の上限（空の場合は制御しない）
+    rpm_limit = int(config.get('CONFIG', 'rpm_limit', fallback='') or 0) or None
+    tpm_limit = int(config.get('CONFIG', 'tpm_limit', fallback='') or 0) or None
+    # トークン数の見積もりに使用する応答のトークン数（max_tokensの代わり）
+    expected_completion_tokens = int(config.get('CONFIG', 'expected_completion_tokens', fallback=1024))
+    # Batch APIの入力ファイルの保存先と、状態を確認する間隔（秒）
+    batch_dir = config.get('CONFIG', 'batch_dir', fallback='.cache/batches')
+    batch_poll_interval = float(config.get('CONFIG', 'batch_poll_interval', fallback=30))
+    # openai_chat_structuredで出力の形式を指定する方法（STRUCTURED_OUTPUT_MODES）と、解析に失敗した場合の修正の回数
+    structured_output_mode = config.get('CONFIG', 'structured_output_mode', fallback='json_schema')
+    structured_output_repairs = int(config.get('CONFIG', 'structured_output_repairs', fallback=1))
 
-    def __init__(self):
-        self.client = OpenAI(
-            api_key = os.getenv('OPENAI_API_KEY')
+    def __init__(self, mode=None, fixture_store=None, latency_profile=None, max_concurrency=None,
+                 retry_policy=None, request_timeout=None, response_cache=None, cache_policy=None,
+                 rate_governor=None, batch_client=None, telemetry_sink=None, model_router=None):
+        """
+        Args:
+            mode (str, optional): "live", "record", "replay" のいずれか。指定がない場合はconfig.iniのllm_mode
+            fixture_store (FixtureStore, optional): 応答の記録先。指定がない場合はconfig.iniのfixture_dir
+            latency_profile (optional): 再生時に模擬する応答時間。None（待機しない）、"recorded"
+                （記録時の応答時間）、LatencyProfile、またはLATENCY_PROFILESのキー。
+                指定がない場合はconfig.iniのreplay_latency
+            max_concurrency (int, optional): aopenai_chatで同時に実行するリクエスト数の上限。
+                指定がない場合はconfig.iniのmax_concurrency
+            retry_policy (RetryPolicy, optional): 再試行の方針。指定がない場合はconfig.iniの
+                retry_limit, retry_base_delay, retry_max_delayから生成
+            request_timeout (float, optional): 1回のリクエストのタイムアウト（秒）。
+                指定がない場合はconfig.iniのrequest_timeout
+            response_cache (ResponseCache, optional): 応答のキャッシュ。指定がない場合は最初に使用する時点で
+                config.iniのllm_cache_path, llm_cache_ttl, llm_cache_max_entriesから生成
+            cache_policy (str, optional): "auto"（temperatureが0の呼び出しのみキャッシュ）、"on"、"off" のいずれか。
+                指定がない場合はconfig.iniのllm_cache。liveモード以外ではキャッシュを使用しない
+            rate_governor (RateGovernor, optional): RPM/TPMの制御。複数のOpenaiAdapterで上限を共有する場合は
+                同じものを指定。指定がない場合はconfig.iniのrpm_limit, tpm_limitから生成（未設定の場合は制御しない）
+            batch_client (optional): openai_chat_batchで使用するクライアント（ローカルで動作を確認する場合は
+                LocalBatchClient）。指定がない場合はOpenAIクライアント
+            telemetry_sink (TelemetrySink, optional): 呼び出しごとの計測結果（CallRecord）の送信先。
+                指定がない場合は送信しない（start_turnによるターンごとの集計は行う）
+            model_router (ModelRouter, optional): 処理段階（stage）ごとのモデル、応答のトークン数の上限、温度、
+                フォールバックのモデル。指定がない場合はDEFAULT_ROUTESをconfig.iniの [ROUTE.<処理段階>] で上書きしたもの
+        """
+        self.mode = mode or self.llm_mode
+        if self.mode not in MODES:
+            raise ValueError(f"modeには {', '.join(MODES)} のいずれかを指定してください。")
+        self.fixture_store = fixture_store or FixtureStore(self.fixture_dir)
+        self.latency_profile = latency_profile or self.replay_latency
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        if request_timeout is not None:
+            self.request_timeout = request_timeout
+        self.cache_policy = cache_policy or self.llm_cache
+        if self.cache_policy not in CACHE_POLICIES:
+            raise ValueError(f"cache_policyには {', '.join(CACHE_POLICIES)} のいずれかを指定してください。")
+        self._response_cache = response_cache
+        self._cache_lock = threading.Lock()
+        self._token_usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        self._usage_lock = threading.Lock()
+        self.batch_client = batch_client
+        self.telemetry_sink = telemetry_sink or TelemetrySink()
+        self.current_turn = None
+        self.model_router = model_router or ModelRouter.from_config(self.config)
+        if self.structured_output_mode not in STRUCTURED_OUTPUT_MODES:
+            raise ValueError(f"structured_output_modeには {', '.join(STRUCTURED_OUTPUT_MODES)} のいずれかを指定してください。")
+        self.rate_governor = rate_governor or RateGovernor(
+            rpm=self.rpm_limit,
+            tpm=self.tpm_limit,
+            default_completion_tokens=self.expected_completion_tokens
         )
-    
-    def openai_chat(self, openai_model, prompt, temperature=1):
-        system_prompt = [{"role": "system", "content": prompt}]
-        for i in range(self.retry_limit):
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=self.retry_limit,
+            base_delay=self.retry_base_delay,
+            max_delay=self.retry_max_delay
+        )
+        # AsyncOpenAIはイベントループに紐づくため、ループごとに生成する（同時実行数の上限はすべてのループで共有）
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._semaphore = LoopSafeSemaphore(self.max_concurrency)
+        # openai_chat_manyを実行するイベントループ（最初の呼び出しで開始し、close()で終了）
+        self._background = BackgroundLoop("openai-adapter")
+        # 再生モードではAPIを呼び出さないため、APIキーは不要
+        self.client = None
+        if self.mode != "replay":
+            self.client = OpenAI(
+                api_key = os.getenv('OPENAI_API_KEY'),
+                # 再試行はretry_policyで行うため、クライアント内部の再試行は無効にする
+                max_retries = 0
+            )
+
+    def openai_chat(self, openai_model=None, prompt=None, temperature=None, timeout=None, cache=None, messages=None,
+                    response_format=None, stage=None, max_tokens=None):
+        """
+        LLMの応答を取得します。一時的なエラー（レート制限、サーバーエラー、タイムアウト）は
+        retry_policyに従って待機してから再試行し、認証エラーや不正なリクエストは再試行しません。
+
+        Args:
+            openai_model (str, optional): モデル名。指定がない場合はstageのルート（model_router）のモデルを使用し、
+                過負荷（レート制限、サーバーエラー、タイムアウト）の場合はフォールバックのモデルに切り替える
+            prompt (str, optional): プロンプト（システムメッセージとして送信）。messagesを指定する場合は不要
+            temperature (float, optional): 温度。指定がない場合はstageのルートの温度（openai_modelを指定した場合は1）
+            timeout (float, optional): 1回のリクエストのタイムアウト（秒）。指定がない場合はrequest_timeout
+            cache (bool, optional): 応答のキャッシュを使用するかどうか。指定がない場合はcache_policyに従う
+            messages (list, optional): メッセージ（role, contentの辞書）のリスト。固定の指示を先頭に、
+                変化する内容を末尾に置くと、API側のプロンプトキャッシュが有効になります
+            response_format (dict, optional): 出力の形式（JSONスキーマなど）。通常はopenai_chat_structuredを使用
+            stage (str, optional): 処理段階の名前（judge, keywords, summarize, analysis, answer など）。
+                モデルの選択と計測結果に使用
+            max_tokens (int, optional): 応答のトークン数の上限。指定がない場合はstageのルートの上限
+                （openai_modelを指定した場合は上限なし）
+
+        Returns:
+            str: 応答のテキスト。エラー時はChatError（偽と評価される空文字列）
+        """
+        models, temperature, max_tokens = self._resolve_route(openai_model, stage, temperature, max_tokens)
+        record = CallRecord(stage, models[0])
+        error_kind = "exception"
+        try:
+            text = self._chat(record, models, prompt, temperature, max_tokens, timeout, cache, messages, response_format)
+            error_kind = text.kind if isinstance(text, ChatError) else None
+            return text
+        finally:
+            self._emit_record(record, error_kind)
+
+    def _chat(self, record, models, prompt, temperature, max_tokens, timeout, cache, messages, response_format):
+        """openai_chatの本体（計測結果をrecordに記録する）"""
+        call = _ChatCall(self, record, models, prompt, messages, temperature, max_tokens, cache, response_format)
+        found = call.lookup()
+        if found is not None:
+            text, delay = found
+            if delay > 0:
+                time.sleep(delay)
+            return text
+
+        while True:
+            self.rate_governor.acquire(call.begin_attempt())
             try:
                 response = self.client.chat.completions.create(
-                    messages=system_prompt,
-                    model=openai_model,
-                    temperature=temperature
+                    **call.send(),
+                    timeout=timeout or self.request_timeout
                 )
-                text = response.choices[0].message.content
-                return text
+                choice = response.choices[0]
             except Exception as error:
+                delay = call.retry_delay(error)
+                if delay is None:
+                    return ChatError.from_exception(error, attempts=call.attempt)
+                time.sleep(delay)
+                continue
+            return call.complete(choice.message.content, response.usage, getattr(choice, "finish_reason", None))
+
+    def openai_chat_stream(self, openai_model=None, prompt=None, temperature=None, on_delta=None, timeout=None,
+                           cache=None, messages=None, stage=None, max_tokens=None):
+        """
+        応答を差分（トークン）単位で受け取るストリームを返します。
+        最初のトークンから順に表示できるため、全文の生成を待つ必要がありません。
+        最初のトークンを受信する前の一時的なエラーはretry_policyに従って再試行します。
+
+        Args:
+            openai_model (str, optional): モデル名。指定がない場合はstageのルート（model_router）のモデルを使用し、
+                過負荷（レート制限、サーバーエラー、タイムアウト）の場合はフォールバックのモデルに切り替える
+            prompt (str, optional): プロンプト（システムメッセージとして送信）。messagesを指定する場合は不要
+            temperature (float, optional): 温度。指定がない場合はstageのルートの温度（openai_modelを指定した場合は1）
+            on_delta (callable, optional): 差分を受け取るたびに呼び出す関数
+            timeout (float, optional): 1回のリクエストのタイムアウト（秒）。指定がない場合はrequest_timeout
+            cache (bool, optional): 応答のキャッシュを使用するかどうか（キャッシュにある場合は全文を一度に返す）。
+                指定がない場合はcache_policyに従う
+            messages (list, optional): メッセージ（role, contentの辞書）のリスト。固定の指示を先頭に、
+                変化する内容を末尾に置くと、API側のプロンプトキャッシュが有効になります
+            stage (str, optional): 処理段階の名前。モデルの選択と計測結果に使用
+            max_tokens (int, optional): 応答のトークン数の上限。指定がない場合はstageのルートの上限
+
+        Returns:
+            ChatStream: 差分を返すイテレータ（text, stats()で全文と応答時間を参照）
+        """
+        return ChatStream(
+            self._stream_deltas(openai_model, prompt, temperature, timeout, cache, messages, stage, max_tokens),
+            on_delta=on_delta
+        )
+
+    def _stream_deltas(self, openai_model, prompt, temperature, timeout=None, cache=None, messages=None, stage=None,
+                       max_tokens=None):
+        """ストリーミングで応答を取得し、差分を順に返すジェネレータ"""
+        models, temperature, max_tokens = self._resolve_route(openai_model, stage, temperature, max_tokens)
+        record = CallRecord(stage, models[0], streaming=True)
+        error_kind = "exception"
+        deltas = self._stream_attempts(record, models, prompt, temperature, max_tokens, timeout, cache, messages)
+        try:
+            for delta in deltas:
+                record.mark_first_token()
+                yield delta
+            error_kind = None
+        except GeneratorExit:
+            # 受信の途中でストリームを閉じた場合
+            error_kind = "cancelled"
+            raise
+        except Exception as error:
+            # 上限で打ち切られた場合（TruncatedResponseError）は"length"
+            error_kind = classify_error(error)
+            raise
+        finally:
+            # 途中で終了した場合も、予約の解放を待ってから計測結果を確定する
+            deltas.close()
+            self._emit_record(record, error_kind)
+
+    def _stream_attempts(self, record, models, prompt, temperature, max_tokens, timeout, cache, messages):
+        """_stream_deltasの本体（計測結果をrecordに記録する）"""
+        call = _ChatCall(self, record, models, prompt, messages, temperature, max_tokens, cache, streaming=True)
+        found = call.lookup()
+        if found is not None:
+            # 記録済み・キャッシュにある応答は、（模擬した応答時間の後に）まとめて返す
+            text, delay = found
+            if delay > 0:
+                time.sleep(delay)
+            yield text
+            return
+
+        while True:
+            self.rate_governor.acquire(call.begin_attempt())
+            stream = None
+            try:
+                stream = self.client.chat.completions.create(
+                    **call.send(),
+                    stream=True,
+                    timeout=timeout or self.request_timeout,
+                    stream_options={"include_usage": True}
+                )
+                for chunk in stream:
+                    delta = call.receive(chunk)
+                    if delta:
+                        yield delta
+            except GeneratorExit:
+                # 受信を中断した場合も予約を補正し、HTTPの接続を閉じる
+                call.abort()
+                if hasattr(stream, "close"):
+                    stream.close()
+                raise
+            except Exception as error:
+                delay = call.retry_delay(error)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            call.finish_stream()
+            return
+
+    def aopenai_chat_stream(self, openai_model=None, prompt=None, temperature=None, on_delta=None, timeout=None,
+                            cache=None, messages=None, stage=None, max_tokens=None):
+        """
+        openai_chat_streamの非同期版。async for文で差分を受け取ります。
+        ストリームの受信中は同時実行数の枠を1つ使用します。
+
+        Args:
+            openai_model (str, optional): モデル名。指定がない場合はstageのルート（model_router）のモデルを使用し、
+                過負荷（レート制限、サーバーエラー、タイムアウト）の場合はフォールバックのモデルに切り替える
+            prompt (str, optional): プロンプト（システムメッセージとして送信）。messagesを指定する場合は不要
+            temperature (float, optional): 温度。指定がない場合はstageのルートの温度（openai_modelを指定した場合は1）
+            on_delta (callable, optional): 差分を受け取るたびに呼び出す関数
+            timeout (float, optional): 1回のリクエストのタイムアウト（秒）。指定がない場合はrequest_timeout
+            cache (bool, optional): 応答のキャッシュを使用するかどうか。指定がない場合はcache_policyに従う
+            messages (list, optional): メッセージ（role, contentの辞書）のリスト。固定の指示を先頭に、
+                変化する内容を末尾に置くと、API側のプロンプトキャッシュが有効になります
+            stage (str, optional): 処理段階の名前。モデルの選択と計測結果に使用
+            max_tokens (int, optional): 応答のトークン数の上限。指定がない場合はstageのルートの上限
+
+        Returns:
+            AsyncChatStream: 差分を返す非同期イテレータ
+        """
+        return AsyncChatStream(
+            self._astream_deltas(openai_model, prompt, temperature, timeout, cache, messages, stage, max_tokens),
+            on_delta=on_delta
+        )
+
+    async def _astream_deltas(self, openai_model, prompt, temperature, timeout=None, cache=None, messages=None,
+                              stage=None, max_tokens=None):
+        """ストリーミングで応答を取得し、差分を順に返す非同期ジェネレータ"""
+        models, temperature, max_tokens = self._resolve_route(openai_model, stage, temperature, max_tokens)
+        record = CallRecord(stage, models[0], streaming=True)
+        error_kind = "exception"
+        deltas = self._astream_attempts(record, models, prompt, temperature, max_tokens, timeout, cache, messages)
+        try:
+            async for delta in deltas:
+                record.mark_first_token()
+                yield delta
+            error_kind = None
+        except (GeneratorExit, asyncio.CancelledError):
+            # 受信の途中でストリームを閉じた場合、またはタスクが取り消された場合
+            error_kind = "cancelled"
+            raise
+        except Exception as error:
+            # 上限で打ち切られた場合（TruncatedResponseError）は"length"
+            error_kind = classify_error(error)
+            raise
+        finally:
+            # 途中で終了した場合も、予約の解放を待ってから計測結果を確定する
+            await deltas.aclose()
+            self._emit_record(record, error_kind)
+
+    async def _astream_attempts(self, record, models, prompt, temperature, max_tokens, timeout, cache, messages):
+        """_astream_deltasの本体（計測結果をrecordに記録する）"""
+        call = _ChatCall(self, record, models, prompt, messages, temperature, max_tokens, cache, streaming=True)
+        found = call.lookup()
+        if found is not None:
+            text, delay = found
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield text
+            return
+
+        client, semaphore = self._async_state()
+        while True:
+            # 上限の空きを待つ間は同時実行数の枠を使用しない
+            await self.rate_governor.aacquire(call.begin_attempt())
+            stream = None
+            try:
+                async with semaphore:
+                    stream = await client.chat.completions.create(
+                        **call.send(),
+                        stream=True,
+                        timeout=timeout or self.request_timeout,
+                        stream_options={"include_usage": True}
+                    )
+                    async for chunk in stream:
+                        delta = call.receive(chunk)
+                        if delta:
+                            yield delta
+            except (GeneratorExit, asyncio.CancelledError):
+                # 受信を中断した場合、またはタスクが取り消された場合も予約を補正し、HTTPの接続を閉じる
+                call.abort()
+                if hasattr(stream, "close"):
+                    await stream.close()
+                raise
+            except Exception as error:
+                delay = call.retry_delay(error)
+                if delay is None:
+                    raise
+                # 待機中は同時実行数の枠を解放しておく
+                await asyncio.sleep(delay)
+                continue
+            call.finish_stream()
+            return
+
+    @property
+    def response_cache(self):
+        """応答のキャッシュ（最初に参照した時点でSQLiteファイルを開く）"""
+        if self._response_cache is None:
+            with self._cache_lock:
+                if self._response_cache is None:
+                    self._response_cache = ResponseCache(
+                        self.llm_cache_path,
+                        ttl=self.llm_cache_ttl,
+                        max_entries=self.llm_cache_max_entries
+                    )
+        return self._response_cache
+
+    def _cache_for(self, temperature, cache=None):
+        """
+        呼び出しに使用する応答のキャッシュを返します。
+
+        Args:
+            temperature (float): 温度
+            cache (bool, optional): キャッシュを使用するかどうか。指定がない場合はcache_policyに従う
+
+        Returns:
+            ResponseCache or None: 使用しない場合はNone
+        """
+        # 記録モードでは応答をすべて記録するため、キャッシュを使用しない
+        if self.mode != "live":
+            return None
+        if cache is None:
+            if self.cache_policy == "auto":
+                # 温度が0の場合のみ、同じリクエストに同じ応答を返して差し支えない
+                cache = temperature == 0
+            else:
+                cache = self.cache_policy == "on"
+        return self.response_cache if cache else None
+
+    def cache_stats(self):
+        """
+        応答のキャッシュの統計情報を返します。
+
+        Returns:
+            dict: ResponseCache.stats()の結果。キャッシュを一度も使用していない場合は空の辞書
+        """
+        if self._response_cache is None:
+            return {}
+        return self._response_cache.stats()
+
+    def _estimate_tokens(self, openai_model, messages, max_tokens=None):
+        """RPM/TPMの制御に使用するトークン数の見積もり（制御しない場合は数えない）"""
+        if not self.rate_governor.enabled:
+            return 0
+        return self.rate_governor.estimate_tokens(openai_model, messages, max_tokens)
+
+    @staticmethod
+    def _make_request(openai_model, messages, temperature, response_format=None, max_tokens=None):
+        """APIに送信するリクエストの内容（記録・キャッシュのキーとしても使用）"""
+        request = {"model": openai_model, "messages": messages, "temperature": temperature}
+        # 形式や上限を指定しない呼び出しは、従来の記録・キャッシュと同じキーにする
+        if response_format is not None:
+            request["response_format"] = response_format
+        if max_tokens is not None:
+            request["max_completion_tokens"] = max_tokens
+        return request
+
+    def _resolve_route(self, openai_model, stage, temperature, max_tokens):
+        """
+        呼び出しに使用するモデル、温度、応答のトークン数の上限を決定します。
+        openai_modelを指定した場合はそのモデルのみを使用し、温度の既定値は1、上限はなしとします（従来の動作）。
+
+        Args:
+            openai_model (str, optional): モデル名
+            stage (str, optional): 処理段階の名前
+            temperature (float, optional): 温度
+            max_tokens (int, optional): 応答のトークン数の上限
+
+        Returns:
+            tuple: (試す順のモデル名のリスト, 温度, 応答のトークン数の上限)
+        """
+        if openai_model is not None:
+            return [openai_model], 1 if temperature is None else temperature, max_tokens
+        route = self.model_router.route(stage)
+        return (
+            route.models,
+            route.temperature if temperature is None else temperature,
+            route.max_tokens if max_tokens is None else max_tokens
+        )
+
+    @staticmethod
+    def _fallback_model(models, model, error):
+        """過負荷のエラーの場合に、次に試すモデルを返す（切り替えない場合はNone）"""
+        fallback = ModelRouter.next_model(models, model, error)
+        if fallback is not None:
+            print(f"GPT呼び出し時にエラーが発生しました:{error}（{model}から{fallback}に切り替えて再試行します）")
+        return fallback
+
+    @staticmethod
+    def _make_messages(prompt, messages):
+        """messagesの指定がない場合は、プロンプトをシステムメッセージとするメッセージのリストを返す"""
+        if messages is not None:
+            if not messages:
+                raise ValueError("messagesが空です。")
+            return list(messages)
+        if prompt is None:
+            raise ValueError("promptまたはmessagesを指定してください。")
+        return [{"role": "system", "content": prompt}]
+
+    def _settle_usage(self, usage, estimated_tokens, record=None):
+        """応答で報告された使用量を集計し、RPM/TPMの見積もりを補正する（報告がない場合は見積もりどおりとする）"""
+        total_tokens = getattr(usage, "total_tokens", None)
+        self.rate_governor.reconcile(estimated_tokens, estimated_tokens if total_tokens is None else total_tokens)
+        if usage is None:
+            return
+        if record is not None:
+            record.set_usage(usage)
+        details = getattr(usage, "prompt_tokens_details", None)
+        with self._usage_lock:
+            self._token_usage["requests"] += 1
+            self._token_usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            self._token_usage["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+            # プロンプトの先頭がAPI側でキャッシュされていたトークン数
+            self._token_usage["cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+
+    def token_usage(self):
+        """
+        これまでの呼び出しで報告されたトークン数の合計を返します。
+        呼び出しの前後の差分を取ると、その間の使用量を確認できます。
+
+        Returns:
+            dict: requests（使用量が報告された呼び出しの数）、prompt_tokens、completion_tokens、
+                  cached_tokens（API側のプロンプトキャッシュが適用された入力トークン数）、
+                  cached_ratio（入力トークンのうちキャッシュが適用された割合）
+        """
+        with self._usage_lock:
+            usage = dict(self._token_usage)
+        usage["cached_ratio"] = usage["cached_tokens"] / usage["prompt_tokens"] if usage["prompt_tokens"] else 0.0
+        return usage
+
+    def start_turn(self):
+        """
+        1ターン（ユーザーの1回の入力に対する処理）の計測を開始します。
+        次のstart_turnまたはTurnTelemetry.finishまでの呼び出しの計測結果が、返したTurnTelemetryに集計されます。
+
+        Returns:
+            TurnTelemetry: ターンの計測結果（report()で段階ごとの時間とトークン数を表示）
+        """
+        if self.current_turn is not None:
+            self.current_turn.finish()
+        self.current_turn = TurnTelemetry()
+        return self.current_turn
+
+    def _emit_record(self, record, error_kind=None):
+        """
+        呼び出しの終了を記録し、計測結果をシンクと実行中のターンへ送信します。
+        シンクの例外は呼び出しに影響させません。
+
+        Args:
+            record (CallRecord): 計測結果
+            error_kind (str, optional): 失敗した場合のエラーの種類
+        """
+        record.finish(error_kind)
+        turn = self.current_turn
+        if turn is not None and not turn.finished:
+            turn.record(record)
+        try:
+            self.telemetry_sink.record(record)
+        except Exception as e:
+            print(f"計測結果の送信に失敗しました: {str(e)}")
+
+    def _retry_delay(self, error, attempt, report=True):
+        """
+        エラー発生時に、再試行までの待機時間を返します。
+
+        Args:
+            error (Exception): 発生した例外
+            attempt (int): これまでに試行した回数
+            report (bool): 再試行しない場合にもエラーを表示するかどうか
+
+        Returns:
+            float or None: 待機時間（秒）。再試行しない場合はNone
+        """
+        if not self.retry_policy.should_retry(error, attempt):
+            if report:
                 print(f"GPT呼び出し時にエラーが発生しました:{error}")
-                if i == self.retry_limit - 1:
-                    return None  # エラー時はNoneを返す
-                continue
\ No newline at end of file
+            return None
+        delay = self.retry_policy.delay_for(attempt, error)
+        print(f"GPT呼び出し時にエラーが発生しました:{error}（{delay:.1f}秒後に再試行します）")
+        return delay
+
+    def _async_state(self):
+        """実行中のイベントループ用のAsyncOpenAIクライアントと、同時実行数を制限するセマフォを返す"""
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            client = None
+            if self.mode != "replay":
+                client = AsyncOpenAI(
+                    api_key = os.getenv('OPENAI_API_KEY'),
+                    max_retries = 0
+                )
+            self._async_clients[loop] = client
+        return self._async_clients[loop], self._semaphore
+
+    async def aclose(self):
+        """
+        実行中のイベントループ用のAsyncOpenAIクライアントを閉じます。
+        イベントループを終了する前に、そのイベントループの中で呼び出してください。
+        """
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def close(self):
+        """
+        openai_chat_manyで使用するイベントループを、そのAsyncOpenAIクライアントを閉じてから終了し、
+        同期処理用のOpenAIクライアントを閉じます。
+        """
+        self._background.close(self.aclose)
+        if hasattr(self.client, "close"):
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def aopenai_chat(self, openai_model=None, prompt=None, temperature=None, timeout=None, cache=None,
+                           messages=None, response_format=None, stage=None, max_tokens=None):
+        """
+        openai_chatの非同期版。AsyncOpenAIを使用し、同時に実行するリクエスト数は
+        max_concurrencyまでに制限されます（超えた分は空きを待ちます）。
+
+        Args:
+            openai_model (str, optional): モデル名。指定がない場合はstageのルート（model_router）のモデルを使用し、
+                過負荷（レート制限、サーバーエラー、タイムアウト）の場合はフォールバックのモデルに切り替える
+            prompt (str, optional): プロンプト（システムメッセージとして送信）。messagesを指定する場合は不要
+            temperature (float, optional): 温度。指定がない場合はstageのルートの温度（openai_modelを指定した場合は1）
+            timeout (float, optional): 1回のリクエストのタイムアウト（秒）。指定がない場合はrequest_timeout
+            cache (bool, optional): 応答のキャッシュを使用するかどうか。指定がない場合はcache_policyに従う
+            messages (list, optional): メッセージ（role, contentの辞書）のリスト。固定の指示を先頭に、
+                変化する内容を末尾に置くと、API側のプロンプトキャッシュが有効になります
+            response_format (dict, optional): 出力の形式（JSONスキーマなど）。通常はopenai_chat_structuredを使用
+            stage (str, optional): 処理段階の名前（judge, keywords, summarize, analysis, answer など）。
+                モデルの選択と計測結果に使用
+            max_tokens (int, optional): 応答のトークン数の上限。指定がない場合はstageのルートの上限
+                （openai_modelを指定した場合は上限なし）
+
+        Returns:
+            str: 応答のテキスト。エラー時はChatError（偽と評価される空文字列）
+        """
+        models, temperature, max_tokens = self._resolve_route(openai_model, stage, temperature, max_tokens)
+        record = CallRecord(stage, models[0])
+        error_kind = "exception"
+        try:
+            text = await self._achat(record, models, prompt, temperature, max_tokens, timeout, cache, messages,
+                                     response_format)
+            error_kind = text.kind if isinstance(text, ChatError) else None
+            return text
+        except asyncio.CancelledError:
+            error_kind = "cancelled"
+            raise
+        finally:
+            self._emit_record(record, error_kind)
+
+    async def _achat(self, record, models, prompt, temperature, max_tokens, timeout, cache, messages, response_format):
+        """aopenai_chatの本体（計測結果をrecordに記録する）"""
+        call = _ChatCall(self, record, models, prompt, messages, temperature, max_tokens, cache, response_format)
+        found = call.lookup()
+        if found is not None:
+            text, delay = found
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return text
+
+        client, semaphore = self._async_state()
+        while True:
+            await self.rate_governor.aacquire(call.begin_attempt())
+            try:
+                async with semaphore:
+                    response = await client.chat.completions.create(
+                        **call.send(),
+                        timeout=timeout or self.request_timeout
+                    )
+                choice = response.choices[0]
+            except asyncio.CancelledError:
+                # 取り消された呼び出しの分の予約を補正する
+                call.abort()
+                raise
+            except Exception as error:
+                delay = call.retry_delay(error)
+                if delay is None:
+                    return ChatError.from_exception(error, attempts=call.attempt)
+                # 待機中は同時実行数の枠を解放しておく
+                await asyncio.sleep(delay)
+                continue
+            return call.complete(choice.message.content, response.usage, getattr(choice, "finish_reason", None))
+
+    def openai_chat_structured(self, openai_model=None, spec=None, prompt=None, temperature=None, timeout=None,
+                               cache=None, messages=None, max_repairs=None, stage=None, max_tokens=None):
+        """
+        出力の形式（JSONスキーマ）を指定してLLMを呼び出し、解析した値を返します。
+        解析に失敗した場合は、失敗した出力とエラーの内容を示して形式の修正を依頼します
+        （会話全体ではなく、この呼び出しのみを再試行します）。
+
+        Args:
+            openai_model (str, optional): モデル名。指定がない場合はstageのルート（model_router）のモデルを使用し、
+                過負荷（レート制限、サーバーエラー、タイムアウト）の場合はフォールバックのモデルに切り替える
+            spec (OutputSpec): 出力の形式（src.chat.output_specsの定義など）
+            prompt (str, optional): プロンプト（システムメッセージとして送信）。messagesを指定する場合は不要
+            temperature (float, optional): 温度。指定がない場合はstageのルートの温度（openai_modelを指定した場合は1）
+            timeout (float, optional): 1回のリクエストのタイムアウト（秒）。指定がない場合はrequest_timeout
+            cache (bool, optional): 応答のキャッシュを使用するかどうか。指定がない場合はcache_policyに従う
+            messages (list, optional): メッセージ（role, contentの辞書）のリスト
+            max_repairs (int, optional): 修正を依頼する最大の回数。指定がない場合はstructured_output_repairs
+            stage (str, optional): 処理段階の名前。モデルの選択と計測結果に使用。指定がない場合はspec.name
+            max_tokens (int, optional): 応答のトークン数の上限。指定がない場合はstageのルートの上限
+
+        Returns:
+            spec.parseで解析した値。呼び出しまたは解析に失敗した場合はChatError（偽と評価される空文字列）
+        """
+        if spec is None:
+            raise ValueError("specを指定してください。")
+        messages = self._make_messages(prompt, messages)
+        response_format = spec.response_format(self.structured_output_mode)
+        stage = stage or spec.name
+        max_repairs = self.structured_output_repairs if max_repairs is None else max_repairs
+        for _ in range(max_repairs + 1):
+            text = self.openai_chat(
+                openai_model,
+                temperature=temperature,
+                timeout=timeout,
+                cache=cache,
+                messages=messages,
+                response_format=response_format,
+                stage=stage,
+                max_tokens=max_tokens
+            )
+            if isinstance(text, ChatError):
+                return text
+            try:
+                return spec.parse(text)
+            except StructuredOutputError as error:
+                self._discard_cached(openai_model, stage, messages, temperature, max_tokens, response_format, cache)
+                print(f"GPTの出力の解析に失敗しました（{spec.name}）:{error}")
+                parse_error = error
+                messages = messages + self._repair_messages(spec, text, error)
+        return ChatError(kind="parse", message=str(parse_error), attempts=max_repairs + 1, error=parse_error)
+
+    async def aopenai_chat_structured(self, openai_model=None, spec=None, prompt=None, temperature=None, timeout=None,
+                                      cache=None, messages=None, max_repairs=None, stage=None, max_tokens=None):
+        """
+        openai_chat_structuredの非同期版
+
+        Args:
+            openai_model (str, optional): モデル名。指定がない場合はstageのルート（model_router）のモデルを使用し、
+                過負荷（レート制限、サーバーエラー、タイムアウト）の場合はフォールバックのモデルに切り替える
+            spec (OutputSpec): 出力の形式
+            prompt (str, optional): プロンプト（システムメッセージとして送信）。messagesを指定する場合は不要
+            temperature (float, optional): 温度。指定がない場合はstageのルートの温度（openai_modelを指定した場合は1）
+            timeout (float, optional): 1回のリクエストのタイムアウト（秒）
+            cache (bool, optional): 応答のキャッシュを使用するかどうか
+            messages (list, optional): メッセージ（role, contentの辞書）のリスト
+            max_repairs (int, optional): 修正を依頼する最大の回数。指定がない場合はstructured_output_repairs
+            stage (str, optional): 処理段階の名前。モデルの選択と計測結果に使用。指定がない場合はspec.name
+            max_tokens (int, optional): 応答のトークン数の上限。指定がない場合はstageのルートの上限
+
+        Returns:
+            spec.parseで解析した値。呼び出しまたは解析に失敗した場合はChatError
+        """
+        if spec is None:
+            raise ValueError("specを指定してください。")
+        messages = self._make_messages(prompt, messages)
+        response_format = spec.response_format(self.structured_output_mode)
+        stage = stage or spec.name
+        max_repairs = self.structured_output_repairs if max_repairs is None else max_repairs
+        for _ in range(max_repairs + 1):
+            text = await self.aopenai_chat(
+                openai_model,
+                temperature=temperature,
+                timeout=timeout,
+                cache=cache,
+                messages=messages,
+                response_format=response_format,
+                stage=stage,
+                max_tokens=max_tokens
+            )
+            if isinstance(text, ChatError):
+                return text
+            try:
+                return spec.parse(text)
+            except StructuredOutputError as error:
+                self._discard_cached(openai_model, stage, messages, temperature, max_tokens, response_format, cache)
+                print(f"GPTの出力の解析に失敗しました（{spec.name}）:{error}")
+                parse_error = error
+                messages = messages + self._repair_messages(spec, text, error)
+        return ChatError(kind="parse", message=str(parse_error), attempts=max_repairs + 1, error=parse_error)
+
+    @staticmethod
+    def _repair_messages(spec, text, error):
+        """解析に失敗した出力と、形式の修正を依頼するメッセージ"""
+        return [
+            {"role": "assistant", "content": text},
+            {"role": "user", "content": f"前回の出力は指定された形式として解析できませんでした（{error}）。\n{spec.instructions()}"}
+        ]
+
+    def _discard_cached(self, openai_model, stage, messages, temperature, max_tokens, response_format, cache):
+        """解析できなかった応答を、次回以降に再利用しないようキャッシュから削除する"""
+        models, temperature, max_tokens = self._resolve_route(openai_model, stage, temperature, max_tokens)
+        response_cache = self._cache_for(temperature, cache)
+        if response_cache is not None:
+            response_cache.delete(self._make_request(models[0], messages, temperature, response_format, max_tokens))
+
+    def openai_chat_batch(self, calls, timeout=None, metadata=None):
+        """
+        対話的な応答が不要な大量の呼び出しを、Batch APIでまとめて実行します（完了まで最大24時間）。
+        キャッシュにある応答はバッチに含めず、結果は各呼び出しと同じ順に返します。
+        記録モードでは各応答を記録し、再生モードでは記録済みの応答を返します（バッチを送信しない）。
+
+        Args:
+            calls (list): openai_chatの引数の辞書のリスト
+                （promptまたはmessages, 任意でopenai_model, temperature, cache, response_format, stage, max_tokens）。
+                openai_modelの指定がない場合はstageのルートのモデルを使用（Batch APIではフォールバックしない）
+            timeout (float, optional): バッチの完了を待機する最大の秒数
+            metadata (dict, optional): バッチに付与するメタデータ
+
+        Returns:
+            list: 各呼び出しの応答のテキスト（入力順。失敗した呼び出しはChatError）
+        """
+        results = [None] * len(calls)
+        pending = {}
+        for i, call in enumerate(calls):
+            models, temperature, max_tokens = self._resolve_route(
+                call.get("openai_model"), call.get("stage"), call.get("temperature"), call.get("max_tokens")
+            )
+            request = self._make_request(
+                models[0],
+                self._make_messages(call.get("prompt"), call.get("messages")),
+                temperature,
+                call.get("response_format"),
+                max_tokens
+            )
+            record = CallRecord(call.get("stage"), models[0])
+            if self.mode == "replay":
+                record.source = "replay"
+                results[i] = self.fixture_store.require(CHAT_NAMESPACE, request)["response"]
+                self._emit_record(record)
+                continue
+            response_cache = self._cache_for(temperature, call.get("cache"))
+            cached = response_cache.get(request) if response_cache is not None else None
+            if cached is not None:
+                record.source = "cache"
+                results[i] = cached
+                self._emit_record(record)
+                continue
+            # Batch APIの結果には待機時間が含まれ、トークン数は記録しない
+            record.source = "batch"
+            record.attempts = 1
+            pending[f"request-{i}"] = (i, request, response_cache, record)
+
+        if not pending:
+            return results
+        batch_results = self.batch_job().run(
+            {custom_id: request for custom_id, (_, request, _, _) in pending.items()},
+            timeout=timeout,
+            metadata=metadata
+        )
+        for custom_id, (i, request, response_cache, record) in pending.items():
+            text = batch_results[custom_id]
+            results[i] = text
+            if isinstance(text, ChatError):
+                print(f"GPT呼び出し時にエラーが発生しました:{text.message}")
+                self._emit_record(record, text.kind)
+                continue
+            self._emit_record(record)
+            if self.mode == "record":
+                self.fixture_store.put(CHAT_NAMESPACE, request, text)
+            if response_cache is not None:
+                response_cache.set(request, text)
+        return results
+
+    def batch_job(self):
+        """
+        Batch APIを実行するBatchJobを返します（送信と結果の取得を別々に行う場合に使用）。
+
+        Returns:
+            BatchJob: batch_client（指定がない場合はOpenAIクライアント）を使用するBatchJob
+        """
+        client = self.batch_client or self.client
+        if client is None:
+            raise RuntimeError("再生モードでBatch APIを使用する場合は、batch_clientを指定してください。")
+        return BatchJob(client, work_dir=self.batch_dir, poll_interval=self.batch_poll_interval)
+
+    async def agather_chat(self, calls, return_exceptions=False):
+        """
+        複数のaopenai_chatを同時に実行し、結果を入力順に返します。
+
+        Args:
+            calls (list): aopenai_chatの引数の辞書のリスト
+                （例: [{"stage": "summarize", "prompt": "..."}, ...]）。
+                specを含む呼び出しはaopenai_chat_structuredで実行
+            return_exceptions (bool): Trueの場合、例外を結果の位置に格納して返す
+
+        Returns:
+            list: 各呼び出しの応答のテキスト、またはspecで解析した値（入力順。失敗した呼び出しはChatError）
+        """
+        return await asyncio.gather(
+            *[
+                self.aopenai_chat_structured(**call) if "spec" in call else self.aopenai_chat(**call)
+                for call in calls
+            ],
+            return_exceptions=return_exceptions
+        )
+
+    def openai_chat_many(self, calls):
+        """
+        同期処理から複数の呼び出しを同時に実行します。
+        agather_chatを専用のスレッドで動かし続ける1つのイベントループで実行するため、AsyncOpenAIクライアントは
+        呼び出しをまたいで再利用されます（使い終わったらclose()を呼び出してください）。
+        非同期処理の中からは、agather_chatを使用してください。
+
+        Args:
+            calls (list): aopenai_chatの引数の辞書のリスト（specを含む呼び出しはaopenai_chat_structuredで実行）
+
+        Returns:
+            list: 各呼び出しの応答のテキスト、またはspecで解析した値（入力順）
+        """
+        return self._background.run(self.agather_chat(calls))
@@ -0,0 +1,167 @@
+import re
+
+from src.chat.structured_output import OutputSpec, object_schema
+
+# get_prompt.pyの各プロンプトの出力形式。
+# OpenaiAdapter.openai_chat_structuredに指定するか、spec.parse(text)で従来の出力を解析します。
+
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": _STRING}
+
+
+def _parse_decision_tags(text):
+    """<reasoning>と<decision>のタグ形式の出力から判定結果を生成する"""
+    decision = re.search(r"<decision>\s*([01])\s*</decision>", text)
+    if decision is None:
+        return None
+    reasoning = re.search(r"<reasoning>(.*?)</reasoning>", text, re.DOTALL)
+    return {
+        "reasoning": reasoning.group(1).strip() if reasoning else "",
+        "decision": int(decision.group(1)),
+    }
+
+
+def _normalize_decision(value):
+    """decisionが文字列（"0", "1"）の場合は数値に変換する"""
+    if isinstance(value, dict) and isinstance(value.get("decision"), str) and value["decision"].strip() in ("0", "1"):
+        value = dict(value, decision=int(value["decision"].strip()))
+    return value
+
+
+def _wrap_keywords(value):
+    """従来の出力形式（キーワードの配列）をスキーマの形式に変換する"""
+    if isinstance(value, list):
+        return {"keywords": value}
+    return value
+
+
+def _normalize_customer_info(value):
+    """年齢が不明（"不明" など数値以外）の場合はNoneとする"""
+    if isinstance(value, dict) and not isinstance(value.get("age"), (int, type(None))):
+        age = str(value.get("age"))
+        value = dict(value, age=int(age) if age.isdigit() else None)
+    return value
+
+
+_JUDGE_SCHEMA = object_schema({
+    "reasoning": _STRING,
+    "decision": {"type": "integer", "enum": [0, 1]},
+})
+
+# 判定結果は {"reasoning": str, "decision": bool}
+WEB_RESEARCH_JUDGE = OutputSpec(
+    "web_research_judge",
+    _JUDGE_SCHEMA,
+    legacy_parse=_parse_decision_tags,
+    normalize=_normalize_decision,
+    transform=lambda value: {"reasoning": value["reasoning"], "decision": value["decision"] == 1},
+)
+
+INSURANCE_PRODUCT_JUDGE = OutputSpec(
+    "insurance_product_judge",
+    _JUDGE_SCHEMA,
+    legacy_parse=_parse_decision_tags,
+    normalize=_normalize_decision,
+    transform=lambda value: {"reasoning": value["reasoning"], "decision": value["decision"] == 1},
+)
+
+# キーワードは list[str]
+WEB_RESEARCH_KEYWORDS = OutputSpec(
+    "web_research_keywords",
+    object_schema({"keywords": _STRING_LIST}),
+    tag="keywords",
+    normalize=_wrap_keywords,
+    transform=lambda value: value["keywords"],
+)
+
+INSURANCE_PRODUCT_KEYWORDS = OutputSpec(
+    "insurance_product_keywords",
+    object_schema({"keywords": _STRING_LIST}),
+    tag="keywords",
+    normalize=_wrap_keywords,
+    transform=lambda value: value["keywords"],
+)
+
+INSURANCE_PRODUCT_ANALYSIS = OutputSpec(
+    "insurance_product_analysis",
+    object_schema({
+        "company": _STRING,
+        "product_name": _STRING,
+        "category": {"type": "string", "enum": ["生命保険", "医療保険", "がん保険", "学資保険", "unknown"]},
+    }),
+    tag="analysis",
+)
+
+INSURANCE_PRODUCT_REVIEWS = OutputSpec(
+    "insurance_product_reviews",
+    object_schema({
+        "reviews": {
+            "type": "array",
+            "items": object_schema({
+                "content": _STRING,
+                "source": _STRING,
+                "sentiment": {"type": "string", "enum": ["ポジティブ", "ネガティブ", "中立"]},
+            }),
+        },
+        "strengths": _STRING_LIST,
+        "weaknesses": _STRING_LIST,
+    }),
+    tag="analysis",
+)
+
+INSURANCE_PRODUCT_SALES_PITCH = OutputSpec(
+    "insurance_product_sales_pitch",
+    object_schema({"pitch": _STRING}),
+    tag="sales_pitch",
+)
+
+INSURANCE_PRODUCT_SWITCH_PITCH = OutputSpec(
+    "insurance_product_switch_pitch",
+    object_schema({"pitch": _STRING}),
+    tag="switch_pitch",
+)
+
+# 年齢が不明の場合はNone
+CUSTOMER_INFO_ANALYSIS = OutputSpec(
+    "customer_info_analysis",
+    object_schema({
+        "age": {"type": ["integer", "null"]},
+        "gender": _STRING,
+        "family_status": _STRING,
+        "occupation": object_schema({"type": _STRING, "industry": _STRING}),
+        "location": _STRING,
+    }),
+    tag="customer_info",
+    normalize=_normalize_customer_info,
+)
+
+SEARCH_KEYWORDS = OutputSpec(
+    "search_keywords",
+    object_schema({
+        "weather": _STRING,
+        "local": _STRING,
+        "news": _STRING,
+        "seasonal": _STRING,
+    }),
+    tag="search_keywords",
+)
+
+_ICEBREAK_TOPIC = object_schema({
+    "starter": _STRING,
+    "source": _STRING,
+    "insurance_bridge": _STRING,
+})
+
+ICEBREAK_SUGGESTIONS = OutputSpec(
+    "icebreak_suggestions",
+    object_schema({
+        "topics": object_schema({
+            "weather": _ICEBREAK_TOPIC,
+            "local": _ICEBREAK_TOPIC,
+            "news": _ICEBREAK_TOPIC,
+            "seasonal": _ICEBREAK_TOPIC,
+        }),
+        "best_approach": _STRING,
+    }),
+    tag="icebreak_suggestions",
+)
@@ -0,0 +1,277 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from src.tiktoken import count_tokens
+
+# メッセージごとに加算されるトークン数（役割や区切りの分）の目安
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenBucket:
+    """
+    1分あたりの上限を、連続的に回復するトークンとして管理するバケット。
+    実際の使用量で補正した結果、一時的に負の値（使いすぎ）になることがあります。
+    """
+
+    def __init__(self, per_minute):
+        """
+        Args:
+            per_minute (float): 1分あたりの上限
+        """
+        if per_minute <= 0:
+            raise ValueError("per_minuteには正の値を指定してください。")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """
+        amountを取得できるまでの秒数を返します。
+
+        Args:
+            amount (float): 取得する量
+            now (float): 現在時刻（time.monotonic()）
+
+        Returns:
+            float: 待機する秒数（すぐに取得できる場合は0）
+        """
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= amount
+
+    def adjust(self, amount):
+        """見積もりとの差分を補正する（正の値で返却、負の値で追加の消費）"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateGovernor:
+    """
+    OpenAI APIの1分あたりのリクエスト数（RPM）とトークン数（TPM）をクライアント側で制御するクラス。
+    リクエストごとにトークン数を見積もり、両方のバケットに空きができるまで待機してから送信します。
+    待機中のリクエストは到着順に送信し（後から来た小さいリクエストが追い越さない）、
+    応答で報告された実際の使用量（usage）との差分はTPMのバケットに補正します。
+    """
+
+    def __init__(self, rpm=None, tpm=None, default_completion_tokens=1024, poll_interval=0.05):
+        """
+        Args:
+            rpm (int, optional): 1分あたりのリクエスト数の上限。Noneの場合は制限しない
+            tpm (int, optional): 1分あたりのトークン数の上限。Noneの場合は制限しない
+            default_completion_tokens (int): max_tokensの指定がない場合に見積もる応答のトークン数
+            poll_interval (float): 非同期の待機で、順番を確認する間隔（秒）
+        """
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.default_completion_tokens = default_completion_tokens
+        self.poll_interval = poll_interval
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._stats = {
+            "admitted": 0,
+            "waited": 0,
+            "wait_time": 0.0,
+            "max_queue": 0,
+            "estimated_tokens": 0,
+            "actual_tokens": 0,
+        }
+
+    @property
+    def enabled(self):
+        """RPMまたはTPMの上限が設定されているかどうか"""
+        return self.request_bucket is not None or self.token_bucket is not None
+
+    def estimate_tokens(self, model, messages, max_tokens=None):
+        """
+        リクエストが使用するトークン数を見積もります（プロンプトのトークン数 + 応答の上限）。
+
+        Args:
+            model (str): モデル名
+            messages (list): メッセージのリスト
+            max_tokens (int, optional): 応答の上限。指定がない場合はdefault_completion_tokens
+
+        Returns:
+            int: 見積もったトークン数
+        """
+        return self.count_prompt_tokens(model, messages) + (max_tokens or self.default_completion_tokens)
+
+    @staticmethod
+    def count_prompt_tokens(model, messages):
+        """
+        メッセージのトークン数を数えます。
+
+        Args:
+            model (str): モデル名
+            messages (list): メッセージのリスト
+
+        Returns:
+            int: トークン数
+        """
+        text = "".join(str(message.get("content") or "") for message in messages)
+        return RateGovernor.count_text_tokens(model, text) + MESSAGE_OVERHEAD_TOKENS * len(messages)
+
+    @staticmethod
+    def count_text_tokens(model, text):
+        """
+        テキストのトークン数を数えます（ストリームの途中までに受信した応答の使用量の見積もりなどに使用）。
+
+        Args:
+            model (str): モデル名
+            text (str): テキスト
+
+        Returns:
+            int: トークン数
+        """
+        if not text:
+            return 0
+        try:
+            try:
+                return count_tokens(text, model)
+            except KeyError:
+                # tiktokenが対応していないモデル名の場合は、既定のモデルで数える
+                return count_tokens(text)
+        except Exception:
+            # エンコーディングを取得できない場合（オフライン環境など）は、1文字1トークンとして多めに見積もる
+            return len(text)
+
+    def _wait_time(self, tokens):
+        """両方のバケットから取得できるまでの秒数（ロックを取得した状態で呼び出す）"""
+        now = time.monotonic()
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1, now))
+        if self.token_bucket is not None:
+            # 上限を超える見積もりは、バケットが満杯になった時点で送信する（待ち続けないように）
+            wait = max(wait, self.token_bucket.wait_time(min(tokens, self.token_bucket.capacity), now))
+        return wait
+
+    def _try_admit(self, ticket, tokens):
+        """
+        順番が来ていて空きがあれば送信を許可します（ロックを取得した状態で呼び出す）。
+
+        Returns:
+            float or None: 許可した場合は0、順番待ちの場合はNone、空き待ちの場合は待機する秒数
+        """
+        if self._queue[0] is not ticket:
+            return None
+        wait = self._wait_time(tokens)
+        if wait > 0:
+            return wait
+        if self.request_bucket is not None:
+            self.request_bucket.take(1)
+        if self.token_bucket is not None:
+            self.token_bucket.take(tokens)
+        self._queue.popleft()
+        self._stats["admitted"] += 1
+        self._stats["estimated_tokens"] += tokens
+        self._condition.notify_all()
+        return 0.0
+
+    def _enqueue(self):
+        ticket = object()
+        self._queue.append(ticket)
+        self._stats["max_queue"] = max(self._stats["max_queue"], len(self._queue))
+        return ticket
+
+    def _leave(self, ticket):
+        """許可される前に中断した場合に、順番待ちから外す（ロックを取得した状態で呼び出す）"""
+        try:
+            self._queue.remove(ticket)
+        except ValueError:
+            return
+        self._condition.notify_all()
+
+    def _record_wait(self, start_time):
+        waited = time.monotonic() - start_time
+        if waited > 0.001:
+            self._stats["waited"] += 1
+            self._stats["wait_time"] += waited
+
+    def acquire(self, tokens):
+        """
+        送信を許可されるまで待機します。
+
+        Args:
+            tokens (int): 見積もったトークン数
+        """
+        if not self.enabled:
+            return
+        start_time = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue()
+            try:
+                while True:
+                    wait = self._try_admit(ticket, tokens)
+                    if wait == 0.0:
+                        break
+                    # 順番待ちの場合は前のリクエストが許可されるまで、空き待ちの場合は回復するまで待つ
+                    self._condition.wait(timeout=wait)
+            except BaseException:
+                self._leave(ticket)
+                raise
+            self._record_wait(start_time)
+
+    async def aacquire(self, tokens):
+        """
+        acquireの非同期版（待機中はイベントループをブロックしません）。
+
+        Args:
+            tokens (int): 見積もったトークン数
+        """
+        if not self.enabled:
+            return
+        start_time = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue()
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_admit(ticket, tokens)
+                if wait == 0.0:
+                    break
+                await asyncio.sleep(self.poll_interval if wait is None else wait)
+        except BaseException:
+            with self._condition:
+                self._leave(ticket)
+            raise
+        with self._condition:
+            self._record_wait(start_time)
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """
+        見積もったトークン数と実際の使用量の差分をTPMのバケットに補正します。
+
+        Args:
+            estimated_tokens (int): acquireに指定したトークン数
+            actual_tokens (int): 応答で報告された使用量（失敗したリクエストは0）
+        """
+        if not self.enabled:
+            return
+        with self._condition:
+            self._stats["actual_tokens"] += actual_tokens
+            if self.token_bucket is not None:
+                self.token_bucket.adjust(estimated_tokens - actual_tokens)
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        統計情報を返します。
+
+        Returns:
+            dict: 許可したリクエスト数、待機したリクエスト数、待機時間の合計（秒）、最大の待ち行列の長さ、
+                  見積もったトークン数と実際の使用量の合計、現在の待ち行列の長さ
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats["queued"] = len(self._queue)
+        return stats
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+
+from src.chat.event_loops import BackgroundLoop
+from src.chat.output_specs import WEB_RESEARCH_JUDGE, WEB_RESEARCH_KEYWORDS
+from src.chat.retry_policy import ChatError
+
+
+class ResearchPlan:
+    """
+    ResearchOrchestratorの結果。
+    Webリサーチの要否の判定結果、検索キーワード、各キーワードの検索結果をまとめたクラス。
+    """
+
+    def __init__(self, judge, keywords=None, search_results=None, speculative_queries=0, cancelled_queries=0):
+        """
+        Args:
+            judge (dict or ChatError): 判定結果（{"reasoning": str, "decision": bool}）。失敗した場合はChatError
+            keywords (list or ChatError, optional): 検索キーワード。リサーチが不要な場合はNone
+            search_results (list, optional): 各キーワードのsearch_and_standardizeと同じ形式の結果（keywordsと同じ順）
+            speculative_queries (int): 判定の完了前に開始した検索の数
+            cancelled_queries (int): リサーチが不要と判定されたため取り消した検索の数
+        """
+        self.judge = judge
+        self.keywords = keywords
+        self.search_results = search_results or []
+        self.speculative_queries = speculative_queries
+        self.cancelled_queries = cancelled_queries
+
+    @property
+    def needs_research(self):
+        """Webリサーチが必要と判定されたかどうか（判定に失敗した場合はFalse）"""
+        return bool(self.judge) and self.judge["decision"]
+
+    def results(self):
+        """
+        検索キーワードと検索結果の組を返します。
+
+        Returns:
+            list: (キーワード, 検索結果)のリスト
+        """
+        if not self.keywords:
+            return []
+        return list(zip(self.keywords, self.search_results))
+
+
+class ResearchOrchestrator:
+    """
+    Webリサーチの要否の判定と検索キーワードの生成を同時に実行し、検索までを行うクラス。
+
+    判定の完了を待ってからキーワードを生成する場合と比べて、LLMの呼び出し1回分の待ち時間を短縮します。
+    判定より先にキーワードが生成された場合は、最初の検索を投機的に開始し、
+    リサーチが不要と判定された時点でキーワードの生成と検索を取り消します。
+    その場合も送信済みのキーワード生成のトークンは消費されます。
+
+    同期処理から呼び出すplanは、専用のスレッドで動かし続ける1つのイベントループで実行するため、
+    AsyncOpenAIクライアントはターンをまたいで再利用され、検索のキャッシュのバックグラウンドでの
+    更新もターンの終了後に継続します。使い終わったらclose()を呼び出すか、with文で使用してください。
+    """
+
+    # close()で、実行中のタスク（検索のキャッシュの更新など）の完了を待つ最大の秒数
+    SHUTDOWN_TIMEOUT = 10.0
+
+    def __init__(self, adapter, web_search=None, judge_spec=WEB_RESEARCH_JUDGE, keywords_spec=WEB_RESEARCH_KEYWORDS,
+                 speculative_queries=1, search_options=None):
+        """
+        Args:
+            adapter (OpenaiAdapter): LLMの呼び出しに使用するアダプター
+            web_search (WebSearch, optional): 検索に使用するWebSearch。指定がない場合は判定とキーワードの生成のみ行う
+            judge_spec (OutputSpec): 判定結果の出力の形式（{"reasoning", "decision"}に変換されるもの）
+            keywords_spec (OutputSpec): 検索キーワードの出力の形式（キーワードのリストに変換されるもの）
+            speculative_queries (int): 判定の完了前に開始する検索の数（0の場合は投機的に検索しない）
+            search_options (dict, optional): asearch_and_standardizeの引数
+                （scrape_urls, scrape_options, max_results, 検索エンジン固有のパラメータなど）
+        """
+        if speculative_queries < 0:
+            raise ValueError("speculative_queriesには0以上の値を指定してください。")
+        self.logger = logging.getLogger(__name__)
+        self.adapter = adapter
+        self.web_search = web_search
+        self.judge_spec = judge_spec
+        self.keywords_spec = keywords_spec
+        self.speculative_queries = speculative_queries
+        self.search_options = {"pipelined": True, **(search_options or {})}
+        self._background = BackgroundLoop("research-orchestrator")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def aplan(self, judge_messages, keywords_messages):
+        """
+        判定とキーワードの生成を同時に実行し、リサーチが必要な場合は各キーワードで検索します。
+        検索の所要時間は、実行中のターンの計測結果に "web_search" として記録します。
+
+        Args:
+            judge_messages (list): 判定のメッセージ（get_web_research_judge_messagesの結果）
+            keywords_messages (list): キーワード生成のメッセージ（get_web_research_keywords_messagesの結果）
+
+        Returns:
+            ResearchPlan: 判定結果、検索キーワード、検索結果
+        """
+        judge_task = asyncio.create_task(
+            self.adapter.aopenai_chat_structured(spec=self.judge_spec, stage="judge", messages=judge_messages)
+        )
+        keywords_task = asyncio.create_task(
+            self.adapter.aopenai_chat_structured(spec=self.keywords_spec, stage="keywords", messages=keywords_messages)
+        )
+        searches = {}
+        search_start = None
+        try:
+            # 判定より先にキーワードが生成された場合は、判定を待つ間に最初の検索を開始する
+            done, _ = await asyncio.wait([judge_task, keywords_task], return_when=asyncio.FIRST_COMPLETED)
+            if judge_task not in done and self._can_search(keywords_task.result()):
+                for keyword in keywords_task.result()[:self.speculative_queries]:
+                    searches[keyword] = asyncio.create_task(self._asearch(keyword))
+                if searches:
+                    search_start = time.monotonic()
+            judge = await judge_task
+
+            if not (judge and judge["decision"]):
+                cancelled = len(searches)
+                await self._cancel([keywords_task, *searches.values()])
+                return ResearchPlan(judge, speculative_queries=cancelled, cancelled_queries=cancelled)
+
+            keywords = await keywords_task
+            if not self._can_search(keywords):
+                return ResearchPlan(judge, keywords)
+
+            speculative = sum(keyword in searches for keyword in keywords)
+            for keyword in keywords:
+                if keyword not in searches:
+                    searches[keyword] = asyncio.create_task(self._asearch(keyword))
+            search_start = search_start or time.monotonic()
+            search_results = await asyncio.gather(*[searches[keyword] for keyword in keywords])
+            self._record_span(search_start)
+            return ResearchPlan(judge, keywords, search_results, speculative_queries=speculative)
+        except BaseException:
+            await self._cancel([judge_task, keywords_task, *searches.values()])
+            raise
+
+    def plan(self, judge_messages, keywords_messages):
+        """
+        同期処理からaplanを実行します（専用のスレッドのイベントループで実行し、完了を待ちます）。
+        非同期処理の中からは、aplanを使用してください。
+
+        Args:
+            judge_messages (list): 判定のメッセージ
+            keywords_messages (list): キーワード生成のメッセージ
+
+        Returns:
+            ResearchPlan: 判定結果、検索キーワード、検索結果
+        """
+        # Ctrl+Cなどで待機を中断した場合は、実行中の呼び出しと検索も取り消す
+        return self._background.run(self.aplan(judge_messages, keywords_messages))
+
+    def close(self):
+        """
+        planで使用するイベントループを終了します。
+        実行中のタスクの完了をSHUTDOWN_TIMEOUT秒まで待ち（残ったものは取り消す）、
+        AsyncOpenAIクライアントを閉じてからスレッドを停止します。
+        """
+        self._background.close(self._ashutdown)
+
+    async def _ashutdown(self):
+        """実行中のタスクの完了を待ち、イベントループ用のAsyncOpenAIクライアントを閉じる"""
+        pending = asyncio.all_tasks() - {asyncio.current_task()}
+        if pending:
+            _, unfinished = await asyncio.wait(pending, timeout=self.SHUTDOWN_TIMEOUT)
+            if unfinished:
+                self.logger.warning(f"終了時に完了していない{len(unfinished)}件のタスクを取り消します。")
+                await self._cancel(list(unfinished))
+        await self.adapter.aclose()
+
+    def _can_search(self, keywords):
+        """検索を実行できるキーワードの生成結果かどうか判定する"""
+        return self.web_search is not None and bool(keywords) and not isinstance(keywords, ChatError)
+
+    async def _asearch(self, keyword):
+        """1つのキーワードで検索する（失敗した場合は検索結果がないものとして扱う）"""
+        try:
+            return await self.web_search.asearch_and_standardize(keyword, **self.search_options)
+        except Exception as e:
+            self.logger.warning(f"検索に失敗しました: {keyword} ({str(e)})")
+            return {"search_results": [], "scraped_data": None, "snippets_only": False}
+
+    async def _cancel(self, tasks):
+        """
+        未完了のタスクを取り消し、終了を待つ。
+        スレッドで実行中の検索・スクレイピングは中断できないため、結果を使用しないのみとなる。
+        """
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _record_span(self, start):
+        """検索の所要時間を実行中のターンの計測結果に記録する"""
+        turn = self.adapter.current_turn
+        if turn is not None and not turn.finished:
+            turn.add_span("web_search", time.monotonic() - start)
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    LLMの応答のキャッシュ。
+    モデル、メッセージ、温度などのリクエストの内容のハッシュ値をキーとして、応答のテキストをSQLiteファイルに保存します。
+
+    - プロセスを再起動しても再利用できる（同じ判定・キーワード生成・要約の繰り返しを省略）
+    - 有効期限（TTL）
+    - 件数の上限を超えた場合は、最後に参照された時刻が古いものから削除（LRU）
+    - ヒット率などの統計情報
+    """
+
+    DEFAULT_TTL = 7 * 24 * 60 * 60
+
+    def __init__(self, path=".cache/llm_cache.sqlite3", ttl=DEFAULT_TTL, max_entries=5000):
+        """
+        Args:
+            path (str): SQLiteファイルのパス（":memory:" の場合はメモリ上に保持）
+            ttl (float): 有効期限（秒）
+            max_entries (int): 保持する最大件数
+        """
+        if max_entries < 1:
+            raise ValueError("max_entriesには1以上の値を指定してください。")
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "writes": 0,
+        }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(request):
+        """
+        リクエストからキャッシュのキーを生成します。
+
+        Args:
+            request (dict): リクエストの内容（model, messages, temperature など）
+
+        Returns:
+            str: キャッシュのキー（SHA-256のハッシュ値）
+        """
+        serialized = json.dumps(request, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, request):
+        """
+        キャッシュから応答を取得します。
+
+        Args:
+            request (dict): リクエストの内容
+
+        Returns:
+            str or None: 応答のテキスト。キャッシュにない場合、または有効期限切れの場合はNone
+        """
+        key = self.make_key(request)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            response, expires_at = row
+            if expires_at <= now:
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self._stats["misses"] += 1
+                self._stats["expired"] += 1
+                return None
+            self._db.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._stats["hits"] += 1
+        return response
+
+    def set(self, request, response, ttl=None):
+        """
+        応答をキャッシュに保存します。
+
+        Args:
+            request (dict): リクエストの内容
+            response (str): 応答のテキスト
+            ttl (float, optional): 有効期限（秒）。指定がない場合はself.ttl
+        """
+        if not isinstance(response, str):
+            self.logger.warning("文字列以外の応答はキャッシュに保存できません。")
+            return
+        key = self.make_key(request)
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, request.get("model"), response, now, expires_at, now)
+            )
+            self._stats["writes"] += 1
+            self._evict(now)
+            self._db.commit()
+
+    def delete(self, request):
+        """
+        キャッシュから応答を削除します（利用できない応答を再利用しないようにする場合）。
+
+        Args:
+            request (dict): リクエストの内容
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (self.make_key(request),))
+            self._db.commit()
+
+    def _evict(self, now):
+        """有効期限切れの応答と、件数の上限を超えた分の応答を削除する（ロックを取得した状態で呼び出す）"""
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        count = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._stats["evictions"] += overflow
+
+    def stats(self):
+        """
+        キャッシュの統計情報を返します。
+
+        Returns:
+            dict: ヒット数、ミス数、期限切れ数、追い出し数、書き込み数、ヒット率、件数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        requests = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / requests if requests else 0.0
+        return stats
+
+    def clear(self):
+        """キャッシュをすべて削除します"""
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+
+    def close(self):
+        """SQLiteファイルを閉じます"""
+        with self._lock:
+            self._db.close()
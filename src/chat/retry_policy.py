@@ -0,0 +1,302 @@
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+
+import openai
+
+# 一時的なエラーとして再試行するHTTPステータス
+RETRYABLE_STATUS = (408, 409, 429)
+# ステータスごとのエラーの種類
+STATUS_KINDS = {
+    400: "bad_request",
+    401: "auth",
+    403: "permission",
+    404: "not_found",
+    408: "timeout",
+    409: "conflict",
+    422: "bad_request",
+    429: "rate_limit",
+}
+# 429でも、再試行や別のモデルへの切り替えでは回復しない（請求・利用枠の）エラーのコード
+QUOTA_ERROR_CODES = ("insufficient_quota",)
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class ChatError(str):
+    """
+    OpenaiAdapterの呼び出しが失敗した場合に、従来のNoneの代わりに返す結果。
+    空文字列として扱われるため偽と評価され（if response: で判定可能）、
+    "<tag>" in response のような文字列を前提とした処理も例外になりません。
+    失敗の内容はkind, status_code, retryable, attempts, errorで参照できます。
+    """
+
+    def __new__(cls, kind, message, status_code=None, retryable=False, attempts=1, error=None):
+        """
+        Args:
+            kind (str): エラーの種類（"rate_limit", "quota", "timeout", "connection", "server", "auth",
+                "bad_request" など）
+            message (str): エラーの内容
+            status_code (int, optional): HTTPステータス
+            retryable (bool): 一時的なエラー（再試行で回復する可能性がある）かどうか
+            attempts (int): 試行した回数
+            error (Exception, optional): 元の例外
+        """
+        obj = super().__new__(cls, "")
+        obj.kind = kind
+        obj.message = message
+        obj.status_code = status_code
+        obj.retryable = retryable
+        obj.attempts = attempts
+        obj.error = error
+        return obj
+
+    def __repr__(self):
+        return (
+            f"ChatError(kind={self.kind!r}, status_code={self.status_code!r}, "
+            f"attempts={self.attempts}, message={self.message!r})"
+        )
+
+    @classmethod
+    def from_exception(cls, error, attempts=1):
+        """
+        例外からChatErrorを生成します。
+
+        Args:
+            error (Exception): 発生した例外
+            attempts (int): 試行した回数
+
+        Returns:
+            ChatError: エラーの結果
+        """
+        return cls(
+            kind=classify_error(error),
+            message=str(error),
+            status_code=getattr(error, "status_code", None),
+            retryable=is_retryable(error),
+            attempts=attempts,
+            error=error,
+        )
+
+
+class TruncatedResponseError(Exception):
+    """
+    ストリーミングの応答がトークン数の上限で打ち切られた場合に、受信の終了時に送出する例外。
+    resultにtruncation_errorの結果（種類が"length"のChatError）を保持します。
+    """
+
+    def __init__(self, result):
+        """
+        Args:
+            result (ChatError): truncation_errorの結果
+        """
+        super().__init__(result.message)
+        self.result = result
+
+
+def classify_error(error):
+    """
+    例外をエラーの種類に分類します。
+
+    Args:
+        error (Exception): 発生した例外
+
+    Returns:
+        str: エラーの種類
+    """
+    if isinstance(error, TruncatedResponseError):
+        return "length"
+    if isinstance(error, (openai.APITimeoutError, TimeoutError)):
+        return "timeout"
+    if isinstance(error, (openai.APIConnectionError, ConnectionError)):
+        return "connection"
+    status_code = getattr(error, "status_code", None)
+    if isinstance(error, openai.APIStatusError) and status_code is not None:
+        if _is_quota_error(error):
+            return "quota"
+        if status_code >= 500:
+            return "server"
+        return STATUS_KINDS.get(status_code, "api")
+    return "unknown"
+
+
+def _is_quota_error(error):
+    """利用枠の不足（429のうちcodeがinsufficient_quotaのもの）かどうか"""
+    code = getattr(error, "code", None)
+    body = getattr(error, "body", None)
+    if code is None and isinstance(body, dict):
+        # SDKのバージョンによっては、bodyが {"error": {...}} のまま渡される
+        body = body.get("error", body)
+        code = body.get("code") if isinstance(body, dict) else None
+    return code in QUOTA_ERROR_CODES
+
+
+def truncation_error(max_tokens=None, attempts=1):
+    """
+    応答がトークン数の上限で打ち切られた（finish_reasonが"length"の）場合の結果を返します。
+    打ち切られたJSONなどを正常な応答として扱わないよう、エラーの種類を"length"として区別します。
+
+    Args:
+        max_tokens (int, optional): 指定した応答のトークン数の上限。Noneの場合はモデルの上限で打ち切られた
+        attempts (int): 試行した回数
+
+    Returns:
+        ChatError: エラーの結果
+    """
+    limit = f"max_tokens={max_tokens}" if max_tokens is not None else "モデルの上限"
+    return ChatError(
+        kind="length",
+        message=f"応答がトークン数の上限（{limit}）で打ち切られました。",
+        attempts=attempts,
+    )
+
+
+def is_retryable(error):
+    """
+    再試行で回復する可能性があるエラーか判定します。
+    レート制限（429）、サーバーエラー（5xx）、タイムアウト、接続エラーは再試行し、
+    認証エラーや不正なリクエスト、利用枠の不足（429のinsufficient_quota）など、
+    再試行しても結果が変わらないエラーは再試行しません。
+
+    Args:
+        error (Exception): 発生した例外
+
+    Returns:
+        bool: 再試行する場合はTrue
+    """
+    if isinstance(error, (openai.APIConnectionError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        if _is_quota_error(error):
+            return False
+        status_code = error.status_code
+        return status_code in RETRYABLE_STATUS or status_code >= 500
+    return False
+
+
+def parse_duration(value):
+    """
+    レート制限のヘッダーの時間（"1s", "6m0s", "20ms" など）を秒に変換します。
+
+    Args:
+        value (str): ヘッダーの値
+
+    Returns:
+        float or None: 秒数。解釈できない場合はNone
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    matches = _DURATION_PATTERN.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in matches)
+
+
+def retry_after_seconds(error):
+    """
+    エラーの応答ヘッダーから、再試行まで待機する秒数を取得します。
+    retry-after-ms, retry-after（秒数またはHTTP日付）の順に参照し、いずれもない場合は
+    上限に達したx-ratelimit-reset-requests / x-ratelimit-reset-tokensを参照します。
+
+    Args:
+        error (Exception): 発生した例外
+
+    Returns:
+        float or None: 待機する秒数。ヘッダーがない場合はNone
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    resets = []
+    for limit in ("requests", "tokens"):
+        reset = parse_duration(headers.get(f"x-ratelimit-reset-{limit}"))
+        if reset is None:
+            continue
+        # 残りが0の制限がある場合は、その制限が回復するまで待機する
+        exhausted = headers.get(f"x-ratelimit-remaining-{limit}") == "0"
+        resets.append((exhausted, reset))
+    if not resets:
+        return None
+    exhausted_resets = [reset for exhausted, reset in resets if exhausted]
+    return max(exhausted_resets) if exhausted_resets else min(reset for _, reset in resets)
+
+
+class RetryPolicy:
+    """
+    OpenaiAdapterの再試行の方針。
+    一時的なエラーのみを、ジッター付きの指数バックオフ（Full Jitter）で待機してから再試行します。
+    サーバーがRetry-After等のヘッダーで待機時間を指定した場合は、その時間を優先します。
+    """
+
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=30.0, max_retry_after=120.0, seed=None):
+        """
+        Args:
+            max_attempts (int): 最大試行回数（初回を含む）
+            base_delay (float): 1回目の再試行の待機時間の上限（秒）。以降は2倍ずつ増加
+            max_delay (float): バックオフの待機時間の上限（秒）
+            max_retry_after (float): ヘッダーで指定された待機時間の上限（秒）
+            seed (int, optional): ジッターの乱数のシード
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attemptsには1以上の値を指定してください。")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self._random = random.Random(seed)
+
+    def should_retry(self, error, attempt):
+        """
+        再試行するか判定します。
+
+        Args:
+            error (Exception): 発生した例外
+            attempt (int): これまでに試行した回数
+
+        Returns:
+            bool: 再試行する場合はTrue
+        """
+        return attempt < self.max_attempts and is_retryable(error)
+
+    def delay_for(self, attempt, error=None):
+        """
+        次の再試行までの待機時間を返します。
+
+        Args:
+            attempt (int): これまでに試行した回数
+            error (Exception, optional): 発生した例外（ヘッダーの待機時間を参照）
+
+        Returns:
+            float: 待機時間（秒）
+        """
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            # 同時に待機したリクエストが一斉に再送しないよう、わずかにずらす
+            return min(retry_after, self.max_retry_after) + self._random.uniform(0, self.base_delay)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self._random.uniform(0, ceiling)
@@ -0,0 +1,217 @@
+import json
+import re
+
+# 出力の形式の指定方法
+# json_schema: JSONスキーマで出力を制約する / json_object: JSONであることのみを制約する /
+# prompt: 制約せず、プロンプトの指示（タグ）に従った出力から抽出する
+STRUCTURED_OUTPUT_MODES = ("json_schema", "json_object", "prompt")
+
+_CODE_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+class StructuredOutputError(ValueError):
+    """LLMの出力を指定された形式として解析できない場合の例外"""
+
+    def __init__(self, message, text=None):
+        """
+        Args:
+            message (str): エラーの内容
+            text (str, optional): 解析に失敗した出力
+        """
+        super().__init__(message)
+        self.text = text
+
+
+def object_schema(properties):
+    """
+    すべての項目を必須とし、それ以外の項目を許可しないオブジェクトのスキーマを返します
+    （Structured Outputsのstrictモードの要件）。
+
+    Args:
+        properties (dict): 項目名 -> スキーマ
+
+    Returns:
+        dict: オブジェクトのスキーマ
+    """
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def _matches_type(value, name):
+    """値がJSONスキーマの型に一致するか判定する"""
+    # boolはintのサブクラスのため、integer/numberとして扱わない
+    if isinstance(value, bool):
+        return name == "boolean"
+    return isinstance(value, _JSON_TYPES[name])
+
+
+def validate_schema(value, schema, path="$"):
+    """
+    値がスキーマ（type, properties, required, additionalProperties, items, enumのみ対応）に
+    従っているか検証します。
+
+    Args:
+        value: 検証する値
+        schema (dict): JSONスキーマ
+        path (str): エラーメッセージに表示する値の位置
+
+    Raises:
+        StructuredOutputError: スキーマに従っていない場合
+    """
+    types = schema.get("type")
+    if types is not None:
+        types = types if isinstance(types, list) else [types]
+        if not any(_matches_type(value, name) for name in types):
+            raise StructuredOutputError(f"{path} は {'/'.join(types)} である必要があります（{type(value).__name__}）。")
+    if "enum" in schema and value not in schema["enum"]:
+        raise StructuredOutputError(f"{path} は {schema['enum']} のいずれかである必要があります（{value!r}）。")
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            if name not in value:
+                raise StructuredOutputError(f"{path}.{name} がありません。")
+        for name, item in value.items():
+            if name in properties:
+                validate_schema(item, properties[name], f"{path}.{name}")
+            elif schema.get("additionalProperties") is False:
+                raise StructuredOutputError(f"{path}.{name} は定義されていない項目です。")
+    if isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            validate_schema(item, schema["items"], f"{path}[{i}]")
+
+
+def extract_json(text, tag=None):
+    """
+    LLMの出力からJSONを抽出します。
+    出力全体、タグ（<tag>...</tag>）の内側、コードブロックの内側、最初の { または [ から始まるJSONの順に試します。
+
+    Args:
+        text (str): LLMの出力
+        tag (str, optional): JSONを囲むタグ名
+
+    Returns:
+        抽出したJSONの値
+
+    Raises:
+        StructuredOutputError: JSONを抽出できない場合
+    """
+    if not text:
+        raise StructuredOutputError("出力が空です。", text)
+    candidates = [text]
+    if tag:
+        start = text.find(f"<{tag}>")
+        end = text.find(f"</{tag}>")
+        if start != -1 and end > start:
+            candidates.append(text[start + len(tag) + 2:end])
+    candidates.extend(_CODE_FENCE_PATTERN.findall(text))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate.strip())
+        except json.JSONDecodeError:
+            continue
+
+    # 前後に説明文などがある場合は、最初に解析できたJSONを採用する
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"[\[{]", text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+            return value
+        except json.JSONDecodeError:
+            continue
+    raise StructuredOutputError("出力からJSONを抽出できませんでした。", text)
+
+
+class OutputSpec:
+    """
+    プロンプトごとの出力の形式（JSONスキーマ）と、出力を解析する方法をまとめたクラス。
+    OpenaiAdapter.openai_chat_structuredに指定すると、スキーマで出力を制約して解析し、
+    解析に失敗した場合はその呼び出しのみを修正・再試行します。
+    """
+
+    def __init__(self, name, schema, tag=None, legacy_parse=None, normalize=None, transform=None):
+        """
+        Args:
+            name (str): 形式の名前（英数字と_-のみ）
+            schema (dict): 出力のJSONスキーマ（最上位はオブジェクト）
+            tag (str, optional): 従来のプロンプトの出力形式でJSONを囲むタグ名
+            legacy_parse (callable, optional): JSONを抽出できない場合に、出力の文字列から
+                スキーマに従う値を生成する関数（タグ形式のみの出力に対応する場合に指定）
+            normalize (callable, optional): 抽出したJSONをスキーマに合わせて変換する関数
+                （従来の出力形式が配列の場合など）
+            transform (callable, optional): 検証後の値を呼び出し元で使用する形に変換する関数
+        """
+        self.name = name
+        self.schema = schema
+        self.tag = tag
+        self.legacy_parse = legacy_parse
+        self.normalize = normalize
+        self.transform = transform
+
+    def response_format(self, mode="json_schema"):
+        """
+        APIに指定するresponse_formatを返します。
+
+        Args:
+            mode (str): STRUCTURED_OUTPUT_MODESのいずれか
+
+        Returns:
+            dict or None: response_format（promptの場合はNone）
+        """
+        if mode == "json_schema":
+            return {
+                "type": "json_schema",
+                "json_schema": {"name": self.name, "strict": True, "schema": self.schema},
+            }
+        if mode == "json_object":
+            return {"type": "json_object"}
+        if mode == "prompt":
+            return None
+        raise ValueError(f"modeには {', '.join(STRUCTURED_OUTPUT_MODES)} のいずれかを指定してください。")
+
+    def instructions(self):
+        """修正を依頼する際に示す、出力の形式の説明を返す"""
+        return f"次のJSONスキーマに従うJSONのみを出力してください。\n{json.dumps(self.schema, ensure_ascii=False)}"
+
+    def parse(self, text):
+        """
+        LLMの出力を解析し、スキーマで検証した値を返します。
+
+        Args:
+            text (str): LLMの出力
+
+        Returns:
+            解析した値（transformを指定した場合は変換後の値）
+
+        Raises:
+            StructuredOutputError: 解析できない場合、またはスキーマに従っていない場合
+        """
+        try:
+            value = self._validated(extract_json(text, self.tag))
+        except StructuredOutputError as error:
+            # JSONとして解析できない、またはスキーマに従わない場合は従来のタグ形式として解析する
+            legacy_value = self.legacy_parse(text) if self.legacy_parse is not None else None
+            if legacy_value is None:
+                error.text = text
+                raise
+            value = self._validated(legacy_value)
+        return self.transform(value) if self.transform is not None else value
+
+    def _validated(self, value):
+        """normalizeで変換し、スキーマで検証した値を返す"""
+        if self.normalize is not None:
+            value = self.normalize(value)
+        validate_schema(value, self.schema)
+        return value
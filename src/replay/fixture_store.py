@@ -0,0 +1,193 @@
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+class FixtureNotFoundError(RuntimeError):
+    """再生モードで、リクエストに対応する記録済みの応答がない場合の例外"""
+    pass
+
+
+class LatencyProfile:
+    """
+    再生時に模擬する応答時間の分布（対数正規分布）。
+    実際のサービスと同様に、大半は中央値付近で、まれに大きく遅れる応答を再現します。
+    """
+
+    def __init__(self, median, p95=None, seed=None):
+        """
+        Args:
+            median (float): 応答時間の中央値（秒）
+            p95 (float, optional): 応答時間のp95（秒）。指定がない場合は常に中央値を返す
+            seed (int, optional): 乱数のシード（計測を再現する場合に指定）
+        """
+        if median <= 0:
+            raise ValueError("medianには正の値を指定してください。")
+        if p95 is not None and p95 < median:
+            raise ValueError("p95にはmedian以上の値を指定してください。")
+        self.median = median
+        self.p95 = p95
+        self._mu = math.log(median)
+        # 標準正規分布の95パーセンタイル（1.645）からσを決定
+        self._sigma = math.log(p95 / median) / 1.645 if p95 else 0.0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """
+        応答時間を1つ生成します。
+
+        Returns:
+            float: 応答時間（秒）
+        """
+        if not self._sigma:
+            return self.median
+        with self._lock:
+            return self._random.lognormvariate(self._mu, self._sigma)
+
+
+# 計測用の応答時間の目安
+LATENCY_PROFILES = {
+    "google": LatencyProfile(0.5, 1.5),
+    "bing": LatencyProfile(0.6, 1.8),
+    "duckduckgo": LatencyProfile(0.9, 3.0),
+    "gpt-4o": LatencyProfile(4.0, 12.0),
+    "gpt-4o-mini": LatencyProfile(2.0, 6.0),
+}
+
+
+def resolve_latency(latency_profile, fixture):
+    """
+    再生時に待機する秒数を返します。
+
+    Args:
+        latency_profile: None（待機しない）、"recorded"（記録時の応答時間）、
+            LatencyProfile、またはLATENCY_PROFILESのキー
+        fixture (dict): 記録済みの応答
+
+    Returns:
+        float: 待機する秒数
+    """
+    if latency_profile is None:
+        return 0.0
+    if latency_profile == "recorded":
+        return fixture.get("latency") or 0.0
+    if isinstance(latency_profile, str):
+        latency_profile = LATENCY_PROFILES[latency_profile]
+    return latency_profile.sample()
+
+
+class FixtureStore:
+    """
+    記録した応答（フィクスチャ）をリクエストごとにJSONファイルとして保存するストア。
+    root/名前空間/リクエストのハッシュ値.json に保存するため、差分の確認やリポジトリへの追加が容易です。
+    検索エンジン（replay）とOpenaiAdapterの再生モードで使用します。
+    """
+
+    def __init__(self, root="fixtures"):
+        """
+        Args:
+            root (str): フィクスチャを保存するディレクトリ
+        """
+        self.root = root
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(request):
+        """
+        リクエストからキーを生成します。
+
+        Args:
+            request (dict): リクエストの内容（JSONに変換可能なもの）
+
+        Returns:
+            str: キー（SHA-256のハッシュ値）
+        """
+        serialized = json.dumps(request, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _path(self, namespace, request):
+        return os.path.join(self.root, namespace, f"{self.make_key(request)}.json")
+
+    def get(self, namespace, request):
+        """
+        記録済みの応答を取得します。
+
+        Args:
+            namespace (str): 名前空間（"search", "chat" など）
+            request (dict): リクエストの内容
+
+        Returns:
+            dict or None: {"request", "response", "latency", "recorded_at"}。記録がない場合はNone
+        """
+        path = self._path(namespace, request)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def require(self, namespace, request):
+        """
+        記録済みの応答を取得します（記録がない場合は例外）。
+
+        Args:
+            namespace (str): 名前空間
+            request (dict): リクエストの内容
+
+        Returns:
+            dict: 記録済みの応答
+
+        Raises:
+            FixtureNotFoundError: 記録がない場合
+        """
+        fixture = self.get(namespace, request)
+        if fixture is None:
+            raise FixtureNotFoundError(
+                f"記録済みの応答がありません（{namespace}）: {json.dumps(request, ensure_ascii=False, default=str)[:200]}"
+            )
+        return fixture
+
+    def put(self, namespace, request, response, latency=None):
+        """
+        応答を記録します。同じリクエストの記録がある場合は上書きします。
+
+        Args:
+            namespace (str): 名前空間
+            request (dict): リクエストの内容
+            response: 応答（JSONに変換可能なもの）
+            latency (float, optional): 記録時の応答時間（秒）
+        """
+        path = self._path(namespace, request)
+        fixture = {
+            "request": request,
+            "response": response,
+            "latency": latency,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        directory = os.path.dirname(path)
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            # 書き込み途中のファイルを読み込まないよう、一時ファイルに書き込んでから置き換える
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(fixture, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(temp_path, path)
+
+
+def simulate_latency(latency_profile, fixture):
+    """
+    再生時の応答時間を模擬して待機します。
+
+    Args:
+        latency_profile: resolve_latencyと同じ
+        fixture (dict): 記録済みの応答
+    """
+    delay = resolve_latency(latency_profile, fixture)
+    if delay > 0:
+        time.sleep(delay)
@@ -0,0 +1,154 @@
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+# 属性を持たない要素で共有する空の属性
+EMPTY_ATTRIBUTES = MappingProxyType({})
+
+
+class HtmlNode(tuple):
+    """
+    html_to_jsonが生成するHTML要素ノード。
+    (タグ名, 属性, 子ノードのリスト) の3要素タプルで、タグ名はインターンして保持します。
+    要素ごとに辞書を生成する場合よりもメモリ使用量が小さく、json.dumpsにそのまま渡すと
+    [tag, attributes, children] の配列としてC実装のエンコーダーで高速に出力されます。
+    属性を持たない要素の属性はNoneとして保持します。
+
+    従来の辞書形式と同じキー（"tag", "attributes", "children"）での参照、get()、in、keys()にも対応します。
+    ただし反復・len()・アンパックはタプルとしての動作となるため、辞書として扱う必要がある場合は、子ノードを必要になった時点で変換するas_dict()、
+    または木全体を変換するto_dict()を使用します。
+    """
+
+    __slots__ = ()
+    KEYS = ('tag', 'attributes', 'children')
+
+    def __new__(cls, tag: str, attributes: Optional[Dict[str, Any]] = None,
+                children: Optional[List[Union['HtmlNode', str]]] = None):
+        """
+        Args:
+            tag (str): タグ名
+            attributes (Dict[str, Any], optional): 保持する属性
+            children (List[Union[HtmlNode, str]], optional): 子ノード（要素ノードまたはテキスト）
+        """
+        return tuple.__new__(cls, (
+            sys.intern(tag),
+            attributes or None,
+            children if children is not None else []
+        ))
+
+    def __getitem__(self, key):
+        # 従来の辞書形式のキーでの参照に対応
+        if isinstance(key, str):
+            if key == 'tag':
+                return tuple.__getitem__(self, 0)
+            if key == 'attributes':
+                return tuple.__getitem__(self, 1) or EMPTY_ATTRIBUTES
+            if key == 'children':
+                return tuple.__getitem__(self, 2)
+            raise KeyError(key)
+        return tuple.__getitem__(self, key)
+
+    def __getnewargs__(self):
+        # copy.deepcopyとpickleで、__new__に渡す引数を復元する
+        return tuple(self)
+
+    def __contains__(self, key) -> bool:
+        # 従来の辞書形式と同様に、キーの有無を判定する
+        return key in self.KEYS
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        従来の辞書形式のキーで値を取得します。
+
+        Args:
+            key (str): "tag", "attributes", "children" のいずれか
+            default (Any): キーが存在しない場合の値
+
+        Returns:
+            Any: キーに対応する値
+        """
+        if key in self.KEYS:
+            return self[key]
+        return default
+
+    def keys(self):
+        """従来の辞書形式のキーを返します。"""
+        return self.KEYS
+
+    def __repr__(self) -> str:
+        return f"HtmlNode(tag={self.tag!r}, attributes={dict(self.attributes)!r}, children={len(self.children)})"
+
+    @property
+    def tag(self) -> str:
+        """タグ名"""
+        return tuple.__getitem__(self, 0)
+
+    @property
+    def attributes(self) -> Mapping:
+        """保持している属性（属性がない場合は空のMapping）"""
+        return tuple.__getitem__(self, 1) or EMPTY_ATTRIBUTES
+
+    @property
+    def children(self) -> List[Union['HtmlNode', str]]:
+        """子ノードのリスト"""
+        return tuple.__getitem__(self, 2)
+
+    def as_dict(self) -> 'HtmlNodeDict':
+        """
+        従来の辞書形式として読み取れるビューを返します。
+        子ノードはアクセスされた時点でビューに変換されます。
+
+        Returns:
+            HtmlNodeDict: 辞書形式のビュー
+        """
+        return HtmlNodeDict(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        子孫ノードを含めて従来の辞書形式に変換します。
+
+        Returns:
+            Dict[str, Any]: 辞書形式のHTML構造
+        """
+        tag, attributes, children = self
+        return {
+            "tag": tag,
+            "attributes": dict(attributes) if attributes else {},
+            "children": [
+                child if isinstance(child, str) else child.to_dict()
+                for child in children
+            ]
+        }
+
+
+class HtmlNodeDict(Mapping):
+    """
+    HtmlNodeを従来の辞書形式 {"tag": ..., "attributes": ..., "children": [...]} として
+    読み取るための遅延変換ビュー。
+    """
+
+    __slots__ = ('node',)
+
+    def __init__(self, node: HtmlNode):
+        """
+        Args:
+            node (HtmlNode): 対象のノード
+        """
+        self.node = node
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'children':
+            return [
+                child if isinstance(child, str) else HtmlNodeDict(child)
+                for child in self.node.children
+            ]
+        if key == 'attributes':
+            return dict(self.node.attributes)
+        return self.node[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(HtmlNode.KEYS)
+
+    def __len__(self) -> int:
+        return len(HtmlNode.KEYS)
@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ScrapeMetrics:
+    """
+    1URL分のスクレイピング計測結果を保持するクラス。
+    各処理段階の所要時間（秒）と、バイト数・ノード数などのカウント値を記録します。
+    """
+
+    # 記録対象となる処理段階（表示順）
+    STAGES = [
+        'connect',           # DNS解決・接続・レスポンスヘッダー受信まで
+        'download',          # レスポンスボディの受信
+        'charset_detection', # 文字コードの判定とデコード
+        'parse',             # BeautifulSoupによるHTML解析
+        'cleanup',           # 不要要素の削除
+        'json_build',        # JSON構造の構築
+        'markdown',          # Markdownへの変換
+        'save',              # ファイルへの保存
+    ]
+
+    def __init__(self, url: str):
+        """
+        Args:
+            url (str): 計測対象のURL
+        """
+        self.url = url
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.success = False
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        with文で囲んだ処理の所要時間を指定の段階に加算します。
+
+        Args:
+            name (str): 処理段階の名前
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        カウント値を加算します。
+
+        Args:
+            name (str): カウント対象の名前
+            value (int): 加算する値
+        """
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    @property
+    def total_time(self) -> float:
+        """全段階の所要時間の合計（秒）"""
+        return sum(self.timings.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """計測結果を辞書形式で返します。"""
+        return {
+            "url": self.url,
+            "success": self.success,
+            "timings": dict(self.timings),
+            "counts": dict(self.counts),
+            "total_time": self.total_time,
+        }
+
+
+class MetricsSink:
+    """
+    計測結果の送信先の基底クラス。何もしないシンクとしても利用できます。
+    """
+
+    def record(self, metrics: ScrapeMetrics) -> None:
+        """
+        1URL分の計測結果を受け取ります。
+
+        Args:
+            metrics (ScrapeMetrics): 計測結果
+        """
+        pass
+
+
+class CallbackMetricsSink(MetricsSink):
+    """計測結果を任意のコールバック関数に渡すシンク"""
+
+    def __init__(self, callback: Callable[[ScrapeMetrics], None]):
+        """
+        Args:
+            callback (Callable[[ScrapeMetrics], None]): 計測結果を受け取る関数
+        """
+        self.callback = callback
+
+    def record(self, metrics: ScrapeMetrics) -> None:
+        self.callback(metrics)
+
+
+class LoggingMetricsSink(MetricsSink):
+    """計測結果をloggingで出力するシンク"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        """
+        Args:
+            logger (logging.Logger, optional): 出力先のロガー
+            level (int): ログレベル
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def record(self, metrics: ScrapeMetrics) -> None:
+        timings = " ".join(
+            f"{name}={metrics.timings[name]:.3f}s"
+            for name in ScrapeMetrics.STAGES if name in metrics.timings
+        )
+        counts = " ".join(f"{name}={value}" for name, value in metrics.counts.items())
+        self.logger.log(
+            self.level,
+            f"スクレイピング計測: {metrics.url} success={metrics.success} "
+            f"total={metrics.total_time:.3f}s {timings} {counts}".rstrip()
+        )
+
+
+class PrometheusMetricsSink(MetricsSink):
+    """
+    Prometheus形式のカウンターとヒストグラムを集計するシンク。
+    外部ライブラリには依存せず、render()でテキスト形式のメトリクスを出力します。
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, prefix: str = "webscraper", buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            prefix (str): メトリクス名の接頭辞
+            buckets (Iterable[float]): ヒストグラムのバケット境界（秒）
+        """
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # カウンター: (名前, ラベル) -> 値
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        # ヒストグラム: 段階名 -> [バケットごとの件数, 合計, 件数]
+        self.histograms: Dict[str, List[Any]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        カウンターを加算します。
+
+        Args:
+            name (str): カウンター名
+            value (float): 加算する値
+            **labels: ラベル
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        処理段階の所要時間をヒストグラムに記録します。
+
+        Args:
+            stage (str): 処理段階の名前
+            seconds (float): 所要時間（秒）
+        """
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self.histograms[stage] = histogram
+            histogram[0][bisect_left(self.buckets, seconds)] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def record(self, metrics: ScrapeMetrics) -> None:
+        self.inc("requests_total", status="success" if metrics.success else "failure")
+        for name, value in metrics.counts.items():
+            self.inc(f"{name}_total", value)
+        for stage, seconds in metrics.timings.items():
+            self.observe(stage, seconds)
+
+    def render(self) -> str:
+        """
+        集計結果をPrometheusのテキスト形式で返します。
+
+        Returns:
+            str: テキスト形式のメトリクス
+        """
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{self.prefix}_{name}{label_text} {value}")
+
+            metric = f"{self.prefix}_stage_seconds"
+            for stage, (bucket_counts, total, count) in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {total}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
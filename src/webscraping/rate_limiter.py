@@ -1,4 +1,5 @@
 from urllib.parse import urlparse
+import threading
 import time
 from collections import defaultdict
 # import asyncio
@@ -12,6 +13,7 @@ class RateLimiter:
         self.last_request_time = defaultdict(float)
         self.default_delay = default_delay
         self.last_domain = None  # 直前にリクエストしたドメインを保持
+        self.lock = threading.Lock()  # 複数スレッドから使用する場合の排他制御
         # self.lock = asyncio.Lock()  # 非同期ロック
 
     def wait_if_needed(self, url):
@@ -21,18 +23,22 @@ class RateLimiter:
             url (str): リクエスト先のURL
         """
         domain = urlparse(url).netloc
-        current_time = time.time()
+        wait_time = 0
         
-        # 直前のリクエストが同じドメインだった場合のみ待機
-        if domain == self.last_domain:
-            elapsed_time = current_time - self.last_request_time[domain]
-            if elapsed_time < self.default_delay:
-                wait_time = self.default_delay - elapsed_time
-                time.sleep(wait_time)
+        with self.lock:
+            current_time = time.time()
+            # 直前のリクエストが同じドメインだった場合のみ待機
+            if domain == self.last_domain:
+                elapsed_time = current_time - self.last_request_time[domain]
+                if elapsed_time < self.default_delay:
+                    wait_time = self.default_delay - elapsed_time
+            
+            # 待機後にリクエストする時刻を記録（同時に呼び出した他のスレッドはこの時刻を基準に待機する）
+            self.last_request_time[domain] = current_time + wait_time
+            self.last_domain = domain
         
-        # 現在の情報を記録
-        self.last_request_time[domain] = current_time
-        self.last_domain = domain 
+        if wait_time > 0:
+            time.sleep(wait_time)
 
     # async def wait_if_needed_async(self, url):
     #     """同じドメインに連続してリクエストする場合のみ、非同期で待機時間を確保する
@@ -0,0 +1,84 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ScrapeScheduler:
+    """
+    複数の検索クエリのスクレイピングを1つのスレッドプールで実行するスケジューラ。
+    URLが判明した時点で登録すれば、他のクエリの検索やスクレイピングと並行して実行され、
+    全体の同時実行数はmax_workersに制限されます。
+    実行中の同じURL（同じオプション）が再度登録された場合は、実行中の処理の結果を共有します。
+    """
+
+    def __init__(self, scraper, max_workers=8):
+        """
+        Args:
+            scraper (WebScraper): スクレイピングに使用するWebScraper
+            max_workers (int): 同時に実行するスクレイピングの上限
+        """
+        self.logger = logging.getLogger(__name__)
+        self.scraper = scraper
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, url, output_dir="scraped_data", save_json=True, save_markdown=True,
+               exclude_links=False, max_depth=20):
+        """
+        URLのスクレイピングを登録します。
+
+        Args:
+            url (str): スクレイピング対象のURL
+            output_dir (str): 保存先ディレクトリ
+            save_json (bool): JSONとして保存するかどうか
+            save_markdown (bool): Markdownとして保存するかどうか
+            exclude_links (bool): リンクテキストを除外するかどうか
+            max_depth (int): HTMLの解析を行う最大の深さ
+
+        Returns:
+            concurrent.futures.Future: WebScraper.scrape_and_saveの結果を返すFuture
+        """
+        key = (url, output_dir, save_json, save_markdown, exclude_links, max_depth)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(
+                self.scraper.scrape_and_save,
+                url,
+                output_dir=output_dir,
+                save_json=save_json,
+                save_markdown=save_markdown,
+                exclude_links=exclude_links,
+                max_depth=max_depth
+            )
+            self._in_flight[key] = future
+
+        def done(finished):
+            with self._lock:
+                if self._in_flight.get(key) is finished:
+                    del self._in_flight[key]
+
+        future.add_done_callback(done)
+        return future
+
+    def stats(self):
+        """
+        スケジューラの状態を返します。
+
+        Returns:
+            dict: 同時実行数の上限と、登録済みで未完了のスクレイピングの件数
+        """
+        with self._lock:
+            return {"max_workers": self.max_workers, "pending": len(self._in_flight)}
+
+    def shutdown(self, wait=True):
+        """
+        スレッドプールを終了します。
+
+        Args:
+            wait (bool): 実行中のスクレイピングの完了を待つかどうか
+        """
+        self._executor.shutdown(wait=wait)
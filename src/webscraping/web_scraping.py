@@ -1,6 +1,6 @@
 import requests
 from bs4 import BeautifulSoup, NavigableString, Comment
-from typing import Dict, Optional, Union, Any, Tuple, List, Set
+from typing import Dict, Optional, Union, Any, Tuple, List, Set, Iterable
 import logging
 import re
 from urllib.parse import urlparse, urljoin
@@ -8,11 +8,36 @@ import json
 from datetime import datetime
 import os
 from .rate_limiter import RateLimiter
+from .metrics import MetricsSink, ScrapeMetrics
+from .html_node import HtmlNode
+from src.replay.fixture_store import FixtureNotFoundError, simulate_latency
 # import asyncio
 # import aiohttp
 import chardet
+import threading
 import time
 
+class _ThreadLocalOption:
+    """
+    スレッドごとに値を保持するインスタンス属性。
+    scrape_urlは除外オプションを一時的に書き換えるため、複数スレッドから同じWebScraperを
+    使用しても互いの設定に干渉しないようにする。値を設定していないスレッドでは既定値を返す。
+    """
+
+    def __init__(self, default):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return getattr(instance._thread_options, self.name, self.default)
+
+    def __set__(self, instance, value):
+        setattr(instance._thread_options, self.name, value)
+
 class WebScraper:
     # クラス変数としてリストを定義
     UNWANTED_TAGS = ['script', 'style', 'meta', 'link', 'noscript']
@@ -27,15 +52,16 @@ class WebScraper:
     PARAGRAPH_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol']
     CONTENT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li']
     EMPTY_HEADING_MARKERS = ["#", "##", "###", "####", "#####", "######"]
+    HEADING_ONLY_LINES = frozenset(EMPTY_HEADING_MARKERS)
+    # 取得したHTMLを記録・再生する際のフィクスチャの名前空間
+    SCRAPE_NAMESPACE = "scrape"
+    # JSON構造に保持する属性（json_to_markdownが参照するのはhrefのみ）
+    DEFAULT_ATTRIBUTE_WHITELIST = ('href',)
     
     # 正規表現パターンを事前コンパイル（すべてクラス変数として定義）
     URL_PATH_PATTERN = re.compile(r'^https?://|^/[a-zA-Z0-9/]')
     SYMBOL_SEMICOLON_PATTERN = re.compile(r'^[^\w\s].*?[^\w\s]$')
-    CONSECUTIVE_NEWLINES_PATTERN = re.compile(r'\n{3,}')
-    INDENT_PATTERN = re.compile(r'^(\s*)')
     CONSECUTIVE_SPACES_PATTERN = re.compile(r' {4,}')
-    HEADING_ONLY_PATTERN = re.compile(r'^#{1,6}\s*$')
-    HEADING_START_PATTERN = re.compile(r'^#{1,6}')
     INVALID_FILENAME_CHARS_PATTERN = re.compile(r'[<>:"/\\|?*\s]')
     
     # 文字化け検出用パターンもクラス変数として定義
@@ -49,15 +75,37 @@ class WebScraper:
     ]
     JAPANESE_CHARS_PATTERN = re.compile(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]')
     
-    def __init__(self, verify_ssl=True):
+    # 除外オプション（スレッドごとに保持）
+    exclude_links = _ThreadLocalOption(False)
+    exclude_symbol_semicolon = _ThreadLocalOption(False)
+    exclude_garbled = _ThreadLocalOption(False)
+    
+    def __init__(self, verify_ssl=True, metrics_sink: Optional[MetricsSink] = None,
+                 attribute_whitelist: Optional[Iterable[str]] = DEFAULT_ATTRIBUTE_WHITELIST,
+                 fixture_recorder=None, replay_store=None, replay_latency_profile=None):
         """
         WebScraperクラスの初期化
         
         Args:
             verify_ssl (bool): SSLの検証を行うかどうか。デフォルトはTrue
+            metrics_sink (MetricsSink, optional): URLごとの処理段階別の計測結果の送信先。
+                指定がない場合は計測結果を破棄します
+            attribute_whitelist (Iterable[str], optional): JSON構造に保持する属性名。
+                Noneを指定するとすべての属性を保持します。デフォルトはhrefのみ
+            fixture_recorder (FixtureStore, optional): 指定した場合、URLごとに取得したHTMLを記録する
+            replay_store (FixtureStore, optional): 指定した場合、HTMLを取得せずに記録済みのHTMLを使用する
+                （オフラインでの計測用。HTMLの解析とMarkdownへの変換は通常どおり実行）
+            replay_latency_profile: 再生時に模擬する応答時間。None（待機しない）、"recorded"（記録時の応答時間）、
+                LatencyProfile、またはLATENCY_PROFILESのキー
         """
         self.verify_ssl = verify_ssl
+        self.fixture_recorder = fixture_recorder
+        self.replay_store = replay_store
+        self.replay_latency_profile = replay_latency_profile
+        self.attribute_whitelist = tuple(attribute_whitelist) if attribute_whitelist is not None else None
         self.logger = logging.getLogger(__name__)
+        self.metrics_sink = metrics_sink or MetricsSink()
+        self._thread_options = threading.local()
         self.exclude_links = False
         self.exclude_symbol_semicolon = False  # 記号で始まり;で終わる要素を除外
         self.exclude_garbled = False  # 文字化けした要素を除外
@@ -79,7 +127,8 @@ class WebScraper:
     def scrape_url(self, url: str, exclude_links: bool = False, 
                   exclude_symbol_semicolon: bool = True,
                   exclude_garbled: bool = True,
-                  max_depth: int = 10) -> Optional[Dict[str, Any]]:
+                  max_depth: int = 10,
+                  metrics: Optional[ScrapeMetrics] = None) -> Optional[Dict[str, Any]]:
         """
         URLからHTMLを取得し、各形式のデータを返します。
 
@@ -89,14 +138,21 @@ class WebScraper:
             exclude_symbol_semicolon (bool): 記号で始まり;で終わる要素を除外するかどうか
             exclude_garbled (bool): 文字化けした要素を除外するかどうか
             max_depth (int): HTMLの解析を行う最大の深さ
+            metrics (ScrapeMetrics, optional): 計測結果の記録先。指定した場合は
+                呼び出し元が計測結果をシンクへ送信します
             
         Returns:
             Optional[Dict[str, Any]]: 以下の情報を含む辞書
                 - raw_html: 取得した生のHTMLデータ
-                - json_data: HTMLをJSON形式に変換したデータ
+                - json_data: HTMLをJSON形式に変換したデータ（HtmlNode）
                 - markdown_data: JSONをMarkdown形式に変換したデータ
                 失敗時はNone
         """
+        # 計測結果の記録先が渡されなかった場合は、このメソッド内で送信まで行う
+        owns_metrics = metrics is None
+        if owns_metrics:
+            metrics = ScrapeMetrics(url)
+
         # 一時的に除外オプションの値を保存
         original_exclude_links = self.exclude_links
         original_exclude_symbol_semicolon = self.exclude_symbol_semicolon
@@ -107,14 +163,17 @@ class WebScraper:
         self.exclude_garbled = exclude_garbled
 
         try:
-            raw_html = self.fetch_html(url)
+            raw_html = self.fetch_html(url, metrics=metrics)
             if raw_html is None:
                 return None
                 
             # HTMLをJSONに変換（max_depthを渡す）
-            json_data = self.html_to_json(raw_html, max_depth=max_depth)
+            json_data = self.html_to_json(raw_html, max_depth=max_depth, metrics=metrics)
             # JSONをMarkdownに変換
-            markdown_data = self.json_to_markdown(json_data)
+            with metrics.stage('markdown'):
+                markdown_data = self.json_to_markdown(json_data)
+            metrics.count('markdown_chars', len(markdown_data))
+            metrics.success = True
             
             return {
                 "raw_html": raw_html,
@@ -126,6 +185,20 @@ class WebScraper:
             self.exclude_links = original_exclude_links
             self.exclude_symbol_semicolon = original_exclude_symbol_semicolon
             self.exclude_garbled = original_exclude_garbled
+            if owns_metrics:
+                self._emit_metrics(metrics)
+
+    def _emit_metrics(self, metrics: ScrapeMetrics) -> None:
+        """
+        計測結果をシンクへ送信します。シンクの例外はスクレイピングに影響させません。
+        
+        Args:
+            metrics (ScrapeMetrics): 送信する計測結果
+        """
+        try:
+            self.metrics_sink.record(metrics)
+        except Exception as e:
+            self.logger.warning(f"計測結果の送信に失敗しました: {str(e)}")
 
     # async def scrape_url_async(self, url: str, exclude_links: bool = False, 
     #               exclude_symbol_semicolon: bool = True,
@@ -181,52 +254,91 @@ class WebScraper:
     #         self.exclude_symbol_semicolon = original_exclude_symbol_semicolon
     #         self.exclude_garbled = original_exclude_garbled
 
-    def fetch_html(self, url: str) -> Optional[str]:
+    def fetch_html(self, url: str, metrics: Optional[ScrapeMetrics] = None) -> Optional[str]:
         """
         指定されたURLからHTMLを取得します。
+        replay_storeを指定した場合は記録済みのHTMLを返し、
+        fixture_recorderを指定した場合は取得結果（失敗した場合はNone）を記録します。
         
         Args:
             url (str): スクレイピング対象のURL
+            metrics (ScrapeMetrics, optional): 計測結果の記録先
             
         Returns:
             Optional[str]: 取得したHTML。エラーの場合はNone
         """
+        metrics = metrics or ScrapeMetrics(url)
+        request = {"url": url}
+        if self.replay_store is not None:
+            try:
+                fixture = self.replay_store.require(self.SCRAPE_NAMESPACE, request)
+            except FixtureNotFoundError as e:
+                self.logger.warning(str(e))
+                return None
+            with metrics.stage('connect'):
+                simulate_latency(self.replay_latency_profile, fixture)
+            return fixture["response"]
+        
+        start_time = time.monotonic()
+        text = self._download_html(url, metrics)
+        if self.fixture_recorder is not None:
+            try:
+                self.fixture_recorder.put(self.SCRAPE_NAMESPACE, request, text, latency=time.monotonic() - start_time)
+            except Exception as e:
+                self.logger.warning(f"HTMLの記録に失敗しました: {str(e)}")
+        return text
+
+    def _download_html(self, url: str, metrics: ScrapeMetrics) -> Optional[str]:
+        """fetch_htmlの本体（HTTPでHTMLを取得し、文字コードを判定する）"""
         retries = 0
         while retries < self.max_retries:
             try:
                 # リクエスト前に待機時間を確保
                 self.rate_limiter.wait_if_needed(url)
                 
-                response = self.session.get(
-                    url,
-                    verify=self.verify_ssl,
-                    timeout=self.request_timeout
-                )
-                response.raise_for_status()
-                
-                # エンコーディングの処理
-                encoding = None
-                
-                # Content-Typeヘッダーからエンコーディングを取得
-                content_type = response.headers.get('content-type', '').lower()
-                if 'charset=' in content_type:
-                    encoding = content_type.split('charset=')[-1]
-                
-                # レスポンスのエンコーディングがISO-8859-1の場合、または未設定の場合
-                if not encoding or response.encoding.lower() == 'iso-8859-1':
-                    # chardetを使用してエンコーディングを推測
-                    raw_content = response.content
-                    encoding_result = chardet.detect(raw_content)
-                    if encoding_result and encoding_result['encoding']:
-                        encoding = encoding_result['encoding']
-                
-                if encoding:
-                    response.encoding = encoding
-                
-                return response.text
+                # ヘッダー受信までを接続時間、ボディの受信をダウンロード時間として計測
+                with metrics.stage('connect'):
+                    response = self.session.get(
+                        url,
+                        verify=self.verify_ssl,
+                        timeout=self.request_timeout,
+                        stream=True
+                    )
+                try:
+                    response.raise_for_status()
+                    with metrics.stage('download'):
+                        raw_content = response.content
+                    metrics.count('bytes', len(raw_content))
+                    
+                    with metrics.stage('charset_detection'):
+                        # エンコーディングの処理
+                        encoding = None
+                    
+                        # Content-Typeヘッダーからエンコーディングを取得
+                        content_type = response.headers.get('content-type', '').lower()
+                        if 'charset=' in content_type:
+                            encoding = content_type.split('charset=')[-1]
+                    
+                        # レスポンスのエンコーディングがISO-8859-1の場合、または未設定の場合
+                        if not encoding or response.encoding.lower() == 'iso-8859-1':
+                            # chardetを使用してエンコーディングを推測
+                            encoding_result = chardet.detect(raw_content)
+                            if encoding_result and encoding_result['encoding']:
+                                encoding = encoding_result['encoding']
+                    
+                        if encoding:
+                            response.encoding = encoding
+                    
+                        text = response.text
+                    metrics.count('html_chars', len(text))
+                    return text
+                finally:
+                    # 失敗した場合も接続をプールに返す（stream=Trueでは本文を読み切るまで解放されない）
+                    response.close()
                 
             except requests.RequestException as e:
                 retries += 1
+                metrics.count('retries')
                 if retries < self.max_retries:
                     self.logger.warning(f"リトライ {retries}/{self.max_retries}: {str(e)}")
                     time.sleep(self.retry_delay)
@@ -291,27 +403,58 @@ class WebScraper:
     #                 self.logger.error(f"HTMLの非同期取得に失敗しました: {str(e)}")
                     return None
 
-    def html_to_json(self, html: str, max_depth: int = 10) -> Dict[str, Any]:
+    def html_to_json(self, html: str, max_depth: int = 10,
+                     metrics: Optional[ScrapeMetrics] = None) -> Optional[HtmlNode]:
         """
         HTMLをJSON形式に変換します。
         
         Args:
             html (str): 変換対象のHTML文字列
             max_depth (int): HTMLの解析を行う最大の深さ
+            metrics (ScrapeMetrics, optional): 計測結果の記録先
             
         Returns:
-            Dict[str, Any]: JSON形式に変換されたHTML構造
+            Optional[HtmlNode]: JSON形式に変換されたHTML構造。
+                辞書形式が必要な場合はHtmlNode.as_dict()またはto_dict()を使用します
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        metrics = metrics or ScrapeMetrics("")
+        with metrics.stage('parse'):
+            soup = BeautifulSoup(html, 'html.parser')
         
         # 不要な要素を削除
-        self._remove_unwanted_elements(soup)
+        with metrics.stage('cleanup'):
+            self._remove_unwanted_elements(soup)
+        
+        with metrics.stage('json_build'):
+            # html要素を取得
+            html_element = soup.find('html')
+            if html_element:
+                json_data = self._parse_node(html_element, max_depth=max_depth)
+            else:
+                json_data = self._parse_node(soup, max_depth=max_depth)
+        metrics.count('json_nodes', self._count_nodes(json_data))
+        return json_data
+
+    def _count_nodes(self, json_data: Union[HtmlNode, Dict[str, Any], str, None]) -> int:
+        """
+        JSON形式のHTML構造に含まれるノード数（要素とテキスト）を数えます。
         
-        # html要素を取得
-        html_element = soup.find('html')
-        if html_element:
-            return self._parse_node(html_element, max_depth=max_depth)
-        return self._parse_node(soup, max_depth=max_depth)
+        Args:
+            json_data: html_to_jsonで生成したデータ
+            
+        Returns:
+            int: ノード数
+        """
+        if not json_data:
+            return 0
+        count = 0
+        stack = [json_data]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if not isinstance(node, str):
+                stack.extend(node["children"])
+        return count
 
     def _remove_unwanted_elements(self, soup: BeautifulSoup) -> None:
         """
@@ -378,7 +521,7 @@ class WebScraper:
         except UnicodeError:
             return True
 
-    def _parse_node(self, node: Any, current_depth: int = 0, max_depth: int = 10) -> Union[Dict[str, Any], str, None]:
+    def _parse_node(self, node: Any, current_depth: int = 0, max_depth: int = 10) -> Union[HtmlNode, str, None]:
         """
         HTMLノードを再帰的にパースしてJSON形式に変換します。
         不要な要素は除外します。最大深度を超えた要素は削除されます。
@@ -389,7 +532,7 @@ class WebScraper:
             max_depth (int): 最大再帰深度
             
         Returns:
-            Union[Dict[str, Any], str, None]: パースされたノードの構造、または深度超過時はNone
+            Union[HtmlNode, str, None]: パースされたノードの構造、または深度超過時はNone
         """
         # 最大深度に達した場合、Noneを返して要素を削除
         if current_depth >= max_depth:
@@ -429,38 +572,42 @@ class WebScraper:
         if node.name in self.UNWANTED_TAGS:
             return ""
 
-        attrs = dict(node.attrs) if node.attrs else {}
-        # class属性をリストから文字列に変換
-        if "class" in attrs and isinstance(attrs["class"], list):
-            attrs["class"] = " ".join(attrs["class"])
-
-        result = {
-            "tag": node.name,
-            "attributes": attrs,
-            "children": []
-        }
+        # ホワイトリストに含まれる属性のみを保持
+        attrs = None
+        if node.attrs:
+            if self.attribute_whitelist is None:
+                attrs = dict(node.attrs)
+            else:
+                attrs = {name: node.attrs[name] for name in self.attribute_whitelist if name in node.attrs}
+            # class属性をリストから文字列に変換
+            if "class" in attrs and isinstance(attrs["class"], list):
+                attrs["class"] = " ".join(attrs["class"])
 
         # 子ノードを再帰的にパース（深度を増加させて）
+        children = []
         for child in node.children:
             child_result = self._parse_node(child, current_depth + 1, max_depth)
             if child_result:  # 空文字列や None の場合は追加しない
-                if isinstance(child_result, str) and child_result.strip():
-                    result["children"].append(child_result.strip())
-                elif isinstance(child_result, dict):
-                    result["children"].append(child_result)
+                if isinstance(child_result, str):
+                    child_result = child_result.strip()
+                    if child_result:
+                        children.append(child_result)
+                else:
+                    children.append(child_result)
 
-        # 子要素が空の場合はNoneを返す
-        if not result["children"] and not result["attributes"]:
+        # 子要素も属性もない場合はNoneを返す
+        # Markdownの出力を変えないよう、ホワイトリスト適用前の属性の有無で判定する
+        if not children and not node.attrs:
             return None
 
-        return result
+        return HtmlNode(node.name, attrs, children)
 
-    def json_to_markdown(self, json_data: Dict[str, Any], level: int = 0) -> str:
+    def json_to_markdown(self, json_data: Union[HtmlNode, Dict[str, Any], str], level: int = 0) -> str:
         """
         JSON形式のHTML構造をMarkdown形式に変換します。
         
         Args:
-            json_data (Dict[str, Any]): 変換対象のJSON形式データ
+            json_data (Union[HtmlNode, Dict[str, Any], str]): 変換対象のJSON形式データ
             level (int): 現在の階層レベル（インデント用）
 
         Returns:
@@ -471,9 +618,12 @@ class WebScraper:
             return json_data
 
         result = []
-        tag = json_data["tag"]
-        attrs = json_data["attributes"]
-        children = json_data["children"]
+        if isinstance(json_data, HtmlNode):
+            tag, attrs, children = json_data
+        else:
+            tag = json_data["tag"]
+            attrs = json_data["attributes"]
+            children = json_data["children"]
 
         # 特定のタグに応じたMarkdown要素を生成
         if tag == "h1":
@@ -491,7 +641,7 @@ class WebScraper:
         elif tag == "p":
             prefix = ""
         elif tag == "a":
-            href = attrs.get("href", "")
+            href = attrs.get("href", "") if attrs else ""
             # リンクの子要素を処理
             child_texts = [
                 text for text in (self.json_to_markdown(child, level + 1) for child in children)
@@ -570,65 +720,60 @@ class WebScraper:
         """
         Markdownテキストを整形します。
         
+        先頭から1行ずつ1回だけ走査し、判定を次の非空行まで保留する必要がある
+        「見出し記号のみの行」と「空白のみの行」は状態として保持します。
+        
         Args:
             markdown (str): 整形対象のMarkdownテキスト
             
         Returns:
             str: 整形されたMarkdownテキスト
         """
-        # 連続する改行を1つの改行に置換
-        markdown = self.CONSECUTIVE_NEWLINES_PATTERN.sub('\n\n', markdown)
-        
-        # 行ごとに処理
-        lines = markdown.split('\n')
         cleaned_lines = []
+        # 次の非空行が見出しかどうかで残すかが決まる、見出し記号のみの行
+        pending_heading = None
+        # 直前に空白のみの行があったかどうか（連続する空行は1つにまとめる）
+        pending_blank = False
         
-        for i, line in enumerate(lines):
-            # 連続する空白を4つまでに制限
-            # 行頭のインデントは保持
-            indent_match = self.INDENT_PATTERN.match(line)
-            indent = indent_match.group(1) if indent_match else ''
-            content = line[len(indent):]
+        for line in markdown.split('\n'):
+            stripped = line.strip()
             
-            # インデントは8スペースまで許可（タブ2個相当）
-            if len(indent) > 4:
-                indent = indent[:4]
-                
-            # 行の内容の連続空白を4つまでに制限
-            content = self.CONSECUTIVE_SPACES_PATTERN.sub('    ', content)
-            line = indent + content
+            # 空白のみの行は、次の非空行が来るまで判定を保留
+            if not stripped:
+                pending_blank = True
+                continue
             
-            # 空白のみの行をスキップ
-            if not line.strip():
-                # 前後の行をチェックして、必要な場合のみ空行を保持
-                prev_line = cleaned_lines[-1] if cleaned_lines else ""
-                next_line = lines[i+1] if i+1 < len(lines) else ""
-                
-                # 段落区切りとして必要な場合のみ空行を追加
-                # 前の行が見出しや段落で、次の行にも内容がある場合
-                if (prev_line.strip().startswith('#') or 
-                    prev_line.strip()) and next_line.strip():
+            # 保留中の見出し記号のみの行は、次の非空行が見出しでなければ残す
+            if pending_heading is not None:
+                if stripped[0] != '#':
+                    cleaned_lines.append(pending_heading)
+                pending_heading = None
+            
+            # 段落区切りとして必要な場合のみ空行を追加
+            # 前の行に内容があり、次の行（この行）にも内容がある場合
+            if pending_blank:
+                if cleaned_lines and cleaned_lines[-1]:
                     cleaned_lines.append("")
+                pending_blank = False
+            
+            # 行頭のインデントは4文字まで保持
+            indent_length = len(line) - len(line.lstrip())
+            content = line[indent_length:]
+            # 行の内容の連続空白を4つまでに制限
+            if '     ' in content:
+                content = self.CONSECUTIVE_SPACES_PATTERN.sub('    ', content)
+            line = line[:min(indent_length, 4)] + content
+            
+            # 見出し記号のみの行は、次の非空行まで判定を保留
+            if stripped in self.HEADING_ONLY_LINES:
+                pending_heading = line
                 continue
-                
-            # 見出し行の場合
-            if self.HEADING_ONLY_PATTERN.match(line.strip()):
-                # 次の非空行までチェック
-                next_non_empty = None
-                for next_line in lines[i+1:]:
-                    if next_line.strip():
-                        next_non_empty = next_line
-                        break
-                
-                # 次の非空行が見出しの場合、現在の見出しをスキップ
-                if next_non_empty and self.HEADING_START_PATTERN.match(next_non_empty.strip()):
-                    continue
             
             cleaned_lines.append(line)
         
-        # 最後の空行を削除
-        while cleaned_lines and not cleaned_lines[-1].strip():
-            cleaned_lines.pop()
+        # 文書末尾の見出し記号のみの行は、後続に見出しがないため残す
+        if pending_heading is not None:
+            cleaned_lines.append(pending_heading)
             
         return '\n'.join(cleaned_lines)
 
@@ -660,17 +805,55 @@ class WebScraper:
                 - json_file: 保存したJSONファイルのパス（保存した場合）
                 - markdown_file: 保存したMarkdownファイルのパス（保存した場合）
         """
+        results = {}
+
+        for url in urls:
+            results[url] = self.scrape_and_save(
+                url,
+                output_dir=output_dir,
+                save_json=save_json,
+                save_markdown=save_markdown,
+                exclude_links=exclude_links,
+                max_depth=max_depth
+            )
+
+        return results
+
+    def scrape_and_save(
+        self,
+        url: str,
+        output_dir: str = "scraped_data",
+        save_json: bool = True,
+        save_markdown: bool = True,
+        exclude_links: bool = False,
+        max_depth: int = 20
+    ) -> Dict[str, Union[Dict[str, Any], str, None]]:
+        """
+        1つのURLをスクレイピングし、結果を保存します。
+        複数のスレッドから同時に呼び出すことができます（ScrapeSchedulerから使用）。
+
+        Args:
+            url (str): スクレイピング対象のURL
+            output_dir (str): 保存先ディレクトリ
+            save_json (bool): JSONとして保存するかどうか
+            save_markdown (bool): Markdownとして保存するかどうか
+            exclude_links (bool): リンクテキストを除外するかどうか
+            max_depth (int): HTMLの解析を行う最大の深さ
+        Returns:
+            Dict[str, Union[Dict[str, Any], str, None]]: scrape_multiple_urlsの各URLの値と同じ形式の辞書
+                （失敗時は各値がNone）
+        """
         # ファイルを保存する場合のみディレクトリを作成
         if save_json or save_markdown:
             os.makedirs(output_dir, exist_ok=True)
-        results = {}
 
-        for url in urls:
-            self.logger.info(f"スクレイピング開始: {url}")
-            result = self.scrape_url(url, exclude_links, max_depth=max_depth)
-            
-            if result:
-                # ファイルに保存
+        self.logger.info(f"スクレイピング開始: {url}")
+        metrics = ScrapeMetrics(url)
+        result = self.scrape_url(url, exclude_links, max_depth=max_depth, metrics=metrics)
+        
+        if result:
+            # ファイルに保存
+            with metrics.stage('save'):
                 json_file, md_file = self.save_results(
                     result["json_data"],
                     url,
@@ -678,23 +861,24 @@ class WebScraper:
                     save_json=save_json,
                     save_markdown=save_markdown
                 )
-                
-                results[url] = {
-                    **result,
-                    "json_file": json_file,
-                    "markdown_file": md_file
-                }
-            else:
-                self.logger.error(f"スクレイピング失敗: {url}")
-                results[url] = {
-                    "raw_html": None,
-                    "json_data": None,
-                    "markdown_data": None,
-                    "json_file": None,
-                    "markdown_file": None
-                }
+            
+            entry = {
+                **result,
+                "json_file": json_file,
+                "markdown_file": md_file
+            }
+        else:
+            self.logger.error(f"スクレイピング失敗: {url}")
+            entry = {
+                "raw_html": None,
+                "json_data": None,
+                "markdown_data": None,
+                "json_file": None,
+                "markdown_file": None
+            }
+        self._emit_metrics(metrics)
 
-        return results
+        return entry
 
     # async def scrape_multiple_urls_async(
     #     self,
@@ -779,7 +963,7 @@ class WebScraper:
 
     def save_results(
         self,
-        result: dict,
+        result: Union[HtmlNode, dict],
         url: str,
         output_dir: str,
         save_json: bool = True,
@@ -820,7 +1004,9 @@ class WebScraper:
         if save_json:
             json_filename = f"{output_dir}/{safe_name}_{timestamp}.json"
             with open(json_filename, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+                # ファイルには従来の辞書形式で保存する
+                json.dump(result.to_dict() if isinstance(result, HtmlNode) else result,
+                          f, ensure_ascii=False, indent=2)
             self.logger.info(f"JSONを保存しました: {json_filename}")
 
         if save_markdown:
@@ -918,7 +1104,8 @@ class WebScraper:
     def _save_json_file(self, file_path: str, data: dict) -> None:
         """JSONファイルを保存するヘルパーメソッド"""
         with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            json.dump(data.to_dict() if isinstance(data, HtmlNode) else data,
+                      f, ensure_ascii=False, indent=2)
 
     def _save_markdown_file(self, file_path: str, markdown_data: str) -> None:
         """Markdownファイルを保存するヘルパーメソッド"""
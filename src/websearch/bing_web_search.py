@@ -1,9 +1,11 @@
 import os
+import httpx
 import requests
 from dotenv import load_dotenv
 
 class BingWebSearch:
     BASE_URL = "https://api.bing.microsoft.com/v7.0/search"
+    REQUEST_TIMEOUT = 30  # 非同期版のリクエストのタイムアウト（秒）
 
     def __init__(self, api_key=None):
         load_dotenv()
@@ -34,4 +36,29 @@ class BingWebSearch:
 
         response = requests.get(self.BASE_URL, headers=headers, params=search_params)
         response.raise_for_status()
-        return response.json() 
\ No newline at end of file
+        return response.json()
+
+    async def asearch(self, query, **params):
+        """
+        searchの非同期版。httpxを使用してイベントループをブロックせずに検索を実行します
+        
+        Args:
+            query (str): 検索クエリ
+            **params: その他の検索パラメータ（mkt, count等）
+            
+        Returns:
+            dict: 検索結果
+        """
+        headers = {
+            "Ocp-Apim-Subscription-Key": self.api_key
+        }
+
+        search_params = {
+            "q": query,
+            **params
+        }
+
+        async with httpx.AsyncClient(timeout=self.REQUEST_TIMEOUT) as client:
+            response = await client.get(self.BASE_URL, headers=headers, params=search_params)
+        response.raise_for_status()
+        return response.json()
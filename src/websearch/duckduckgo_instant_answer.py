@@ -1,7 +1,75 @@
 # %%
+import asyncio
+import logging
+import threading
 from duckduckgo_search import DDGS
 
+try:
+    # AsyncDDGSはバージョンによって提供されていないため、ない場合はスレッドで実行する
+    from duckduckgo_search import AsyncDDGS
+except ImportError:
+    AsyncDDGS = None
+
+try:
+    from duckduckgo_search.exceptions import RatelimitException
+except ImportError:
+    RatelimitException = None
+
+SEARCH_TYPES = ("text", "images", "news", "videos")
+
 class DuckDuckGoInstantAnswer:
+    """
+    duckduckgo-searchライブラリによる検索エンジン。
+    DDGSクライアントはスレッドごとに初回の検索時に生成して使い回し（接続を再利用）、
+    通信エラーが発生した場合は再生成して1回だけ再試行します。
+    DDGSはスレッドセーフではないため、スレッドごとに別のクライアントを使用し、
+    複数スレッドからの検索は並列に実行されます（同時実行数はWebSearchのengine_limitsで制限）。
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        # close()で終了するため、生成したクライアントを保持する
+        self._clients = []
+        self._clients_lock = threading.Lock()
+
+    def _get_client(self):
+        """実行中のスレッド用のDDGSクライアントを返す（未生成の場合は生成）"""
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            ddgs = DDGS()
+            self._local.ddgs = ddgs
+            with self._clients_lock:
+                self._clients.append(ddgs)
+        return ddgs
+
+    def _reset_client(self):
+        """実行中のスレッド用のDDGSクライアントを破棄する（次回の検索時に再生成）"""
+        ddgs = getattr(self._local, "ddgs", None)
+        self._local.ddgs = None
+        if ddgs is None:
+            return
+        with self._clients_lock:
+            if ddgs in self._clients:
+                self._clients.remove(ddgs)
+        self._close_client(ddgs)
+
+    def _close_client(self, ddgs):
+        """DDGSクライアントを終了する（終了の失敗は検索に影響させない）"""
+        if hasattr(ddgs, "__exit__"):
+            try:
+                ddgs.__exit__(None, None, None)
+            except Exception as e:
+                self.logger.warning(f"DDGSクライアントの終了に失敗しました: {str(e)}")
+
+    def close(self):
+        """すべてのスレッドのDDGSクライアントを終了します（以降の検索では新しいクライアントを生成）。"""
+        with self._clients_lock:
+            clients, self._clients = self._clients, []
+            self._local = threading.local()
+        for ddgs in clients:
+            self._close_client(ddgs)
+
     def search(self, query, search_type="text", region="jp-jp", safesearch="off", timelimit=None, max_results=4):
         """
         duckduckgo-searchライブラリを使用して検索を実行します。
@@ -18,26 +86,65 @@ class DuckDuckGoInstantAnswer:
         Returns:
             list: 検索結果（各要素は dict）
         """
-        with DDGS() as ddgs:
-            search_functions = {
-                "text": ddgs.text,
-                "images": ddgs.images,
-                "news": ddgs.news,
-                "videos": ddgs.videos,
-            }
-            
-            if search_type not in search_functions:
-                raise ValueError("Invalid search_type. Choose from: " + ", ".join(search_functions.keys()))
+        if search_type not in SEARCH_TYPES:
+            raise ValueError("Invalid search_type. Choose from: " + ", ".join(SEARCH_TYPES))
+        
+        for attempt in range(2):
+            ddgs = self._get_client()
+            try:
+                return list(getattr(ddgs, search_type)(
+                    keywords=query,
+                    region=region,
+                    safesearch=safesearch,
+                    timelimit=timelimit,
+                    max_results=max_results
+                ))
+            except Exception as e:
+                # レート制限は再接続しても解消しないため、そのまま送出する
+                if RatelimitException is not None and isinstance(e, RatelimitException):
+                    raise
+                self._reset_client()
+                if attempt:
+                    raise
+                self.logger.warning(f"DuckDuckGoでの検索に失敗したため、再接続して再試行します: {str(e)}")
+
+    async def asearch(self, query, search_type="text", region="jp-jp", safesearch="off", timelimit=None, max_results=4):
+        """
+        searchの非同期版。AsyncDDGSと検索の種類に対応する非同期メソッド（atextなど）が利用できる場合はそれを使用し、
+        利用できない場合（AsyncDDGSを提供しないバージョンなど）は同期版をスレッドで実行します。
+        
+        Args:
+            query (str): 検索クエリ
+            search_type (str): 検索の種類（"text", "images", "news", "videos"）
+            region (str): 地域設定 (例: "jp-jp")
+            safesearch (str): セーフサーチ設定 ("off", "on", "moderate")
+            timelimit (str or None): 期間指定
+            max_results (int): 取得件数
             
-            results = list(search_functions[search_type](
+        Returns:
+            list: 検索結果（各要素は dict）
+        """
+        if search_type not in SEARCH_TYPES:
+            raise ValueError("Invalid search_type. Choose from: " + ", ".join(SEARCH_TYPES))
+        
+        method_name = "a" + search_type
+        if AsyncDDGS is None or not hasattr(AsyncDDGS, method_name):
+            return await asyncio.to_thread(
+                self.search, query, search_type=search_type, region=region,
+                safesearch=safesearch, timelimit=timelimit, max_results=max_results
+            )
+        
+        # AsyncDDGSはイベントループに紐づくため、検索ごとに生成する
+        async with AsyncDDGS() as ddgs:
+            results = await getattr(ddgs, method_name)(
                 keywords=query,
                 region=region,
                 safesearch=safesearch,
                 timelimit=timelimit,
                 max_results=max_results
-            ))
+            )
         
-        return results
+        return list(results or [])
     
 if __name__ == "__main__":
     ddg = DuckDuckGoInstantAnswer()
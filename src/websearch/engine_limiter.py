@@ -0,0 +1,275 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import date
+
+
+class QuotaExceededError(RuntimeError):
+    """検索エンジンの1日あたりのクエリ数の上限に達した場合の例外"""
+    pass
+
+
+class _Slots:
+    """
+    スレッドとasyncioの両方から待機できる同時実行数の枠。
+    空きを待つ呼び出しには到着順に枠を割り当て、asyncioからの待機はイベントループをブロックしません。
+    """
+
+    def __init__(self, value):
+        """
+        Args:
+            value (int): 同時実行数の上限
+        """
+        self.value = value
+        self._in_use = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """枠に空きができるまでスレッドで待機して取得する"""
+        with self._lock:
+            if self._in_use < self.value and not self._waiters:
+                self._in_use += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        try:
+            event.wait()
+        except BaseException:
+            self._abandon(event)
+            raise
+
+    async def aacquire(self):
+        """枠に空きができるまでイベントループをブロックせずに待機して取得する"""
+        with self._lock:
+            if self._in_use < self.value and not self._waiters:
+                self._in_use += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except BaseException:
+            self._abandon(future)
+            raise
+
+    def _abandon(self, waiter):
+        """待機を中断した場合に、待ち行列から外すか、譲り受けた枠を返却する"""
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return
+        # 待ち行列にない場合は枠を譲られている（取り消されたfutureに譲られた枠は、_grantが次の待機者に譲る）
+        if isinstance(waiter, threading.Event) or not waiter.cancelled():
+            self.release()
+
+    def release(self):
+        """枠を返却する（待機しているものがあれば、到着順に譲る）"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                try:
+                    waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+                    return
+                except RuntimeError:
+                    # 待機していたイベントループが終了している場合は、次の待機者に譲る
+                    continue
+            self._in_use -= 1
+
+    def _grant(self, future):
+        """待機者のイベントループで、譲られた枠を受け取らせる"""
+        if future.done():
+            self.release()
+            return
+        future.set_result(None)
+
+
+class EngineLimiter:
+    """
+    1つの検索エンジンに対するリクエストを制御するクラス。
+    - 同時実行数の上限
+    - 1秒あたりのクエリ数の上限（トークンバケット方式。qps件までのバーストを許容）
+    - 1日あたりのクエリ数の集計と上限
+    スレッドからの呼び出し（acquire/slot）とasyncioからの呼び出し（aacquire/aslot）で
+    同じ上限を共有します。
+    1日あたりのクエリ数は待機の前に予約し、送信前に中断した場合（取り消しなど）は返却します。
+    """
+
+    def __init__(self, max_concurrency=None, qps=None, daily_quota=None):
+        """
+        Args:
+            max_concurrency (int, optional): 同時実行数の上限。Noneの場合は制限しない
+            qps (float, optional): 1秒あたりのクエリ数の上限。Noneの場合は制限しない
+            daily_quota (int, optional): 1日あたりのクエリ数の上限。Noneの場合は集計のみ行う
+        """
+        self.max_concurrency = max_concurrency
+        self.qps = qps
+        self.daily_quota = daily_quota
+        self._slots = _Slots(max_concurrency) if max_concurrency else None
+        self._lock = threading.Lock()
+        self._capacity = max(1.0, float(qps)) if qps else None
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._quota_date = date.today()
+        self._used_today = 0
+        self._in_flight = 0
+
+    def _reserve_quota(self, cost):
+        """1日あたりの上限を確認し、使用数を加算する"""
+        with self._lock:
+            today = date.today()
+            if today != self._quota_date:
+                self._quota_date = today
+                self._used_today = 0
+            if self.daily_quota is not None and self._used_today + cost > self.daily_quota:
+                raise QuotaExceededError(
+                    f"1日あたりのクエリ数の上限（{self.daily_quota}件）に達しました。"
+                )
+            self._used_today += cost
+
+    def _refund_quota(self, cost):
+        """送信前に中断したリクエストの分の使用数を返却する"""
+        with self._lock:
+            if date.today() == self._quota_date:
+                self._used_today = max(0, self._used_today - cost)
+
+    def _take_token(self, cost):
+        """トークンを消費する。足りない場合は消費せず、貯まるまでの待ち時間（秒）を返す"""
+        if self._capacity is None:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self.qps)
+            self._last_refill = now
+            # バケットの容量を超えるコストは、満杯になった時点で許可する
+            needed = min(cost, self._capacity)
+            if self._tokens >= needed:
+                self._tokens -= needed
+                return 0
+            return (needed - self._tokens) / self.qps
+
+    def _wait_for_token(self, cost):
+        """トークンが貯まるまで待機し、消費する"""
+        while True:
+            wait_time = self._take_token(cost)
+            if not wait_time:
+                return
+            time.sleep(wait_time)
+
+    async def _await_token(self, cost):
+        """トークンが貯まるまでイベントループをブロックせずに待機し、消費する"""
+        while True:
+            wait_time = self._take_token(cost)
+            if not wait_time:
+                return
+            await asyncio.sleep(wait_time)
+
+    def acquire(self, cost=1):
+        """
+        リクエストの実行枠を確保します（上限に達している場合は待機）。
+
+        Args:
+            cost (int): このリクエストが消費するクエリ数（ページ分割して取得する場合など）
+
+        Raises:
+            QuotaExceededError: 1日あたりの上限に達している場合
+        """
+        self._reserve_quota(cost)
+        try:
+            if self._slots is not None:
+                self._slots.acquire()
+            try:
+                self._wait_for_token(cost)
+            except BaseException:
+                if self._slots is not None:
+                    self._slots.release()
+                raise
+        except BaseException:
+            self._refund_quota(cost)
+            raise
+        with self._lock:
+            self._in_flight += 1
+
+    async def aacquire(self, cost=1):
+        """
+        acquireのasyncio版。待機中もイベントループをブロックしません。
+
+        Args:
+            cost (int): このリクエストが消費するクエリ数
+
+        Raises:
+            QuotaExceededError: 1日あたりの上限に達している場合
+        """
+        self._reserve_quota(cost)
+        try:
+            if self._slots is not None:
+                # スレッドからの利用と上限を共有する
+                await self._slots.aacquire()
+            try:
+                await self._await_token(cost)
+            except BaseException:
+                if self._slots is not None:
+                    self._slots.release()
+                raise
+        except BaseException:
+            # 取り消された場合など、送信前に中断した分のクエリ数を返却する
+            self._refund_quota(cost)
+            raise
+        with self._lock:
+            self._in_flight += 1
+
+    def release(self):
+        """acquireで確保した実行枠を解放します。"""
+        with self._lock:
+            self._in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    @contextmanager
+    def slot(self, cost=1):
+        """
+        with文の間、実行枠を確保します。
+
+        Args:
+            cost (int): このリクエストが消費するクエリ数
+        """
+        self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, cost=1):
+        """
+        async with文の間、実行枠を確保します。
+
+        Args:
+            cost (int): このリクエストが消費するクエリ数
+        """
+        await self.aacquire(cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """
+        使用状況を返します。
+
+        Returns:
+            dict: 本日の使用数、上限、残り、実行中の件数
+        """
+        with self._lock:
+            remaining = None if self.daily_quota is None else max(0, self.daily_quota - self._used_today)
+            return {
+                "used_today": self._used_today,
+                "daily_quota": self.daily_quota,
+                "remaining_today": remaining,
+                "in_flight": self._in_flight,
+            }
@@ -0,0 +1,147 @@
+import asyncio
+import importlib
+import inspect
+import logging
+import threading
+from importlib import metadata
+
+
+class EngineRegistry:
+    """
+    検索エンジンを遅延初期化で管理するレジストリ。
+    各エンジンは初めて使用されたときにimportおよび初期化されるため、
+    使用しないエンジンのライブラリ読み込みやAPIキーの検証は行われません。
+
+    エンジンは "モジュール名:属性名" の文字列、クラス、インスタンス、または検索関数として登録します。
+    - クラスの場合: 引数なしでインスタンス化し、そのsearchメソッドを検索関数として使用
+    - インスタンスの場合: そのsearchメソッドを検索関数として使用（設定済みのエンジンを登録する場合）
+    - 関数の場合: その関数を検索関数として使用
+    クラスがasearchメソッドを持つ場合、またはコルーチン関数を登録した場合は、
+    WebSearch.asearchでそれを非同期の検索関数として使用します（持たない場合はスレッドで実行）。
+    サードパーティのエンジンは、エントリーポイントのグループ
+    "chat_websearch.engines" に同じ形式で登録できます。
+    エンジンのインスタンスがprocess_results(results)メソッドを持つ場合、
+    WebSearch.process_resultsはそのメソッドで検索結果を標準化します。
+    """
+
+    ENTRY_POINT_GROUP = "chat_websearch.engines"
+
+    # 組み込みの検索エンジン
+    BUILTIN_ENGINES = {
+        "google": "src.websearch.google_custom_search:GoogleCustomSearch",
+        "bing": "src.websearch.bing_web_search:BingWebSearch",
+        "duckduckgo": "src.websearch.duckduckgo_instant_answer:DuckDuckGoInstantAnswer",
+        # 記録済みの検索結果を返すオフライン用のエンジン
+        "replay": "src.websearch.replay_search:ReplaySearchEngine",
+    }
+
+    def __init__(self, load_entry_points=True):
+        """
+        Args:
+            load_entry_points (bool): エントリーポイントに登録されたエンジンを読み込むかどうか
+        """
+        self.logger = logging.getLogger(__name__)
+        self._targets = dict(self.BUILTIN_ENGINES)
+        self._engines = {}
+        self._lock = threading.Lock()
+        if load_entry_points:
+            self._load_entry_points()
+
+    def _load_entry_points(self):
+        """エントリーポイントに登録されたエンジンを登録（importは初回使用時まで行わない）"""
+        try:
+            entry_points = metadata.entry_points(group=self.ENTRY_POINT_GROUP)
+        except Exception as e:
+            self.logger.warning(f"エントリーポイントの読み込みに失敗しました: {str(e)}")
+            return
+        for entry_point in entry_points:
+            if entry_point.name in self._targets:
+                self.logger.warning(f"検索エンジン '{entry_point.name}' は既に登録されているため、エントリーポイントを無視します。")
+                continue
+            self._targets[entry_point.name] = entry_point
+
+    def register(self, name, target):
+        """
+        検索エンジンを登録します。同名のエンジンが初期化済みの場合は破棄されます。
+
+        Args:
+            name (str): エンジン名
+            target: "モジュール名:属性名" の文字列、クラス、インスタンス、または検索関数
+        """
+        with self._lock:
+            self._targets[name] = target
+            self._engines.pop(name, None)
+
+    def names(self):
+        """登録されているエンジン名のリストを返す"""
+        return list(self._targets.keys())
+
+    def loaded(self):
+        """初期化済みのエンジンを返す"""
+        return dict(self._engines)
+
+    def __contains__(self, name):
+        return name in self._targets
+
+    def get(self, name):
+        """
+        エンジンを取得します。未初期化の場合はこの時点でimportおよび初期化を行います。
+
+        Args:
+            name (str): エンジン名
+
+        Returns:
+            dict: {"instance": エンジンのインスタンス（関数の場合はNone）, "search_func": 検索関数,
+                   "asearch_func": 非同期の検索関数（ない場合はNone）}
+
+        Raises:
+            ValueError: エンジンが登録されていない場合
+            RuntimeError: エンジンのimportまたは初期化に失敗した場合
+        """
+        engine_data = self._engines.get(name)
+        if engine_data is not None:
+            return engine_data
+
+        with self._lock:
+            engine_data = self._engines.get(name)
+            if engine_data is not None:
+                return engine_data
+            if name not in self._targets:
+                raise ValueError(f"検索エンジン '{name}' は登録されていません。")
+
+            # 初期化に失敗した場合はキャッシュせず、次回の使用時に再試行する
+            try:
+                engine_data = self._create(self._targets[name])
+            except Exception as e:
+                raise RuntimeError(f"検索エンジン '{name}' の初期化に失敗しました: {str(e)}") from e
+            self._engines[name] = engine_data
+            self.logger.info(f"検索エンジン '{name}' を初期化しました。")
+            return engine_data
+
+    def _create(self, target):
+        """登録内容からエンジンを生成する"""
+        if isinstance(target, metadata.EntryPoint):
+            target = target.load()
+        elif isinstance(target, str):
+            module_name, _, attribute = target.partition(":")
+            target = getattr(importlib.import_module(module_name), attribute)
+
+        if inspect.isclass(target):
+            instance = target()
+            search_func = getattr(instance, "search", None)
+            asearch_func = getattr(instance, "asearch", None)
+        elif not callable(target) and (hasattr(target, "search") or hasattr(target, "asearch")):
+            instance = target
+            search_func = getattr(instance, "search", None)
+            asearch_func = getattr(instance, "asearch", None)
+        elif inspect.iscoroutinefunction(target):
+            instance, search_func, asearch_func = None, None, target
+        else:
+            instance, search_func, asearch_func = None, target, None
+
+        if search_func is None:
+            if asearch_func is None:
+                raise TypeError("searchまたはasearchメソッドが定義されていません。")
+            # 非同期版のみのエンジンは、同期の検索ではイベントループを起動して実行する
+            search_func = lambda *args, **kwargs: asyncio.run(asearch_func(*args, **kwargs))
+        return {"instance": instance, "search_func": search_func, "asearch_func": asearch_func}
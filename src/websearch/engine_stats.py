@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+
+
+class EngineStats:
+    """
+    検索エンジンごとの直近の応答時間とエラーの統計。
+    エンジンごとに直近window件の結果を保持し、p95の応答時間とエラー率から
+    エンジンの優先順位を決定します（WebSearchのengine="auto"で使用）。
+    """
+
+    def __init__(self, window=50, error_penalty=10.0, probe_interval=300.0):
+        """
+        Args:
+            window (int): エンジンごとに保持する直近の結果の件数
+            error_penalty (float): 優先順位の計算でエラー率1.0あたりに加算する秒数
+            probe_interval (float): この秒数以上使用されていないエンジンは、統計が古いものとして
+                最優先で試す（障害から回復したエンジンを再び使用するため）
+        """
+        self.window = window
+        self.error_penalty = error_penalty
+        self.probe_interval = probe_interval
+        self._samples = {}    # エンジン名 -> deque[(応答時間, 成功したかどうか)]
+        self._last_used = {}  # エンジン名 -> 最後に使用した時刻
+        self._lock = threading.Lock()
+
+    def mark_used(self, engine):
+        """
+        検索の開始を記録します。
+        結果の記録がないまま実行中のエンジンが、未使用のエンジンとして重ねて試されないようにします。
+
+        Args:
+            engine (str): エンジン名
+        """
+        with self._lock:
+            self._last_used[engine] = time.monotonic()
+
+    def record(self, engine, latency, ok=True):
+        """
+        検索の結果を記録します。
+
+        Args:
+            engine (str): エンジン名
+            latency (float): 応答時間（秒）
+            ok (bool): 検索に成功したかどうか
+        """
+        with self._lock:
+            samples = self._samples.get(engine)
+            if samples is None:
+                samples = self._samples[engine] = deque(maxlen=self.window)
+            samples.append((latency, ok))
+            self._last_used[engine] = time.monotonic()
+
+    def percentile(self, engine, q=0.95):
+        """
+        成功した検索の応答時間のパーセンタイルを返します。
+
+        Args:
+            engine (str): エンジン名
+            q (float): パーセンタイル（0〜1）
+
+        Returns:
+            float or None: 応答時間（秒）。成功した検索の記録がない場合はNone
+        """
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples.get(engine, ()) if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, int(round(q * len(latencies))) - 1))
+        return latencies[index]
+
+    def error_rate(self, engine):
+        """
+        直近の検索のエラー率を返します。
+
+        Args:
+            engine (str): エンジン名
+
+        Returns:
+            float: エラー率（0〜1）。記録がない場合は0
+        """
+        with self._lock:
+            samples = list(self._samples.get(engine, ()))
+        if not samples:
+            return 0.0
+        return sum(1 for _, ok in samples if not ok) / len(samples)
+
+    def score(self, engine):
+        """
+        優先順位の計算に使用するスコア（小さいほど優先）を返します。
+        p95の応答時間にエラー率に応じたペナルティを加えた値で、記録がないエンジンや
+        probe_interval以上使用されていないエンジンは0（最優先）とします。
+
+        Args:
+            engine (str): エンジン名
+
+        Returns:
+            float: スコア
+        """
+        with self._lock:
+            last_used = self._last_used.get(engine)
+        if last_used is None or time.monotonic() - last_used >= self.probe_interval:
+            return 0.0
+        p95 = self.percentile(engine)
+        if p95 is None:
+            # 直近の検索がすべて失敗している、または最初の検索が実行中
+            p95 = self.error_penalty
+        return p95 + self.error_penalty * self.error_rate(engine)
+
+    def rank(self, engines):
+        """
+        エンジンを優先順に並べ替えます（スコアが同じ場合は指定順）。
+
+        Args:
+            engines (list): エンジン名のリスト
+
+        Returns:
+            list: 優先順に並べたエンジン名のリスト
+        """
+        scores = {engine: self.score(engine) for engine in engines}
+        return sorted(engines, key=lambda engine: scores[engine])
+
+    def snapshot(self):
+        """
+        エンジンごとの統計を返します。
+
+        Returns:
+            dict: エンジン名をキー、件数・p50・p95・エラー率を値とする辞書
+        """
+        with self._lock:
+            engines = list(self._samples.keys())
+        return {
+            engine: {
+                "samples": len(self._samples[engine]),
+                "p50": self.percentile(engine, 0.5),
+                "p95": self.percentile(engine),
+                "error_rate": self.error_rate(engine),
+            }
+            for engine in engines
+        }
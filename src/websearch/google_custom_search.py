@@ -3,7 +3,13 @@
 from dotenv import load_dotenv
 import os
 import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
+import httplib2
+import httpx
 from googleapiclient.discovery import build
 
 # ここに取得したAPIキーと検索エンジンIDを設定
@@ -12,22 +18,208 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
 
-def get_search_response(keyword, max_results=10, custom_search_engine_id=GOOGLE_CSE_ID):
-    service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
+RESULTS_PER_PAGE = 10  # 1リクエストで10件取得可能
+MAX_START_INDEX = 91   # Custom Search APIで取得できるのは先頭100件まで
+MAX_PAGE_WORKERS = 4   # ページを並列取得する際の最大スレッド数
+REST_ENDPOINT = "https://www.googleapis.com/customsearch/v1"
+REQUEST_TIMEOUT = 30   # 非同期版のリクエストのタイムアウト（秒）
+
+_service = None
+_service_lock = threading.Lock()
+_page_executor = None
+_thread_local = threading.local()
+logger = logging.getLogger(__name__)
+
+def get_service():
+    """
+    Custom Search APIのサービスオブジェクトを返す（初回のみ生成し、以降は再利用）
+    ライブラリに同梱のディスカバリードキュメントを使用するため、生成時の通信は発生しない
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = build(
+                    "customsearch", "v1",
+                    developerKey=GOOGLE_API_KEY,
+                    static_discovery=True,
+                    cache_discovery=False
+                )
+    return _service
+
+def _get_http():
+    """スレッドごとのhttplib2.Httpを返す（httplib2.Httpはスレッドセーフではないため）"""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = httplib2.Http()
+        _thread_local.http = http
+    return http
+
+def _get_page_executor():
+    """ページの並列取得に使用するスレッドプールを返す"""
+    global _page_executor
+    if _page_executor is None:
+        with _service_lock:
+            if _page_executor is None:
+                _page_executor = ThreadPoolExecutor(max_workers=MAX_PAGE_WORKERS, thread_name_prefix="google-cse")
+    return _page_executor
+
+def _fetch_page(keyword, custom_search_engine_id, start, num):
+    """検索結果を1ページ分取得する（HTTPエラーなどの例外はそのまま送出する）"""
+    return get_service().cse().list(
+        q=keyword,
+        cx=custom_search_engine_id,
+        lr='lang_ja',
+        num=num,
+        start=start,
+    ).execute(http=_get_http())
+
+def _page_ranges(max_results):
+    """取得するページの開始位置と件数のリストを返す"""
+    pages = []
+    start = 1
+    while start <= MAX_START_INDEX and start <= max_results:
+        pages.append((start, min(RESULTS_PER_PAGE, max_results - start + 1)))
+        start += RESULTS_PER_PAGE
+    return pages
+
+def _completed_pages(keyword, page_results):
+    """
+    各ページの取得結果（レスポンスまたは例外）から、先頭から連続して取得できたページを返す。
+    1ページ目の取得に失敗した場合は例外を送出し、検索の失敗として扱わせる。
+    2ページ目以降で失敗した場合は、順位が飛ばないようにそのページ以降を破棄する
+    """
+    pages = []
+    for index, result in enumerate(page_results):
+        if isinstance(result, BaseException):
+            if index == 0 or not isinstance(result, Exception):
+                raise result
+            logger.warning(
+                f"Google Custom Searchの{index + 1}ページ目の取得に失敗したため、"
+                f"{index}ページ分の結果を返します: {keyword} ({str(result)})"
+            )
+            break
+        pages.append(result)
+    return pages
+
+def _merge_pages(page_results):
+    """取得できたページを順番どおりに1つのレスポンスにまとめる"""
     responses = []
-    
-    try:
-        result = service.cse().list(
-            q=keyword,
-            cx=custom_search_engine_id,
-            lr='lang_ja',
-            num=max_results,# 1リクエストで10件取得可能
-        ).execute()
-        responses.append(result)
-    except Exception as e:
-        print("Error:", e)
+    merged = None
+    for result in page_results:
+        if merged is None:
+            merged = dict(result)
+            merged["items"] = list(result.get("items", []))
+        else:
+            merged["items"].extend(result.get("items", []))
+
+    if merged is not None:
+        if not merged["items"]:
+            del merged["items"]
+        responses.append(merged)
     return responses
 
+def get_search_response(keyword, max_results=10, custom_search_engine_id=GOOGLE_CSE_ID):
+    """
+    Google Custom Search APIで検索を実行します。
+    max_resultsが10件を超える場合は、2ページ目以降（start=11, 21, ...）を並列に取得し、
+    1つのレスポンスにまとめて返します。
+    1ページ目の取得に失敗した場合は例外を送出し、2ページ目以降で失敗した場合はその手前までの結果を返します。
+
+    Args:
+        keyword (str): 検索クエリ
+        max_results (int): 取得件数（最大100件）
+        custom_search_engine_id (str, optional): 検索エンジンID。指定がない場合は環境変数の値を使用
+
+    Returns:
+        list: 検索結果のレスポンス（itemsに全ページの結果をまとめたもの）
+
+    Raises:
+        googleapiclient.errors.HttpError: 1ページ目の取得に失敗した場合など
+    """
+    custom_search_engine_id = custom_search_engine_id or GOOGLE_CSE_ID
+    pages = _page_ranges(max_results)
+
+    if len(pages) <= 1:
+        page_results = [_fetch_page(keyword, custom_search_engine_id, start, num) for start, num in pages]
+    else:
+        executor = _get_page_executor()
+        futures = [
+            executor.submit(_fetch_page, keyword, custom_search_engine_id, start, num)
+            for start, num in pages
+        ]
+        page_results = [future.exception() or future.result() for future in futures]
+
+    return _merge_pages(_completed_pages(keyword, page_results))
+
+async def _afetch_page(client, keyword, custom_search_engine_id, start, num):
+    """検索結果を1ページ分非同期で取得する（HTTPエラーやJSONの解析エラーはそのまま送出する）"""
+    response = await client.get(REST_ENDPOINT, params={
+        "key": GOOGLE_API_KEY,
+        "q": keyword,
+        "cx": custom_search_engine_id,
+        "lr": "lang_ja",
+        "num": num,
+        "start": start,
+    })
+    response.raise_for_status()
+    return response.json()
+
+async def aget_search_response(keyword, max_results=10, custom_search_engine_id=GOOGLE_CSE_ID):
+    """
+    get_search_responseの非同期版。Custom Search APIのRESTエンドポイントをhttpxで呼び出し、
+    複数ページの場合はすべてのページを同時に取得します。
+
+    Args:
+        keyword (str): 検索クエリ
+        max_results (int): 取得件数（最大100件）
+        custom_search_engine_id (str, optional): 検索エンジンID。指定がない場合は環境変数の値を使用
+
+    Returns:
+        list: 検索結果のレスポンス（get_search_responseと同じ形式）
+
+    Raises:
+        httpx.HTTPError: 1ページ目の取得に失敗した場合など
+    """
+    custom_search_engine_id = custom_search_engine_id or GOOGLE_CSE_ID
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+        page_results = await asyncio.gather(*[
+            _afetch_page(client, keyword, custom_search_engine_id, start, num)
+            for start, num in _page_ranges(max_results)
+        ], return_exceptions=True)
+    return _merge_pages(_completed_pages(keyword, page_results))
+
+class GoogleCustomSearch:
+    """Google Custom Search APIを検索エンジンとして登録するためのクラス"""
+
+    def search(self, query, max_results=10, custom_search_engine_id=None):
+        """
+        Google Custom Search APIで検索を実行します。
+
+        Args:
+            query (str): 検索クエリ
+            max_results (int): 取得件数（最大100件）
+            custom_search_engine_id (str, optional): 検索エンジンID
+
+        Returns:
+            list: 検索結果のレスポンス
+        """
+        return get_search_response(query, max_results=max_results, custom_search_engine_id=custom_search_engine_id)
+
+    async def asearch(self, query, max_results=10, custom_search_engine_id=None):
+        """
+        searchの非同期版
+
+        Args:
+            query (str): 検索クエリ
+            max_results (int): 取得件数（最大100件）
+            custom_search_engine_id (str, optional): 検索エンジンID
+
+        Returns:
+            list: 検索結果のレスポンス
+        """
+        return await aget_search_response(query, max_results=max_results, custom_search_engine_id=custom_search_engine_id)
+
 def main():
     target_keyword = "NYダウ　平均株価"
     api_response = get_search_response(target_keyword)
@@ -0,0 +1,84 @@
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from src.websearch.search_result import SearchResult
+
+# 正規化の際に除去するトラッキング用のクエリパラメータ
+TRACKING_PARAMS = {"gclid", "fbclid", "yclid", "msclkid", "ref", "ref_src"}
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+def canonicalize_url(url):
+    """
+    重複判定用にURLを正規化します。
+    スキーム、"www."、既定のポート、フラグメント、トラッキング用パラメータ、
+    末尾のスラッシュの違いは同一のURLとして扱います。
+
+    Args:
+        url (str): 正規化するURL
+
+    Returns:
+        str: 正規化したURL（比較用のキーであり、アクセス可能なURLではない）
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    if port is not None and str(port) != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{port}"
+
+    path = parts.path.rstrip("/")
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    canonical = host + path
+    if query:
+        canonical += "?" + urlencode(sorted(query))
+    return canonical
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """
+    複数の検索エンジンの標準化済み検索結果をReciprocal Rank Fusionで統合します。
+    各結果のスコアは、それを返したエンジンごとの 1 / (k + 順位) の合計です。
+    同じURL（canonicalize_urlで判定）の結果は1件にまとめ、最も上位に出したエンジンの
+    タイトルとスニペットを採用します。
+
+    Args:
+        ranked_lists (dict): エンジン名をキー、標準化済み検索結果のリストを値とする辞書
+        k (int): 順位の影響を調整する定数（大きいほど下位の結果との差が小さくなる）
+
+    Returns:
+        list: 統合後の検索結果のリスト（スコアの降順）。各要素は標準化済み検索結果に
+              "sources"（結果を返したエンジン名のリスト）を加えたもの
+    """
+    fused = {}
+    for engine, results in ranked_lists.items():
+        for rank, result in enumerate(results, start=1):
+            link = result.get("link", "")
+            if not link:
+                continue
+            key = canonicalize_url(link)
+            score = 1.0 / (k + rank)
+            entry = fused.get(key)
+            if entry is None:
+                fused[key] = {
+                    "result": result,
+                    "best_rank": rank,
+                    "score": score,
+                    "sources": [engine],
+                    "order": len(fused)
+                }
+                continue
+            entry["score"] += score
+            if engine not in entry["sources"]:
+                entry["sources"].append(engine)
+            if rank < entry["best_rank"]:
+                entry["result"] = result
+                entry["best_rank"] = rank
+
+    ranked = sorted(fused.values(), key=lambda entry: (-entry["score"], entry["order"]))
+    return [
+        entry["result"].replace(sources=entry["sources"])
+        if isinstance(entry["result"], SearchResult)
+        else {**entry["result"], "sources": entry["sources"]}
+        for entry in ranked
+    ]
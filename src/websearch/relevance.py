@@ -0,0 +1,131 @@
+import re
+import unicodedata
+import numpy as np
+
+# 英数字の語、カタカナ・漢字・ひらがなの連続をそれぞれ1つの塊として取り出す
+TOKEN_PATTERN = re.compile(
+    r'[0-9a-z]+'
+    r'|[\u30A0-\u30FF]+'
+    r'|[\u3400-\u9FFF\uF900-\uFAFF\u3005]+'
+    r'|[\u3040-\u309F]+'
+)
+HIRAGANA_PATTERN = re.compile(r'[\u3040-\u309F]+')
+
+def tokenize(text):
+    """
+    テキストを検索用の語に分割します。
+    英数字は単語単位、日本語（分かち書きされない）は文字種ごとの連続を2文字ずつ（bigram）に分割します。
+    1文字だけのひらがな（助詞など）は除外します。
+
+    Args:
+        text (str): 分割するテキスト
+
+    Returns:
+        list: 語のリスト
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = []
+    for chunk in TOKEN_PATTERN.findall(text):
+        if chunk.isascii():
+            tokens.append(chunk)
+        elif len(chunk) == 1:
+            if not HIRAGANA_PATTERN.fullmatch(chunk):
+                tokens.append(chunk)
+        else:
+            tokens.extend(chunk[i:i + 2] for i in range(len(chunk) - 1))
+    return tokens
+
+def bm25_scores(query, documents, k1=1.2, b=0.75):
+    """
+    クエリに対する各文書のBM25スコアを計算します。
+
+    Args:
+        query (str): 検索クエリ
+        documents (list): 文書（文字列）のリスト
+        k1 (float): 語の出現回数の影響を調整するパラメータ
+        b (float): 文書の長さによる正規化の強さ（0〜1）
+
+    Returns:
+        numpy.ndarray: 各文書のスコア（documentsと同じ順序）
+    """
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not documents or not query_terms:
+        return np.zeros(len(documents))
+
+    # 文書 x クエリの語 の出現回数の行列を作成
+    columns = {term: column for column, term in enumerate(query_terms)}
+    document_tokens = [tokenize(document) for document in documents]
+    tf = np.zeros((len(documents), len(query_terms)))
+    for row, tokens in enumerate(document_tokens):
+        for token in tokens:
+            column = columns.get(token)
+            if column is not None:
+                tf[row, column] += 1
+
+    lengths = np.array([len(tokens) for tokens in document_tokens], dtype=float)
+    average_length = lengths.mean() or 1.0
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    denominator = tf + k1 * (1 - b + b * lengths / average_length)[:, None]
+    return (idf * tf * (k1 + 1) / denominator).sum(axis=1)
+
+def query_coverage(query, documents):
+    """
+    クエリの語のうち、いずれかの文書に含まれる語の割合を返します。
+
+    Args:
+        query (str): 検索クエリ
+        documents (list): 文書（文字列）のリスト
+
+    Returns:
+        float: 割合（0〜1）。クエリに語がない場合は0
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return 0.0
+    found = set()
+    for document in documents:
+        found.update(query_terms.intersection(tokenize(document)))
+    return len(found) / len(query_terms)
+
+def triage_results(query, results, top_k=None, min_score=None, snippet_coverage=None):
+    """
+    標準化済みの検索結果のタイトルとスニペットをクエリとBM25で照合し、
+    スクレイピングする結果を選択します。選択した結果は "relevance"（スコア）を設定した複製として返し、
+    引数の結果（キャッシュされている結果の場合もある）は変更しません。
+
+    Args:
+        query (str): 検索クエリ
+        results (list): 標準化済みの検索結果のリスト
+        top_k (int, optional): スコアの上位から選択する件数。指定がない場合は件数で絞り込まない
+        min_score (float, optional): 選択するスコアの下限。指定がない場合はスコアで絞り込まない
+        snippet_coverage (float, optional): スニペット全体がクエリの語をこの割合以上含む場合は、
+            スクレイピングせずスニペットのみで回答するものとする
+
+    Returns:
+        tuple: (スクレイピングする結果のリスト（元の順位順）, スニペットのみで回答するかどうか)
+    """
+    if not results:
+        return [], False
+
+    documents = [f"{result.get('title', '')} {result.get('snippet', '')}" for result in results]
+    scores = bm25_scores(query, documents)
+    scored = [_with_relevance(result, round(float(score), 4)) for result, score in zip(results, scores)]
+
+    if snippet_coverage is not None and query_coverage(query, documents) >= snippet_coverage:
+        return [], True
+
+    # 同じスコアの場合は元の順位を優先
+    order = np.argsort(-scores, kind="stable")
+    if min_score is not None:
+        order = order[scores[order] >= min_score]
+    if top_k is not None:
+        order = order[:top_k]
+    return [scored[index] for index in sorted(order.tolist())], False
+
+def _with_relevance(result, relevance):
+    """関連性のスコアを設定した検索結果の複製を返す"""
+    if hasattr(result, "replace"):
+        return result.replace(relevance=relevance)
+    return {**result, "relevance": relevance}
+
@@ -0,0 +1,74 @@
+import asyncio
+import os
+from src.replay.fixture_store import FixtureStore, resolve_latency, simulate_latency
+from src.websearch.search_cache import SearchCache
+
+SEARCH_NAMESPACE = "search"
+
+def make_search_request(query, max_results):
+    """
+    検索のフィクスチャのキーとするリクエストの内容を返します。
+    エンジン名はキーに含めないため、どのエンジンで記録した結果も再生できます。
+
+    Args:
+        query (str): 検索クエリ
+        max_results (int): 取得件数
+
+    Returns:
+        dict: リクエストの内容
+    """
+    return {"query": SearchCache.normalize_query(query), "max_results": max_results}
+
+class ReplaySearchEngine:
+    """
+    記録済みの検索結果を返す検索エンジン（オフラインでの計測・負荷試験用）。
+    WebSearchのfixture_recorderで記録した標準化済みの検索結果を、同じクエリと取得件数に対して返します。
+    """
+
+    def __init__(self, store=None, latency_profile=None):
+        """
+        Args:
+            store (FixtureStore, optional): フィクスチャのストア。指定がない場合は
+                環境変数REPLAY_FIXTURE_DIR（既定値: "fixtures"）のディレクトリを使用
+            latency_profile: 模擬する応答時間。None（待機しない）、"recorded"（記録時の応答時間）、
+                LatencyProfile、またはLATENCY_PROFILESのキー
+        """
+        self.store = store or FixtureStore(os.getenv("REPLAY_FIXTURE_DIR", "fixtures"))
+        self.latency_profile = latency_profile
+
+    def search(self, query, max_results=4, **kwargs):
+        """
+        記録済みの検索結果を返します。
+
+        Args:
+            query (str): 検索クエリ
+            max_results (int): 取得件数
+            **kwargs: 他のエンジン固有のパラメータ（無視）
+
+        Returns:
+            list: 標準化済みの検索結果（辞書）のリスト
+
+        Raises:
+            FixtureNotFoundError: 記録がない場合
+        """
+        fixture = self.store.require(SEARCH_NAMESPACE, make_search_request(query, max_results))
+        simulate_latency(self.latency_profile, fixture)
+        return fixture["response"]
+
+    async def asearch(self, query, max_results=4, **kwargs):
+        """
+        searchの非同期版
+
+        Args:
+            query (str): 検索クエリ
+            max_results (int): 取得件数
+            **kwargs: 他のエンジン固有のパラメータ（無視）
+
+        Returns:
+            list: 標準化済みの検索結果（辞書）のリスト
+        """
+        fixture = self.store.require(SEARCH_NAMESPACE, make_search_request(query, max_results))
+        delay = resolve_latency(self.latency_profile, fixture)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return fixture["response"]
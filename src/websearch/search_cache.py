@@ -0,0 +1,350 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+class SearchCache:
+    """
+    検索結果のキャッシュ。
+    正規化したクエリ、エンジン、検索パラメータをキーとして、検索APIの生の結果を保持します。
+
+    - メモリ上のLRUキャッシュ（max_entries件まで）
+    - 任意でSQLiteファイルによる永続化（プロセスを再起動しても再利用できる）
+    - エンジンごと、クエリの種類ごとに設定できる有効期限（TTL）
+    - stale-while-revalidate: 有効期限切れから stale_ttl 秒以内は古い結果を返しつつ、
+      バックグラウンドで結果を更新する
+    """
+
+    DEFAULT_TTL = 6 * 60 * 60
+    # 時事性の高いクエリは短い有効期限を適用する
+    DEFAULT_QUERY_CLASS_TTLS = {
+        "time_sensitive": 30 * 60,
+    }
+    TIME_SENSITIVE_TERMS = (
+        "今日", "本日", "明日", "昨日", "現在", "最新", "速報", "ニュース", "天気", "予報", "気温",
+        "today", "tomorrow", "now", "latest", "news", "weather",
+    )
+
+    def __init__(self, max_entries=512, default_ttl=DEFAULT_TTL, engine_ttls=None,
+                 query_class_ttls=None, stale_ttl=None, persist_path=None, classify_query=None):
+        """
+        Args:
+            max_entries (int): メモリ上に保持する最大件数
+            default_ttl (float): 既定の有効期限（秒）
+            engine_ttls (dict, optional): エンジン名ごとの有効期限（秒）
+            query_class_ttls (dict, optional): クエリの種類ごとの有効期限（秒）。
+                エンジンの有効期限より短い場合に適用されます
+            stale_ttl (float, optional): 有効期限切れ後も古い結果を返す猶予（秒）。
+                指定がない場合は有効期限と同じ長さ。0で無効
+            persist_path (str, optional): 永続化に使用するSQLiteファイルのパス
+            classify_query (callable, optional): クエリを受け取り種類を返す関数。
+                指定がない場合は時事性の高い語を含むかどうかで分類します
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.engine_ttls = engine_ttls or {}
+        self.query_class_ttls = query_class_ttls if query_class_ttls is not None else dict(self.DEFAULT_QUERY_CLASS_TTLS)
+        self.stale_ttl = stale_ttl
+        self.classify_query = classify_query or self._default_classify_query
+
+        self._entries = OrderedDict()  # キー -> (値, 有効期限, 古い結果を返せる期限)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+        self._db = None
+        if persist_path:
+            directory = os.path.dirname(persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, stale_until REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def normalize_query(query):
+        """
+        クエリを正規化します（全角・半角の統一、小文字化、空白の統一）。
+
+        Args:
+            query (str): 検索クエリ
+
+        Returns:
+            str: 正規化したクエリ
+        """
+        return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+    def _default_classify_query(self, query):
+        """時事性の高い語を含むクエリを "time_sensitive"、それ以外を "general" に分類する"""
+        normalized = self.normalize_query(query)
+        if any(term in normalized for term in self.TIME_SENSITIVE_TERMS):
+            return "time_sensitive"
+        return "general"
+
+    def make_key(self, query, engine, params=None):
+        """
+        キャッシュのキーを生成します。
+
+        Args:
+            query (str): 検索クエリ
+            engine (str or list): 検索エンジン
+            params (dict, optional): 検索パラメータ
+
+        Returns:
+            str: キャッシュのキー
+        """
+        return json.dumps(
+            [self.normalize_query(query), engine, params or {}],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+
+    def ttl_for(self, query, engine):
+        """
+        クエリとエンジンに適用する有効期限（秒）を返します。
+
+        Args:
+            query (str): 検索クエリ
+            engine (str or list): 検索エンジン
+
+        Returns:
+            float: 有効期限（秒）
+        """
+        if isinstance(engine, str):
+            ttl = self.engine_ttls.get(engine, self.default_ttl)
+        else:
+            # 複数エンジンの場合は最も短い有効期限を適用
+            ttl = min([self.engine_ttls.get(name, self.default_ttl) for name in engine] or [self.default_ttl])
+        class_ttl = self.query_class_ttls.get(self.classify_query(query))
+        if class_ttl is not None:
+            ttl = min(ttl, class_ttl)
+        return ttl
+
+    def get(self, key):
+        """
+        キャッシュから値を取得します。
+
+        Args:
+            key (str): キャッシュのキー
+
+        Returns:
+            tuple: (状態, 値)。状態は "hit"（有効）、"stale"（期限切れだが猶予期間内）、"miss" のいずれか
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                self._store_memory(key, entry)
+        if entry is None:
+            return "miss", None
+
+        value, expires_at, stale_until = entry
+        if now < expires_at:
+            return "hit", value
+        if now < stale_until:
+            return "stale", value
+        return "miss", None
+
+    def set(self, key, value, ttl):
+        """
+        キャッシュに値を保存します。
+
+        Args:
+            key (str): キャッシュのキー
+            value: 保存する値（JSONに変換可能なもの）
+            ttl (float): 有効期限（秒）
+        """
+        now = time.time()
+        stale_ttl = ttl if self.stale_ttl is None else self.stale_ttl
+        entry = (value, now + ttl, now + ttl + stale_ttl)
+        self._store_memory(key, entry)
+        self._persist(key, entry)
+
+    def get_or_fetch(self, query, engine, params, fetch):
+        """
+        キャッシュから検索結果を取得し、なければfetchを呼び出して取得・保存します。
+        期限切れだが猶予期間内の結果がある場合は、その結果を返しつつバックグラウンドで更新します。
+
+        Args:
+            query (str): 検索クエリ
+            engine (str or list): 検索エンジン
+            params (dict): 検索パラメータ
+            fetch (callable): 引数なしで検索を実行し、結果を返す関数
+
+        Returns:
+            検索結果
+        """
+        key = self.make_key(query, engine, params)
+        status, value = self.get(key)
+        if status == "hit":
+            self._count("hits")
+            return value
+        ttl = self.ttl_for(query, engine)
+        if status == "stale":
+            self._count("stale_hits")
+            self._refresh_in_background(key, ttl, fetch)
+            return value
+
+        self._count("misses")
+        value = fetch()
+        self.set(key, value, ttl)
+        return value
+
+    async def aget_or_fetch(self, query, engine, params, fetch):
+        """
+        get_or_fetchの非同期版。fetchは引数なしで呼び出すとコルーチンを返す関数です。
+        期限切れだが猶予期間内の結果がある場合は、その結果を返しつつ同じイベントループ上で更新します。
+
+        Args:
+            query (str): 検索クエリ
+            engine (str or list): 検索エンジン
+            params (dict): 検索パラメータ
+            fetch (callable): 引数なしで呼び出すと検索結果を返すコルーチンを返す関数
+
+        Returns:
+            検索結果
+        """
+        key = self.make_key(query, engine, params)
+        status, value = self.get(key)
+        if status == "hit":
+            self._count("hits")
+            return value
+        ttl = self.ttl_for(query, engine)
+        if status == "stale":
+            self._count("stale_hits")
+            self._arefresh_in_background(key, ttl, fetch)
+            return value
+
+        self._count("misses")
+        value = await fetch()
+        self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        """
+        キャッシュの統計情報を返します。
+
+        Returns:
+            dict: ヒット数、期限切れヒット数、ミス数、追い出し数、更新数、ヒット率、件数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        requests = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / requests if requests else 0.0
+        return stats
+
+    def clear(self):
+        """キャッシュをすべて削除します（永続化した内容を含む）"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _store_memory(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _load(self, key):
+        """永続化された値を読み込む"""
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at, stale_until FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _persist(self, key, entry):
+        """値を永続化する（JSONに変換できない値は永続化しない）"""
+        if self._db is None:
+            return
+        value, expires_at, stale_until = entry
+        try:
+            serialized = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            self.logger.warning(f"検索結果を永続化できませんでした: {str(e)}")
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+                (key, serialized, expires_at, stale_until)
+            )
+            # 猶予期間も過ぎた値は削除
+            self._db.execute("DELETE FROM search_cache WHERE stale_until < ?", (time.time(),))
+            self._db.commit()
+
+    def _refresh_in_background(self, key, ttl, fetch):
+        """同じキーの更新が実行中でなければ、バックグラウンドで結果を更新する"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, fetch(), ttl)
+                self._count("refreshes")
+            except Exception as e:
+                self._count("refresh_errors")
+                self.logger.warning(f"検索結果のバックグラウンド更新に失敗しました: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="search-cache-refresh", daemon=True).start()
+
+    def _arefresh_in_background(self, key, ttl, fetch):
+        """同じキーの更新が実行中でなければ、イベントループ上のタスクとして結果を更新する"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                self.set(key, await fetch(), ttl)
+                self._count("refreshes")
+            except Exception as e:
+                self._count("refresh_errors")
+                self.logger.warning(f"検索結果のバックグラウンド更新に失敗しました: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        # タスクが途中で破棄されないよう、完了するまで参照を保持する
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
@@ -0,0 +1,84 @@
+class SearchResult(dict):
+    """
+    標準化された検索結果1件を表すクラス（すべての検索エンジンで共通）。
+    json.dumpsやキャッシュの永続化にそのまま渡せるよう、辞書のサブクラスとしています
+    （メモリ上の大きさは通常の辞書と同じです）。従来の辞書と同様に result["link"] や result.get("title") で
+    参照でき、独自の項目も追加できます。標準の項目は result.link のように属性としても参照できます。
+    """
+
+    # 項目はすべて辞書のキーとして保持する（属性用の__dict__を持たない）
+    __slots__ = ()
+
+    # 値がNoneの場合はキーとして保持しない項目（複数エンジンの統合時、関連性の判定時のみ設定）
+    OPTIONAL_FIELDS = ("sources", "relevance")
+    REQUIRED_FIELDS = ("title", "link", "snippet", "source")
+    FIELDS = REQUIRED_FIELDS + OPTIONAL_FIELDS
+
+    def __init__(self, title="", link="", snippet="", source="", sources=None, relevance=None, **extra):
+        """
+        Args:
+            title (str): タイトル
+            link (str): URL
+            snippet (str): スニペット/説明文
+            source (str): 検索エンジン名
+            sources (list, optional): 結果を返したエンジン名のリスト（複数エンジンの結果を統合した場合）
+            relevance (float, optional): クエリとの関連性のスコア
+            **extra: 検索エンジン独自の項目
+        """
+        super().__init__(title=title, link=link, snippet=snippet, source=source, **extra)
+        if sources is not None:
+            dict.__setitem__(self, "sources", sources)
+        if relevance is not None:
+            dict.__setitem__(self, "relevance", relevance)
+
+    def __setitem__(self, key, value):
+        # 任意の項目はNoneを設定するとキーごと削除する（JSONにnullを出力しない）
+        if value is None and key in self.OPTIONAL_FIELDS:
+            self.pop(key, None)
+            return
+        dict.__setitem__(self, key, value)
+
+    def __getattr__(self, name):
+        # 項目は属性としても参照できる（設定されていない任意の項目はNone）
+        if name in self.FIELDS:
+            return self.get(name)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name not in self.FIELDS:
+            raise AttributeError(f"SearchResultに '{name}' は設定できません。")
+        self[name] = value
+
+    def __repr__(self):
+        return f"SearchResult({dict(self)!r})"
+
+    def __reduce__(self):
+        # copy・pickleで、キーワード引数として復元する
+        return (_restore, (dict(self),))
+
+    def replace(self, **changes):
+        """
+        一部の項目を変更した新しいSearchResultを返します。
+
+        Args:
+            **changes: 変更する項目と値
+
+        Returns:
+            SearchResult: 変更後の検索結果
+        """
+        values = dict(self)
+        values.update(changes)
+        return SearchResult(**values)
+
+    def to_dict(self):
+        """
+        通常の辞書に変換します。
+
+        Returns:
+            dict: title, link, snippet, source（設定されている場合はsources, relevance, 独自の項目）を含む辞書
+        """
+        return dict(self)
+
+
+def _restore(values):
+    return SearchResult(**values)
@@ -1,78 +1,262 @@
-from src.webscraping.web_scraping import WebScraper
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from src.websearch.engine_registry import EngineRegistry
+from src.websearch.engine_limiter import EngineLimiter
+from src.websearch.engine_stats import EngineStats
+from src.websearch.rank_fusion import reciprocal_rank_fusion
+from src.websearch.replay_search import SEARCH_NAMESPACE, make_search_request
+from src.websearch.search_result import SearchResult
 
 class WebSearch:
     """
     複数のWeb検索APIのラッパーを一元管理するクラス。
     各検索エンジンのAPIを統一したインターフェースで利用できます。
+    検索エンジンとスクレイパーは初めて使用されたときに初期化されます。
     """
     
-    def __init__(self, default_engine="google"):
+    # エンジンごとの同時実行数・1秒あたりのクエリ数・1日あたりのクエリ数の推奨値。
+    # 既定では制限せずにクエリ数の集計のみ行うため、制限する場合は engine_limits=WebSearch.RECOMMENDED_ENGINE_LIMITS
+    # のように指定する（単独の検索も含め、すべての検索に適用される）
+    RECOMMENDED_ENGINE_LIMITS = {
+        "google": {"max_concurrency": 4, "qps": 1.5, "daily_quota": 10000},
+        "bing": {"max_concurrency": 3, "qps": 3},
+        "duckduckgo": {"max_concurrency": 2, "qps": 2},
+    }
+    
+    # engine="auto"で、優先エンジンの応答時間の記録がない場合に次のエンジンへ送信するまでの秒数
+    DEFAULT_HEDGE_AFTER = 2.0
+    
+    # 記録済みの結果を返すエンジン（"all" と "auto" の対象には含めない）
+    OFFLINE_ENGINES = ("replay",)
+    
+    def __init__(self, default_engine="google", registry=None, cache=None, engine_limits=None,
+                 engine_stats=None, auto_engines=None, hedge_after=None, scrape_workers=8,
+                 fixture_recorder=None):
         """
         WebSearchクラスの初期化
         
         Args:
             default_engine (str): デフォルトで使用する検索エンジン
-                                 "google", "bing", "duckduckgo"のいずれか
+                                 "google", "bing", "duckduckgo"、または登録済みのエンジン名
+            registry (EngineRegistry, optional): 検索エンジンのレジストリ
+            cache (SearchCache, optional): 検索結果のキャッシュ。指定がない場合はキャッシュしない
+            engine_limits (dict, optional): エンジン名ごとの制限（max_concurrency, qps, daily_quota）。
+                search_manyだけでなくすべての検索に適用されます。指定がない場合は制限せず、
+                クエリ数の集計のみ行います（推奨値はRECOMMENDED_ENGINE_LIMITS）
+            engine_stats (EngineStats, optional): エンジンごとの応答時間とエラーの統計
+            auto_engines (list, optional): engine="auto"で使用するエンジン名のリスト。
+                指定がない場合は登録されているすべてのエンジン
+            hedge_after (float, optional): engine="auto"で、優先エンジンが応答しない場合に
+                次のエンジンへ送信するまでの秒数。指定がない場合は優先エンジンの直近のp95
+            scrape_workers (int): パイプライン実行時に、すべてのクエリで共有するスクレイピングの同時実行数
+            fixture_recorder (FixtureStore, optional): 指定した場合、各エンジンの検索結果（標準化済み）を
+                記録する。記録した結果は "replay" エンジンで再生できる
         """
-        self.engines = {}
+        self.logger = logging.getLogger(__name__)
+        self.registry = registry or EngineRegistry()
+        self.cache = cache
+        self.engine_limits = dict(engine_limits or {})
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        self.engine_stats = engine_stats or EngineStats()
+        self.auto_engines = auto_engines
+        self.hedge_after = hedge_after
+        self.scrape_workers = scrape_workers
+        self.fixture_recorder = fixture_recorder
+        self._scrape_scheduler = None
+        self._scrape_scheduler_lock = threading.Lock()
         self.default_engine = default_engine
-        self._initialize_engines()
-        self.scraper = WebScraper()
-        
-        # デフォルトエンジンが利用できない場合は、利用可能な最初のエンジンをデフォルトに設定
-        if self.default_engine not in self.engines and self.engines:
-            self.default_engine = next(iter(self.engines.keys()))
-    
-    def _initialize_engines(self):
-        """利用可能な検索エンジンの初期化"""
-        # Google Custom Search API
-        from src.websearch.google_custom_search import get_search_response
-        self.engines["google"] = {
-            "instance": None,
-            "search_func": get_search_response
-        }
+        self._scraper = None
         
-        # Bing Web Search API
-        from src.websearch.bing_web_search import BingWebSearch
-        bing_search = BingWebSearch()
-        self.engines["bing"] = {
-            "instance": bing_search,
-            "search_func": bing_search.search
-        }
+        # デフォルトエンジンが登録されていない場合は、登録されている最初のエンジンをデフォルトに設定
+        if self.default_engine not in self.registry and self.registry.names():
+            self.default_engine = self.registry.names()[0]
+    
+    @property
+    def engines(self):
+        """初期化済みの検索エンジン"""
+        return self.registry.loaded()
+    
+    @property
+    def scraper(self):
+        """検索結果のスクレイピングに使用するWebScraper（初回アクセス時に生成）"""
+        if self._scraper is None:
+            from src.webscraping.web_scraping import WebScraper
+            self._scraper = WebScraper()
+        return self._scraper
+    
+    @scraper.setter
+    def scraper(self, scraper):
+        self._scraper = scraper
+        # 以前のスクレイパーのスケジューラは、実行中のスクレイピングの完了後に終了する
+        self._shutdown_scrape_scheduler(wait=False)
+    
+    @property
+    def scrape_scheduler(self):
+        """パイプライン実行時に全クエリで共有するスクレイピングのスケジューラ（初回アクセス時に生成）"""
+        if self._scrape_scheduler is None:
+            with self._scrape_scheduler_lock:
+                if self._scrape_scheduler is None:
+                    from src.webscraping.scrape_scheduler import ScrapeScheduler
+                    self._scrape_scheduler = ScrapeScheduler(self.scraper, max_workers=self.scrape_workers)
+        return self._scrape_scheduler
+    
+    def close(self):
+        """
+        パイプライン実行で使用したスクレイピングのスケジューラ（スレッドプール）を、実行中のスクレイピングの
+        完了を待ってから終了し、初期化済みの検索エンジンのうちclose()を持つもの（DuckDuckGoのクライアントなど）を
+        終了します。with文で使用した場合は、終了時に呼び出されます。
+        """
+        self._shutdown_scrape_scheduler(wait=True)
+        for name, engine_data in self.registry.loaded().items():
+            close = getattr(engine_data["instance"], "close", None)
+            if not callable(close):
+                continue
+            try:
+                close()
+            except Exception as e:
+                self.logger.warning(f"検索エンジン '{name}' の終了に失敗しました: {str(e)}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _shutdown_scrape_scheduler(self, wait):
+        """スクレイピングのスケジューラを終了する（次にパイプライン実行する場合は再生成）"""
+        with self._scrape_scheduler_lock:
+            scheduler, self._scrape_scheduler = self._scrape_scheduler, None
+        if scheduler is not None:
+            scheduler.shutdown(wait=wait)
+    
+    def register_engine(self, name, target):
+        """
+        検索エンジンを登録します。
         
-        # DuckDuckGo Instant Answer API
-        from src.websearch.duckduckgo_instant_answer import DuckDuckGoInstantAnswer
-        ddg_search = DuckDuckGoInstantAnswer()
-        self.engines["duckduckgo"] = {
-            "instance": ddg_search,
-            "search_func": ddg_search.search
-        }
+        Args:
+            name (str): エンジン名
+            target: "モジュール名:属性名" の文字列、クラス、または検索関数
+        """
+        self.registry.register(name, target)
     
     def available_engines(self):
         """利用可能な検索エンジンのリストを返す"""
-        return list(self.engines.keys())
+        return self.registry.names()
+    
+    def _is_multi_engine(self, engine):
+        """複数エンジンを指定しているかどうか（"all" またはエンジン名のリスト）"""
+        return engine == "all" or isinstance(engine, (list, tuple))
     
-    def search(self, query, engine=None, max_results=4, **kwargs):
+    def _returns_engine_dict(self, engine):
+        """検索結果がエンジン名をキーとする辞書になる指定かどうか（複数エンジンまたは "auto"）"""
+        return engine == "auto" or self._is_multi_engine(engine)
+    
+    def _resolve_engines(self, engine):
+        """複数エンジンの指定をエンジン名のリストに展開する"""
+        if engine == "all":
+            return [name for name in self.available_engines() if name not in self.OFFLINE_ENGINES]
+        return list(engine)
+    
+    def search(self, query, engine=None, max_results=4, first_wins=False, hedge_after=None, **kwargs):
         """
         指定された検索エンジンを使用して検索を実行
         
         Args:
             query (str): 検索クエリ
-            engine (str, optional): 使用する検索エンジン。指定がない場合はデフォルトエンジンを使用
+            engine (str or list, optional): 使用する検索エンジン。指定がない場合はデフォルトエンジンを使用
+                "all" またはエンジン名のリストを指定すると、複数のエンジンに並列で検索を実行
+                "auto" を指定すると、直近の応答時間とエラー率が最も良いエンジンで検索を実行
+            first_wins (bool): 複数エンジン指定時に、最初に結果を返したエンジンの結果のみを使用するかどうか
+            hedge_after (float, optional): engine="auto"で、優先エンジンが応答しない場合に
+                次のエンジンへ送信するまでの秒数
             **kwargs: 各検索エンジン固有のパラメータ
         
         Returns:
             dict or list: 検索結果（エンジンによって形式が異なる）
+                複数エンジンまたは "auto" 指定時は、エンジン名をキー、各エンジンの検索結果を値とする辞書
         
         Raises:
             ValueError: 指定されたエンジンが利用できない場合
+            RuntimeError: エンジンの初期化に失敗した場合（APIキー未設定など）
         """
         engine = engine or self.default_engine
         
-        if not self.engines:
+        if not self.available_engines():
             raise RuntimeError(f"利用可能な検索エンジンがありません。")
         
-        if engine not in self.engines:
+        if engine == "auto":
+            fetch = lambda: self._search_auto(query, max_results, hedge_after, **kwargs)
+        elif self._is_multi_engine(engine):
+            engines = self._resolve_engines(engine)
+            fetch = lambda: self._search_multi(query, engines, max_results, first_wins, **kwargs)
+        else:
+            fetch = lambda: self._search_engine(query, engine, max_results, **kwargs)
+        
+        if self.cache is None:
+            return fetch()
+        # 正規化したクエリ、エンジン、パラメータが同じ検索はキャッシュから返す
+        cache_engine = engines if self._is_multi_engine(engine) else engine
+        params = {"max_results": max_results, "first_wins": first_wins, **kwargs}
+        return self.cache.get_or_fetch(query, cache_engine, params, fetch)
+    
+    async def asearch(self, query, engine=None, max_results=4, first_wins=False, hedge_after=None, **kwargs):
+        """
+        searchの非同期版。各エンジンの非同期APIを使用し、イベントループをブロックせずに検索を実行
+        
+        Args:
+            query (str): 検索クエリ
+            engine (str or list, optional): 使用する検索エンジン。指定がない場合はデフォルトエンジンを使用
+                "all" またはエンジン名のリストを指定すると、複数のエンジンに同時に検索を実行
+            first_wins (bool): 複数エンジン指定時に、最初に結果を返したエンジンの結果のみを使用するかどうか
+            hedge_after (float, optional): engine="auto"で、優先エンジンが応答しない場合に
+                次のエンジンへ送信するまでの秒数
+            **kwargs: 各検索エンジン固有のパラメータ
+        
+        Returns:
+            dict or list: 検索結果（searchと同じ形式）
+        
+        Raises:
+            ValueError: 指定されたエンジンが利用できない場合
+            RuntimeError: エンジンの初期化に失敗した場合（APIキー未設定など）
+        """
+        engine = engine or self.default_engine
+        
+        if not self.available_engines():
+            raise RuntimeError(f"利用可能な検索エンジンがありません。")
+        
+        if engine == "auto":
+            fetch = lambda: self._asearch_auto(query, max_results, hedge_after, **kwargs)
+        elif self._is_multi_engine(engine):
+            engines = self._resolve_engines(engine)
+            fetch = lambda: self._asearch_multi(query, engines, max_results, first_wins, **kwargs)
+        else:
+            fetch = lambda: self._asearch_engine(query, engine, max_results, **kwargs)
+        
+        if self.cache is None:
+            return await fetch()
+        cache_engine = engines if self._is_multi_engine(engine) else engine
+        params = {"max_results": max_results, "first_wins": first_wins, **kwargs}
+        return await self.cache.aget_or_fetch(query, cache_engine, params, fetch)
+    
+    def cache_stats(self):
+        """
+        検索結果キャッシュの統計情報を返す
+        
+        Returns:
+            dict or None: ヒット数、ミス数、ヒット率などの統計情報。キャッシュを使用していない場合はNone
+        """
+        if self.cache is None:
+            return None
+        return self.cache.stats()
+    
+    def _check_engine(self, engine):
+        """エンジンが登録されているか確認する"""
+        if engine not in self.registry:
             available = ", ".join(self.available_engines())
             error_msg = f"指定されたエンジン '{engine}' は利用できません。"
             
@@ -82,17 +266,371 @@ class WebSearch:
                 error_msg += "\n利用可能なエンジンはありません。"
                 
             raise ValueError(error_msg)
+    
+    def _engine_kwargs(self, engine, kwargs):
+        """エンジンに渡すパラメータを返す"""
+        kwargs = dict(kwargs)
+        custom_search_engine_id = kwargs.pop("custom_search_engine_id", None)
+        if engine == "google":
+            # Google検索の場合、custom_search_engine_idを渡す
+            kwargs["custom_search_engine_id"] = custom_search_engine_id
+        # custom_search_engine_idはGoogle専用のため、他のエンジンには渡さない
+        return kwargs
+    
+    def _search_engine(self, query, engine, max_results=4, **kwargs):
+        """1つの検索エンジンで検索を実行"""
+        self._check_engine(engine)
         
-        engine_data = self.engines[engine]
+        # エンジンごとの同時実行数・クエリ数の上限内で実行
+        with self._get_limiter(engine).slot(cost=self._query_cost(engine, max_results)):
+            # 上限による待ち時間を除いた応答時間と成否を記録（初期化の失敗もエラーとして記録）
+            self.engine_stats.mark_used(engine)
+            start_time = time.monotonic()
+            try:
+                # 初回使用時にエンジンをimportおよび初期化
+                engine_data = self.registry.get(engine)
+                results = engine_data["search_func"](query, max_results=max_results, **self._engine_kwargs(engine, kwargs))
+            except Exception:
+                self.engine_stats.record(engine, time.monotonic() - start_time, ok=False)
+                raise
+            latency = time.monotonic() - start_time
+            self.engine_stats.record(engine, latency)
+        self._record_fixture(query, engine, max_results, results, latency)
+        return results
+    
+    async def _asearch_engine(self, query, engine, max_results=4, **kwargs):
+        """1つの検索エンジンで非同期に検索を実行（非同期版を持たないエンジンはスレッドで実行）"""
+        self._check_engine(engine)
+        engine_kwargs = self._engine_kwargs(engine, kwargs)
         
+        async with self._get_limiter(engine).aslot(cost=self._query_cost(engine, max_results)):
+            self.engine_stats.mark_used(engine)
+            start_time = time.monotonic()
+            try:
+                engine_data = self.registry.get(engine)
+                if engine_data.get("asearch_func") is not None:
+                    results = await engine_data["asearch_func"](query, max_results=max_results, **engine_kwargs)
+                else:
+                    results = await asyncio.to_thread(engine_data["search_func"], query, max_results=max_results, **engine_kwargs)
+            except asyncio.CancelledError:
+                # ヘッジで不要になり中止した検索は、少なくとも中止までの時間がかかったものとして記録
+                self.engine_stats.record(engine, time.monotonic() - start_time)
+                raise
+            except Exception:
+                self.engine_stats.record(engine, time.monotonic() - start_time, ok=False)
+                raise
+            latency = time.monotonic() - start_time
+            self.engine_stats.record(engine, latency)
+        self._record_fixture(query, engine, max_results, results, latency)
+        return results
+    
+    def _record_fixture(self, query, engine, max_results, results, latency):
+        """fixture_recorderが指定されている場合、検索結果を標準化して記録する（記録の失敗は検索に影響させない）"""
+        if self.fixture_recorder is None or engine in self.OFFLINE_ENGINES:
+            return
+        try:
+            standardized_results = [
+                dict(result) for result in self.process_results(results, engine)
+            ]
+            self.fixture_recorder.put(
+                SEARCH_NAMESPACE, make_search_request(query, max_results), standardized_results, latency=latency
+            )
+        except Exception as e:
+            self.logger.warning(f"検索結果の記録に失敗しました: {str(e)}")
+    
+    def _get_limiter(self, engine):
+        """エンジンのリクエスト制御を取得（初回使用時に生成）"""
+        limiter = self._limiters.get(engine)
+        if limiter is None:
+            with self._limiters_lock:
+                limiter = self._limiters.get(engine)
+                if limiter is None:
+                    limiter = EngineLimiter(**self.engine_limits.get(engine, {}))
+                    self._limiters[engine] = limiter
+        return limiter
+    
+    def _query_cost(self, engine, max_results):
+        """1回の検索で消費するAPIのクエリ数（Googleは10件ごとに1クエリ）"""
         if engine == "google":
-            # Google検索の場合、custom_search_engine_idを渡す
-            custom_search_engine_id = kwargs.pop("custom_search_engine_id", None)
-            return engine_data["search_func"](query, max_results=max_results, custom_search_engine_id=custom_search_engine_id, **kwargs)
-        elif engine == "bing":
-            return engine_data["search_func"](query, max_results=max_results, **kwargs)
-        elif engine == "duckduckgo":
-            return engine_data["search_func"](query, max_results=max_results, **kwargs)
+            return max(1, math.ceil(max_results / 10))
+        return 1
+    
+    def quota_stats(self):
+        """
+        使用済みのエンジンごとのクエリ数と上限を返す
+        
+        Returns:
+            dict: エンジン名をキー、使用状況（used_today, daily_quota, remaining_today, in_flight）を値とする辞書
+        """
+        return {engine: limiter.stats() for engine, limiter in list(self._limiters.items())}
+    
+    def latency_stats(self):
+        """
+        エンジンごとの直近の応答時間とエラー率を返す
+        
+        Returns:
+            dict: エンジン名をキー、件数・p50・p95・エラー率を値とする辞書
+        """
+        return self.engine_stats.snapshot()
+    
+    def _auto_ranking(self):
+        """engine="auto"で使用するエンジンを優先順に返す"""
+        engines = [
+            engine for engine in (self.auto_engines or self._resolve_engines("all"))
+            if engine in self.registry
+        ]
+        if not engines:
+            raise ValueError("engine=\"auto\" で使用できる検索エンジンがありません。")
+        return self.engine_stats.rank(engines)
+    
+    def _hedge_delay(self, engine, hedge_after):
+        """優先エンジンの応答を待つ秒数（指定がない場合は直近のp95）"""
+        if hedge_after is None:
+            hedge_after = self.hedge_after
+        if hedge_after is None:
+            hedge_after = self.engine_stats.percentile(engine)
+        return self.DEFAULT_HEDGE_AFTER if hedge_after is None else hedge_after
+    
+    def _search_auto(self, query, max_results=4, hedge_after=None, **kwargs):
+        """
+        直近の応答時間とエラー率が最も良いエンジンで検索を実行
+        優先エンジンがhedge_after秒以内に応答しない場合は次のエンジンにも送信し、
+        先に結果を返した方を採用します。失敗した場合や結果が空の場合は次のエンジンで再検索します。
+        
+        Args:
+            query (str): 検索クエリ
+            max_results (int): 取得件数
+            hedge_after (float, optional): 次のエンジンへ送信するまでの秒数
+            **kwargs: 各検索エンジン固有のパラメータ
+        
+        Returns:
+            dict: {採用したエンジン名: 検索結果}
+        
+        Raises:
+            RuntimeError: すべてのエンジンで検索に失敗した場合
+        """
+        remaining = self._auto_ranking()
+        delay = self._hedge_delay(remaining[0], hedge_after)
+        futures = {}
+        errors = {}
+        fallback = None
+        hedged = False
+        executor = ThreadPoolExecutor(max_workers=len(remaining), thread_name_prefix="websearch-auto")
+        
+        def launch():
+            engine = remaining.pop(0)
+            futures[executor.submit(self._search_engine, query, engine, max_results, **dict(kwargs))] = engine
+        
+        try:
+            launch()
+            while futures:
+                timeout = delay if remaining and not hedged else None
+                done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # 閾値内に応答がないため、次のエンジンにも送信（ヘッジ）
+                    hedged = True
+                    self.logger.info(f"検索エンジン '{futures[next(iter(futures))]}' が{delay:.2f}秒以内に応答しないため、'{remaining[0]}' にも送信します。")
+                    launch()
+                    continue
+                for future in done:
+                    engine = futures.pop(future)
+                    try:
+                        raw_results = future.result()
+                    except Exception as e:
+                        self.logger.warning(f"検索エンジン '{engine}' での検索に失敗しました: {str(e)}")
+                        errors[engine] = e
+                        continue
+                    if self.process_results(raw_results, engine):
+                        return {engine: raw_results}
+                    fallback = fallback or {engine: raw_results}
+                if not futures and remaining:
+                    # 失敗した場合や結果が空の場合は、待たずに次のエンジンで検索
+                    launch()
+        finally:
+            # 採用しなかった検索の応答は待たない（完了時に応答時間が統計に記録される）
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if fallback is not None:
+            return fallback
+        detail = ", ".join(f"{engine}: {error}" for engine, error in errors.items())
+        raise RuntimeError(f"すべての検索エンジンで検索に失敗しました。({detail})")
+    
+    async def _asearch_auto(self, query, max_results=4, hedge_after=None, **kwargs):
+        """
+        _search_autoの非同期版
+        
+        Args:
+            query (str): 検索クエリ
+            max_results (int): 取得件数
+            hedge_after (float, optional): 次のエンジンへ送信するまでの秒数
+            **kwargs: 各検索エンジン固有のパラメータ
+        
+        Returns:
+            dict: {採用したエンジン名: 検索結果}
+        
+        Raises:
+            RuntimeError: すべてのエンジンで検索に失敗した場合
+        """
+        remaining = self._auto_ranking()
+        delay = self._hedge_delay(remaining[0], hedge_after)
+        tasks = {}
+        errors = {}
+        fallback = None
+        hedged = False
+        
+        def launch():
+            engine = remaining.pop(0)
+            tasks[asyncio.ensure_future(self._asearch_engine(query, engine, max_results, **kwargs))] = engine
+        
+        try:
+            launch()
+            while tasks:
+                timeout = delay if remaining and not hedged else None
+                done, _ = await asyncio.wait(list(tasks), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.logger.info(f"検索エンジン '{tasks[next(iter(tasks))]}' が{delay:.2f}秒以内に応答しないため、'{remaining[0]}' にも送信します。")
+                    launch()
+                    continue
+                for task in done:
+                    engine = tasks.pop(task)
+                    try:
+                        raw_results = task.result()
+                    except Exception as e:
+                        self.logger.warning(f"検索エンジン '{engine}' での検索に失敗しました: {str(e)}")
+                        errors[engine] = e
+                        continue
+                    if self.process_results(raw_results, engine):
+                        return {engine: raw_results}
+                    fallback = fallback or {engine: raw_results}
+                if not tasks and remaining:
+                    launch()
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        if fallback is not None:
+            return fallback
+        detail = ", ".join(f"{engine}: {error}" for engine, error in errors.items())
+        raise RuntimeError(f"すべての検索エンジンで検索に失敗しました。({detail})")
+    
+    def _search_multi(self, query, engines, max_results=4, first_wins=False, **kwargs):
+        """
+        複数の検索エンジンに並列で検索を実行
+        
+        Args:
+            query (str): 検索クエリ
+            engines (list): 使用する検索エンジン名のリスト
+            max_results (int): 各エンジンの取得件数
+            first_wins (bool): 最初に結果を返したエンジンの結果のみを使用するかどうか
+            **kwargs: 各検索エンジン固有のパラメータ
+        
+        Returns:
+            dict: エンジン名をキー、各エンジンの検索結果を値とする辞書
+                  （失敗したエンジンは含まない。first_wins=Trueの場合は1件のみ）
+        
+        Raises:
+            RuntimeError: すべてのエンジンで検索に失敗した場合
+        """
+        if not engines:
+            raise ValueError("検索エンジンが指定されていません。")
+        
+        results = {}
+        errors = {}
+        executor = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix="websearch")
+        try:
+            futures = {
+                executor.submit(self._search_engine, query, engine, max_results, **dict(kwargs)): engine
+                for engine in engines
+            }
+            for future in as_completed(futures):
+                engine = futures[future]
+                try:
+                    raw_results = future.result()
+                except Exception as e:
+                    # 一部のエンジンの失敗（APIキー未設定など）は他のエンジンの結果に影響させない
+                    self.logger.warning(f"検索エンジン '{engine}' での検索に失敗しました: {str(e)}")
+                    errors[engine] = e
+                    continue
+                
+                if first_wins:
+                    # 結果が空のエンジンは採用せず、次に応答したエンジンを待つ
+                    if self.process_results(raw_results, engine):
+                        return {engine: raw_results}
+                    results.setdefault(engine, raw_results)
+                    continue
+                results[engine] = raw_results
+        finally:
+            # first_winsで先に返す場合は、残りのエンジンの応答を待たない
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if not results and errors:
+            detail = ", ".join(f"{engine}: {error}" for engine, error in errors.items())
+            raise RuntimeError(f"すべての検索エンジンで検索に失敗しました。({detail})")
+        if first_wins and results:
+            # すべてのエンジンの結果が空だった場合
+            engine = next(iter(results))
+            return {engine: results[engine]}
+        return results
+    
+    async def _asearch_multi(self, query, engines, max_results=4, first_wins=False, **kwargs):
+        """
+        _search_multiの非同期版。複数の検索エンジンに同時に検索を実行
+        
+        Args:
+            query (str): 検索クエリ
+            engines (list): 使用する検索エンジン名のリスト
+            max_results (int): 各エンジンの取得件数
+            first_wins (bool): 最初に結果を返したエンジンの結果のみを使用するかどうか
+            **kwargs: 各検索エンジン固有のパラメータ
+        
+        Returns:
+            dict: エンジン名をキー、各エンジンの検索結果を値とする辞書
+        
+        Raises:
+            RuntimeError: すべてのエンジンで検索に失敗した場合
+        """
+        if not engines:
+            raise ValueError("検索エンジンが指定されていません。")
+        
+        results = {}
+        errors = {}
+        tasks = {
+            asyncio.ensure_future(self._asearch_engine(query, engine, max_results, **kwargs)): engine
+            for engine in engines
+        }
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 同時に完了したタスクは指定順に処理する
+                for task in sorted(done, key=lambda task: engines.index(tasks[task])):
+                    engine = tasks[task]
+                    try:
+                        raw_results = task.result()
+                    except Exception as e:
+                        self.logger.warning(f"検索エンジン '{engine}' での検索に失敗しました: {str(e)}")
+                        errors[engine] = e
+                        continue
+                    
+                    if first_wins:
+                        if self.process_results(raw_results, engine):
+                            return {engine: raw_results}
+                        results.setdefault(engine, raw_results)
+                        continue
+                    results[engine] = raw_results
+        finally:
+            # first_winsで先に返す場合（または呼び出し元がキャンセルした場合）は残りの検索を中止する
+            for task in tasks:
+                task.cancel()
+        
+        if not results and errors:
+            detail = ", ".join(f"{engine}: {error}" for engine, error in errors.items())
+            raise RuntimeError(f"すべての検索エンジンで検索に失敗しました。({detail})")
+        if first_wins and results:
+            engine = next(iter(results))
+            return {engine: results[engine]}
+        return results
     
     def process_results(self, results, engine=None):
         """
@@ -100,18 +638,32 @@ class WebSearch:
         
         Args:
             results: search()メソッドから返された検索結果
-            engine (str, optional): 結果を処理する検索エンジン。指定がない場合はデフォルトエンジンを使用
+            engine (str or list, optional): 結果を処理する検索エンジン。指定がない場合はデフォルトエンジンを使用
+                複数エンジンまたは "auto" 指定時は、各エンジンの結果を標準化したうえで
+                Reciprocal Rank Fusionで統合し、URLの重複を除去する
         
         Returns:
-            list: 標準化された検索結果のリスト。各要素は以下の形式:
+            list: 標準化された検索結果（SearchResult）のリスト。各要素は辞書のサブクラスのため、json.dumpsにそのまま渡せ、
+            以下の項目を持つ:
             {
                 "title": "タイトル",
                 "link": "URL",
                 "snippet": "スニペット/説明文",
                 "source": "検索エンジン名"
             }
+            複数エンジンの結果を統合した場合は、"sources"（結果を返したエンジン名のリスト）を含む
         """
         engine = engine or self.default_engine
+        
+        if self._returns_engine_dict(engine):
+            ranked_lists = {
+                engine_name: self.process_results(engine_results, engine_name)
+                for engine_name, engine_results in results.items()
+            }
+            if len(ranked_lists) == 1:
+                return next(iter(ranked_lists.values()))
+            return reciprocal_rank_fusion(ranked_lists)
+        
         standardized_results = []
         
         if engine == "google":
@@ -119,81 +671,293 @@ class WebSearch:
             for response in results:
                 if "items" in response:
                     for item in response["items"]:
-                        standardized_results.append({
-                            "title": item.get("title", ""),
-                            "link": item.get("link", ""),
-                            "snippet": item.get("snippet", "").replace("\n", " "),
-                            "source": "google"
-                        })
+                        standardized_results.append(SearchResult(
+                            title=item.get("title", ""),
+                            link=item.get("link", ""),
+                            snippet=item.get("snippet", "").replace("\n", " "),
+                            source="google"
+                        ))
         
         elif engine == "bing":
             # Bingの結果を標準化
             if "webPages" in results and "value" in results["webPages"]:
                 for item in results["webPages"]["value"]:
-                    standardized_results.append({
-                        "title": item.get("name", ""),
-                        "link": item.get("url", ""),
-                        "snippet": item.get("snippet", ""),
-                        "source": "bing"
-                    })
+                    standardized_results.append(SearchResult(
+                        title=item.get("name", ""),
+                        link=item.get("url", ""),
+                        snippet=item.get("snippet", ""),
+                        source="bing"
+                    ))
         
         elif engine == "duckduckgo":
             # DuckDuckGoの結果を標準化
             for item in results:
-                standardized_results.append({
-                    "title": item.get("title", ""),
-                    "link": item.get("href", ""),
-                    "snippet": item.get("body", ""),
-                    "source": "duckduckgo"
-                })
+                standardized_results.append(SearchResult(
+                    title=item.get("title", ""),
+                    link=item.get("href", ""),
+                    snippet=item.get("body", ""),
+                    source="duckduckgo"
+                ))
+        
+        else:
+            # 追加登録されたエンジンは、process_resultsを持つ場合はそれで標準化し、
+            # 持たない場合は標準化済みの結果を返すものとして扱う
+            instance = self.registry.get(engine)["instance"]
+            if instance is not None and hasattr(instance, "process_results"):
+                standardized_results = list(instance.process_results(results))
+            else:
+                standardized_results = list(results or [])
+            # 標準の項目を持つ辞書はSearchResultに揃える（独自の項目はそのまま保持する）
+            standardized_results = [
+                SearchResult(**result)
+                if type(result) is dict and set(SearchResult.REQUIRED_FIELDS) <= set(result)
+                and all(isinstance(key, str) for key in result)
+                else result
+                for result in standardized_results
+            ]
         
         return standardized_results
 
-    def search_and_standardize(self, query, engine=None, scrape_urls=False, scrape_options=None, max_results=4, **kwargs):
+    def search_and_standardize(self, query, engine=None, scrape_urls=False, scrape_options=None, max_results=4,
+                               pipelined=False, **kwargs):
         """
         検索を実行し、結果を標準化された形式で返す便利なメソッド
         
         Args:
             query (str): 検索クエリ
-            engine (str, optional): 使用する検索エンジン。指定がない場合はデフォルトエンジンを使用
+            engine (str or list, optional): 使用する検索エンジン。指定がない場合はデフォルトエンジンを使用
+                "all" またはエンジン名のリストを指定すると、複数のエンジンの結果を統合
+                "auto" を指定すると、直近の応答時間とエラー率が最も良いエンジンを使用
             scrape_urls (bool): 検索結果のURLをスクレイピングするかどうか
             scrape_options (dict, optional): スクレイピングのオプション
                 - output_dir (str): 保存先ディレクトリ（デフォルト: "scraped_data"）
                 - save_json (bool): JSONとして保存するかどうか（デフォルト: True）
                 - save_markdown (bool): Markdownとして保存するかどうか（デフォルト: True）
                 - exclude_links (bool): リンクテキストを除外するかどうか（デフォルト: False）
-            **kwargs: 各検索エンジン固有のパラメータ
+                - top_k (int): タイトルとスニペットのBM25スコアの上位top_k件のみスクレイピングする
+                - min_score (float): BM25スコアがmin_score以上の結果のみスクレイピングする
+                - snippet_coverage (float): スニペット全体がクエリの語をこの割合以上含む場合は
+                  スクレイピングせず、スニペットのみで回答する（snippets_only=True）
+            pipelined (bool): Trueの場合、検索結果の各URLを共有のスケジューラで並列にスクレイピングする
+                （他のクエリのスクレイピングと同時実行数の上限を共有）
+            **kwargs: 各検索エンジン固有のパラメータ（first_wins, hedge_afterを含む）
             
         Returns:
             dict: {
                 "search_results": list[dict], # 標準化された検索結果のリスト
                 "scraped_data": dict, # スクレイピング結果（scrape_urls=Trueの場合）
+                "snippets_only": bool, # スニペットのみで回答できると判断し、スクレイピングしなかったかどうか
             }
         """
-        raw_results = self.search(query, engine, max_results,**kwargs)
-        standardized_results = self.process_results(raw_results, engine)
+        standardized_results = self._search_standardized(query, engine, max_results, **kwargs)
         
         response = {
             "search_results": standardized_results,
-            "scraped_data": None
+            "scraped_data": None,
+            "snippets_only": False
         }
         
         if scrape_urls and standardized_results:
-            # スクレイピングオプションの設定
-            scrape_options = scrape_options or {}
-            urls = [result["link"] for result in standardized_results]
+            # 関連性の低い結果はスクレイピングしない
+            to_scrape, response["snippets_only"] = self._select_for_scraping(query, standardized_results, scrape_options)
+            if not to_scrape:
+                return response
+            if pipelined:
+                pending = self._submit_scrapes(to_scrape, scrape_options)
+                response["scraped_data"] = {url: future.result() for url, future in pending}
+                return response
             
             # スクレイピングの実行
-            scraped_data = self.scraper.scrape_multiple_urls(
-                urls=urls,
-                output_dir=scrape_options.get("output_dir", "scraped_data"),
-                save_json=scrape_options.get("save_json", True),
-                save_markdown=scrape_options.get("save_markdown", True),
-                exclude_links=scrape_options.get("exclude_links", False),
-                max_depth=scrape_options.get("max_depth", 20)
+            response["scraped_data"] = self.scraper.scrape_multiple_urls(
+                urls=[result["link"] for result in to_scrape],
+                **self._scrape_kwargs(scrape_options)
             )
+        
+        return response
+    
+    def _search_standardized(self, query, engine=None, max_results=4, **kwargs):
+        """検索を実行し、標準化した結果を返す（複数エンジンの統合結果は取得件数に揃える）"""
+        raw_results = self.search(query, engine, max_results, **kwargs)
+        standardized_results = self.process_results(raw_results, engine)
+        if self._returns_engine_dict(engine):
+            # 統合後の結果も取得件数に揃える
+            standardized_results = standardized_results[:max_results]
+        return standardized_results
+    
+    def _select_for_scraping(self, query, standardized_results, scrape_options):
+        """
+        スクレイピングする検索結果を選択する
+        scrape_optionsにtop_k, min_score, snippet_coverageのいずれかの指定がある場合は、
+        タイトルとスニペットのBM25スコアで絞り込む
+        
+        Returns:
+            tuple: (スクレイピングする検索結果のリスト, スニペットのみで回答するかどうか)
+        """
+        scrape_options = scrape_options or {}
+        triage_options = {
+            name: scrape_options.get(name)
+            for name in ("top_k", "min_score", "snippet_coverage")
+        }
+        if all(value is None for value in triage_options.values()):
+            return standardized_results, False
+        from src.websearch.relevance import triage_results
+        return triage_results(query, standardized_results, **triage_options)
+    
+    def _scrape_kwargs(self, scrape_options):
+        """スクレイピングのオプションをWebScraperの引数に変換する"""
+        scrape_options = scrape_options or {}
+        return {
+            "output_dir": scrape_options.get("output_dir", "scraped_data"),
+            "save_json": scrape_options.get("save_json", True),
+            "save_markdown": scrape_options.get("save_markdown", True),
+            "exclude_links": scrape_options.get("exclude_links", False),
+            "max_depth": scrape_options.get("max_depth", 20)
+        }
+    
+    def _submit_scrapes(self, standardized_results, scrape_options):
+        """検索結果のURLのスクレイピングを共有のスケジューラに登録し、(URL, Future)のリストを返す"""
+        scrape_kwargs = self._scrape_kwargs(scrape_options)
+        return [
+            (result["link"], self.scrape_scheduler.submit(result["link"], **scrape_kwargs))
+            for result in standardized_results
+        ]
+    
+    async def asearch_and_standardize(self, query, engine=None, scrape_urls=False, scrape_options=None, max_results=4,
+                                      pipelined=False, **kwargs):
+        """
+        search_and_standardizeの非同期版。検索は非同期に実行し、
+        スクレイピング（同期処理）はイベントループをブロックしないようスレッドで実行します。
+        
+        Args:
+            query (str): 検索クエリ
+            engine (str or list, optional): 使用する検索エンジン
+            scrape_urls (bool): 検索結果のURLをスクレイピングするかどうか
+            scrape_options (dict, optional): スクレイピングのオプション（search_and_standardizeと同じ）
+            pipelined (bool): Trueの場合、検索結果の各URLを共有のスケジューラで並列にスクレイピングする
+            **kwargs: 各検索エンジン固有のパラメータ（first_wins, hedge_afterを含む）
+            
+        Returns:
+            dict: search_and_standardizeと同じ形式の結果
+        """
+        raw_results = await self.asearch(query, engine, max_results, **kwargs)
+        standardized_results = self.process_results(raw_results, engine)
+        if self._returns_engine_dict(engine):
+            standardized_results = standardized_results[:max_results]
+        
+        response = {
+            "search_results": standardized_results,
+            "scraped_data": None,
+            "snippets_only": False
+        }
+        
+        if scrape_urls and standardized_results:
+            to_scrape, response["snippets_only"] = self._select_for_scraping(query, standardized_results, scrape_options)
+            if not to_scrape:
+                return response
+            if pipelined:
+                pending = self._submit_scrapes(to_scrape, scrape_options)
+                scraped = await asyncio.gather(*[asyncio.wrap_future(future) for _, future in pending])
+                response["scraped_data"] = {url: data for (url, _), data in zip(pending, scraped)}
+                return response
             
-            response["scraped_data"] = scraped_data
+            response["scraped_data"] = await asyncio.to_thread(
+                self.scraper.scrape_multiple_urls,
+                urls=[result["link"] for result in to_scrape],
+                **self._scrape_kwargs(scrape_options)
+            )
         
         return response
-
+    
+    def search_many(self, queries, engine=None, scrape_urls=False, scrape_options=None, max_results=4,
+                    max_workers=8, return_exceptions=False, pipelined=True, **kwargs):
+        """
+        複数のクエリを並列で検索し、search_and_standardizeと同じ形式の結果を入力順に返す
+        各エンジンの同時実行数・1秒あたりのクエリ数・1日あたりのクエリ数の上限は
+        engine_limitsの設定に従って制御されます（指定がない場合はmax_workersのみで制御）。
+        
+        Args:
+            queries (list): 検索クエリのリスト。各要素は文字列、または
+                {"query": クエリ, ...search_and_standardizeの引数}の辞書（クエリごとに引数を上書き）
+            engine (str or list, optional): 使用する検索エンジン
+            scrape_urls (bool): 検索結果のURLをスクレイピングするかどうか
+            scrape_options (dict, optional): スクレイピングのオプション
+            max_results (int): 各クエリの取得件数
+            max_workers (int): 並列に処理するクエリ数の上限
+            return_exceptions (bool): Trueの場合、失敗したクエリの位置に例外を格納して返す。
+                Falseの場合、最初に失敗したクエリの例外を送出する
+            pipelined (bool): Trueの場合、各クエリの検索が完了した時点でそのURLのスクレイピングを
+                共有のスケジューラに登録し、他のクエリの検索と並行して実行する。
+                スクレイピング全体の同時実行数はscrape_workersに制限される
+            **kwargs: 各検索エンジン固有のパラメータ
+        
+        Returns:
+            list: 各クエリのsearch_and_standardizeの結果（入力順）
+        """
+        if not queries:
+            return []
+        
+        def run(item):
+            params = {
+                "engine": engine,
+                "scrape_urls": scrape_urls,
+                "scrape_options": scrape_options,
+                "max_results": max_results,
+                "pipelined": pipelined,
+                **kwargs
+            }
+            if isinstance(item, dict):
+                params.update(item)
+                query = params.pop("query")
+            else:
+                query = item
+            if not params.pop("pipelined"):
+                return self.search_and_standardize(query, **params), None
+            
+            # 検索のみを行い、スクレイピングは登録だけして完了を待たない（次のクエリの検索に進む）
+            scrape = params.pop("scrape_urls")
+            options = params.pop("scrape_options")
+            response = {
+                "search_results": self._search_standardized(query, **params),
+                "scraped_data": None,
+                "snippets_only": False
+            }
+            pending = None
+            if scrape and response["search_results"]:
+                to_scrape, response["snippets_only"] = self._select_for_scraping(query, response["search_results"], options)
+                if to_scrape:
+                    pending = self._submit_scrapes(to_scrape, options)
+            return response, pending
+        
+        results = [None] * len(queries)
+        
+        def fail(index, error):
+            self.logger.warning(f"検索に失敗しました: {queries[index]} ({str(error)})")
+            if not return_exceptions:
+                raise error
+            results[index] = error
+        
+        pending_scrapes = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(queries)), thread_name_prefix="websearch-batch") as executor:
+            futures = {executor.submit(run, item): index for index, item in enumerate(queries)}
+            try:
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        results[index], pending = future.result()
+                    except Exception as e:
+                        fail(index, e)
+                        continue
+                    if pending:
+                        pending_scrapes[index] = pending
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+        
+        # 登録したスクレイピングの完了を待つ
+        for index, pending in pending_scrapes.items():
+            try:
+                results[index]["scraped_data"] = {url: future.result() for url, future in pending}
+            except Exception as e:
+                fail(index, e)
+        return results
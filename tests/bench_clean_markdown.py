@@ -0,0 +1,41 @@
+"""
+_clean_markdownの書き換え前後の処理時間を比較するベンチマーク。
+
+    python -m tests.bench_clean_markdown [サイズ(MB)]
+"""
+import sys
+import time
+
+from src.webscraping.web_scraping import WebScraper
+from tests.legacy_clean_markdown import legacy_clean_markdown
+from tests.markdown_samples import large_markdown
+
+
+def _measure(func, markdown, repeat):
+    """repeat回実行した中で最短の秒数と、その出力を返す"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(markdown)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    markdown = large_markdown(int(size_mb * 1024 * 1024))
+    heading_only = sum(line.strip() in WebScraper.HEADING_ONLY_LINES for line in markdown.split("\n"))
+    print(f"入力: {len(markdown.encode('utf-8')) / 1024 / 1024:.2f} MB, "
+          f"{markdown.count(chr(10)) + 1}行（見出し記号のみの行 {heading_only}行）")
+
+    current, current_result = _measure(WebScraper()._clean_markdown, markdown, repeat=5)
+    legacy, legacy_result = _measure(legacy_clean_markdown, markdown, repeat=1)
+    print(f"書き換え前: {legacy:.3f}秒")
+    print(f"書き換え後: {current:.3f}秒（{legacy / current:.0f}倍）")
+    print(f"出力の一致: {current_result == legacy_result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import re
+
+# src/webscraping/web_scraping.py の _clean_markdown を1回の走査に書き換える前の実装。
+# 書き換え後の実装と出力が一致することの確認と、ベンチマークの比較対象に使用する。
+
+CONSECUTIVE_NEWLINES_PATTERN = re.compile(r'\n{3,}')
+INDENT_PATTERN = re.compile(r'^(\s*)')
+CONSECUTIVE_SPACES_PATTERN = re.compile(r' {4,}')
+HEADING_ONLY_PATTERN = re.compile(r'^#{1,6}\s*$')
+HEADING_START_PATTERN = re.compile(r'^#{1,6}')
+
+
+def legacy_clean_markdown(markdown):
+    """書き換え前の_clean_markdown"""
+    # 連続する改行を1つの改行に置換
+    markdown = CONSECUTIVE_NEWLINES_PATTERN.sub('\n\n', markdown)
+    
+    # 行ごとに処理
+    lines = markdown.split('\n')
+    cleaned_lines = []
+    
+    for i, line in enumerate(lines):
+        # 連続する空白を4つまでに制限
+        # 行頭のインデントは保持
+        indent_match = INDENT_PATTERN.match(line)
+        indent = indent_match.group(1) if indent_match else ''
+        content = line[len(indent):]
+        
+        # インデントは8スペースまで許可（タブ2個相当）
+        if len(indent) > 4:
+            indent = indent[:4]
+            
+        # 行の内容の連続空白を4つまでに制限
+        content = CONSECUTIVE_SPACES_PATTERN.sub('    ', content)
+        line = indent + content
+        
+        # 空白のみの行をスキップ
+        if not line.strip():
+            # 前後の行をチェックして、必要な場合のみ空行を保持
+            prev_line = cleaned_lines[-1] if cleaned_lines else ""
+            next_line = lines[i+1] if i+1 < len(lines) else ""
+            
+            # 段落区切りとして必要な場合のみ空行を追加
+            # 前の行が見出しや段落で、次の行にも内容がある場合
+            if (prev_line.strip().startswith('#') or 
+                prev_line.strip()) and next_line.strip():
+                cleaned_lines.append("")
+            continue
+            
+        # 見出し行の場合
+        if HEADING_ONLY_PATTERN.match(line.strip()):
+            # 次の非空行までチェック
+            next_non_empty = None
+            for next_line in lines[i+1:]:
+                if next_line.strip():
+                    next_non_empty = next_line
+                    break
+            
+            # 次の非空行が見出しの場合、現在の見出しをスキップ
+            if next_non_empty and HEADING_START_PATTERN.match(next_non_empty.strip()):
+                continue
+        
+        cleaned_lines.append(line)
+    
+    # 最後の空行を削除
+    while cleaned_lines and not cleaned_lines[-1].strip():
+        cleaned_lines.pop()
+        
+    return '\n'.join(cleaned_lines)
@@ -0,0 +1,36 @@
+import random
+
+# _clean_markdownの入力を生成する行の部品。
+# 見出し記号のみの行、空白のみの行、インデント、連続する空白、全角空白などの境界を多く含める
+LINE_FRAGMENTS = [
+    "", "", "", " ", "   ", "\t", "　", " \t ",
+    "#", "##", "###", "######", "#######", "# ", " ##", "##\t", "#　",
+    "# 見出し", "## Heading", "#no-space", "####### too deep",
+    "本文のテキスト", "plain text", "a     b", "x" + " " * 9 + "y",
+    "    indented", "        deep indent", "\t\ttabbed", "  - item", "1. item",
+    "[link](https://example.com)", "```", "> quote", "\x0b", "\x1c",
+]
+
+
+def random_markdown(rng, max_lines=40):
+    """部品を組み合わせたMarkdownを生成する（改行の連続も含める）"""
+    parts = []
+    for _ in range(rng.randint(0, max_lines)):
+        line = rng.choice(LINE_FRAGMENTS)
+        if rng.random() < 0.2:
+            line += rng.choice(LINE_FRAGMENTS)
+        parts.append(line)
+        parts.append("\n" * rng.choice([1, 1, 1, 2, 3, 4]))
+    return "".join(parts)
+
+
+def large_markdown(size=1024 * 1024, seed=0):
+    """ベンチマーク用の、見出し記号のみの行を多く含むsizeバイト以上のMarkdownを生成する"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        chunk = random_markdown(rng, max_lines=200)
+        parts.append(chunk)
+        length += len(chunk.encode("utf-8"))
+    return "".join(parts)
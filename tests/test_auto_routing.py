@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.websearch.engine_stats import EngineStats
+from src.websearch.web_search import WebSearch
+
+
+def _results(engine):
+    return [{"title": engine, "link": f"https://{engine}.example/", "snippet": "", "source": engine}]
+
+
+def _web_search(engines, **kwargs):
+    web_search = WebSearch(auto_engines=list(engines), **kwargs)
+    for name, search in engines.items():
+        web_search.register_engine(name, search)
+    return web_search
+
+
+def _engine(name, calls, delay=0.0, error=None, empty=False):
+    def search(query, max_results=4, **options):
+        calls.append(name)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return [] if empty else _results(name)
+    return search
+
+
+def test_rank_prefers_fast_reliable_engines():
+    stats = EngineStats(error_penalty=10.0)
+    for _ in range(10):
+        stats.record("fast", 0.1)
+        stats.record("slow", 0.5)
+        stats.record("flaky", 0.05, ok=False)
+    stats.record("flaky", 0.05)
+    # flaky: p95 0.05 + エラー率 10/11 のペナルティ
+    assert stats.rank(["flaky", "slow", "fast", "new"]) == ["new", "fast", "slow", "flaky"]
+    assert stats.percentile("slow") == 0.5
+    assert stats.error_rate("fast") == 0.0
+
+
+def test_stale_engines_are_probed_first():
+    stats = EngineStats(probe_interval=60)
+    stats.record("a", 0.1)
+    stats.record("b", 0.2)
+    now = time.monotonic()
+    stats._last_used["b"] = now - 61
+    assert stats.rank(["a", "b"]) == ["b", "a"]
+
+
+def test_auto_uses_best_ranked_engine():
+    calls = []
+    web_search = _web_search({"a": _engine("a", calls), "b": _engine("b", calls)}, hedge_after=1.0)
+    web_search.engine_stats.record("a", 0.5)
+    web_search.engine_stats.record("b", 0.1)
+    assert web_search.search("保険", engine="auto") == {"b": _results("b")}
+    assert calls == ["b"]
+
+
+def test_auto_hedges_to_next_engine_when_slow():
+    calls = []
+    release = threading.Event()
+
+    def stuck(query, max_results=4, **options):
+        calls.append("slow")
+        release.wait(2)
+        return _results("slow")
+
+    web_search = _web_search({"slow": stuck, "fast": _engine("fast", calls)})
+    try:
+        start = time.monotonic()
+        assert web_search.search("保険", engine="auto", hedge_after=0.05) == {"fast": _results("fast")}
+        assert time.monotonic() - start < 1
+        assert calls == ["slow", "fast"]
+    finally:
+        release.set()
+
+
+def test_auto_falls_back_on_error_and_empty_results():
+    calls = []
+    web_search = _web_search({
+        "broken": _engine("broken", calls, error=RuntimeError("503")),
+        "empty": _engine("empty", calls, empty=True),
+        "ok": _engine("ok", calls),
+    }, hedge_after=1.0)
+    assert web_search.search("保険", engine="auto") == {"ok": _results("ok")}
+    assert calls == ["broken", "empty", "ok"]
+    assert web_search.engine_stats.error_rate("broken") == 1.0
+
+
+def test_auto_returns_empty_result_when_nothing_better():
+    calls = []
+    web_search = _web_search({
+        "empty": _engine("empty", calls, empty=True),
+        "broken": _engine("broken", calls, error=RuntimeError("503")),
+    }, hedge_after=1.0)
+    assert web_search.search("保険", engine="auto") == {"empty": []}
+
+
+def test_auto_raises_when_all_engines_fail():
+    calls = []
+    web_search = _web_search({
+        "a": _engine("a", calls, error=RuntimeError("503")),
+        "b": _engine("b", calls, error=RuntimeError("timeout")),
+    }, hedge_after=1.0)
+    with pytest.raises(RuntimeError, match="a: 503, b: timeout"):
+        web_search.search("保険", engine="auto")
+
+
+def test_async_auto_hedges_and_cancels_slow_engine():
+    cancelled = []
+
+    class SlowEngine:
+        async def asearch(self, query, max_results=4, **options):
+            try:
+                await asyncio.sleep(2)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return _results("slow")
+
+    class FastEngine:
+        async def asearch(self, query, max_results=4, **options):
+            await asyncio.sleep(0.01)
+            return _results("fast")
+
+    web_search = _web_search({"slow": SlowEngine, "fast": FastEngine})
+
+    async def scenario():
+        result = await web_search.asearch("保険", engine="auto", hedge_after=0.05)
+        await asyncio.sleep(0)
+        return result
+
+    start = time.monotonic()
+    assert asyncio.run(scenario()) == {"fast": _results("fast")}
+    assert time.monotonic() - start < 1
+    assert cancelled == [True]
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from src.chat.batch_job import BATCH_ENDPOINT, BatchJob, LocalBatchClient, make_batch_line, parse_batch_output
+from src.chat.call_telemetry import CallbackTelemetrySink
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.response_cache import ResponseCache
+from src.chat.retry_policy import ChatError
+
+
+def _request(prompt):
+    return {"model": "model-a", "messages": [{"role": "user", "content": prompt}], "temperature": 0}
+
+
+def _responder(body):
+    prompt = body["messages"][-1]["content"]
+    if prompt == "fail":
+        raise ValueError("応答できません")
+    return f"応答:{prompt}"
+
+
+def _output_line(custom_id, status_code=200, content="ok", finish_reason="stop", error=None, body=None):
+    response = None
+    if status_code is not None:
+        response = {
+            "status_code": status_code,
+            "body": body or {"choices": [{"message": {"content": content}, "finish_reason": finish_reason}]},
+        }
+    return json.dumps({"custom_id": custom_id, "response": response, "error": error}, ensure_ascii=False)
+
+
+def test_make_batch_line():
+    request = _request("保険")
+    assert make_batch_line("request-0", request) == {
+        "custom_id": "request-0", "method": "POST", "url": BATCH_ENDPOINT, "body": request
+    }
+
+
+def test_write_requests_one_json_line_per_request(tmp_path):
+    job = BatchJob(LocalBatchClient(_responder), work_dir=str(tmp_path))
+    path = job.write_requests({"a": _request("保険"), "b": _request("年金")})
+    lines = [json.loads(line) for line in open(path, encoding="utf-8").read().splitlines()]
+    assert [line["custom_id"] for line in lines] == ["a", "b"]
+    assert lines[0]["body"]["messages"][0]["content"] == "保険"
+    with pytest.raises(ValueError):
+        job.write_requests({})
+
+
+def test_parse_batch_output():
+    text = "\n".join([
+        _output_line("ok", content="応答"),
+        "",
+        _output_line("cut", content="途中", finish_reason="length"),
+        _output_line("failed", status_code=None, error={"code": "server_error", "message": "失敗しました"}),
+        _output_line("rejected", status_code=400, body={"error": {"code": "invalid_request", "message": "不正"}}),
+        _output_line("unknown", status_code=500, body={}),
+    ])
+    results = parse_batch_output(text)
+    assert results["ok"] == "応答"
+    assert {custom_id: result.kind for custom_id, result in results.items() if isinstance(result, ChatError)} == {
+        "cut": "length", "failed": "server_error", "rejected": "invalid_request", "unknown": "batch"
+    }
+    assert results["rejected"].status_code == 400
+    assert "500" in results["unknown"].message
+
+
+def test_run_maps_results_and_errors_by_custom_id(tmp_path):
+    job = BatchJob(LocalBatchClient(_responder), work_dir=str(tmp_path), poll_interval=0)
+    results = job.run({"a": _request("保険"), "b": _request("fail")})
+    assert results["a"] == "応答:保険"
+    assert isinstance(results["b"], ChatError)
+    assert (results["b"].kind, results["b"].message) == ("ValueError", "応答できません")
+
+
+def test_missing_results_use_batch_status(tmp_path):
+    client = LocalBatchClient(_responder)
+    job = BatchJob(client, work_dir=str(tmp_path), poll_interval=0)
+
+    def expire(batch):
+        batch.status = "expired"
+    client._process = expire
+
+    results = job.run({"a": _request("保険")})
+    assert results["a"].kind == "expired"
+
+
+def test_wait_times_out(tmp_path):
+    job = BatchJob(LocalBatchClient(_responder, processing_time=60), work_dir=str(tmp_path), poll_interval=0.01)
+    batch_id = job.submit(job.write_requests({"a": _request("保険")}))
+    with pytest.raises(TimeoutError):
+        job.wait(batch_id, timeout=0.05)
+
+
+def test_local_client_rejects_other_endpoints():
+    client = LocalBatchClient(_responder)
+    with pytest.raises(ValueError):
+        client.batches.create(input_file_id="file", endpoint="/v1/embeddings", completion_window="24h")
+
+
+def test_adapter_batch_skips_cached_calls_and_keeps_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    submitted = []
+
+    def responder(body):
+        submitted.append(body["messages"][-1]["content"])
+        return _responder(body)
+
+    records = []
+    adapter = OpenaiAdapter(
+        response_cache=ResponseCache(":memory:"),
+        cache_policy="on",
+        batch_client=LocalBatchClient(responder),
+        telemetry_sink=CallbackTelemetrySink(records.append),
+    )
+    adapter.batch_dir = str(tmp_path)
+    adapter.batch_poll_interval = 0
+    calls = [{"prompt": prompt, "openai_model": "model-a"} for prompt in ("保険", "fail", "年金")]
+    # openai_modelを指定した呼び出しの温度の既定値は1
+    cached_request = adapter._make_request("model-a", adapter._make_messages("年金", None), 1)
+    adapter.response_cache.set(cached_request, "キャッシュ")
+
+    results = adapter.openai_chat_batch(calls)
+    assert results[0] == "応答:保険"
+    assert isinstance(results[1], ChatError)
+    assert results[2] == "キャッシュ"
+    assert submitted == ["保険", "fail"]
+    assert sorted(record.source for record in records) == ["batch", "batch", "cache"]
+
+    # 成功した応答はキャッシュされ、次のバッチには含めない
+    submitted.clear()
+    assert adapter.openai_chat_batch(calls[:1]) == ["応答:保険"]
+    assert submitted == []
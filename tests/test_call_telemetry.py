@@ -0,0 +1,127 @@
+import json
+from types import SimpleNamespace
+
+from src.chat.call_telemetry import CallRecord, JsonlTelemetrySink, TelemetrySink, TurnTelemetry
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.response_cache import ResponseCache
+
+
+def _usage(prompt_tokens=10, completion_tokens=5, cached_tokens=0):
+    details = SimpleNamespace(cached_tokens=cached_tokens)
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, prompt_tokens_details=details)
+
+
+def _record(stage, model="model-a", latency=1.0, source="api", error_kind=None, attempts=1, ttft=None, **usage):
+    record = CallRecord(stage, model, streaming=ttft is not None)
+    record.source = source
+    record.attempts = attempts
+    record.queue_time = 0.25
+    record.set_usage(_usage(**usage))
+    record.finish(error_kind)
+    record.latency = latency
+    record.time_to_first_token = ttft
+    return record
+
+
+def test_call_record_usage_and_dict():
+    record = _record(None, attempts=3, prompt_tokens=100, completion_tokens=20, cached_tokens=64)
+    assert record.stage == "chat"
+    assert (record.retries, record.total_tokens, record.cached_tokens) == (2, 120, 64)
+    data = record.to_dict()
+    assert data["retries"] == 2
+    assert data["success"] is True
+    json.dumps(data)
+
+
+def test_set_usage_ignores_missing_values():
+    record = CallRecord("judge", "model-a")
+    record.set_usage(None)
+    record.set_usage(SimpleNamespace(prompt_tokens=None, completion_tokens=3, prompt_tokens_details=None))
+    assert (record.prompt_tokens, record.completion_tokens, record.cached_tokens) == (0, 3, 0)
+
+
+def test_summary_aggregates_by_stage_in_call_order():
+    turn = TurnTelemetry()
+    turn.record(_record("keywords", latency=0.5, prompt_tokens=20, completion_tokens=10))
+    turn.record(_record("judge", latency=1.0, prompt_tokens=100, cached_tokens=80))
+    turn.record(_record("judge", model="model-b", latency=2.0, attempts=3, error_kind="server"))
+    turn.record(_record("judge", latency=0.0, source="cache", prompt_tokens=0, completion_tokens=0))
+    turn.record(_record("answer", latency=3.0, ttft=0.4))
+    turn.record(_record("answer", latency=1.0, ttft=0.9))
+    with turn.span("web_search"):
+        pass
+    turn.add_span("web_search", 1.5)
+    turn.finish()
+
+    summary = turn.summary()
+    assert list(summary["stages"]) == ["keywords", "judge", "answer"]
+    judge = summary["stages"]["judge"]
+    assert (judge["calls"], judge["reused"], judge["failures"], judge["retries"]) == (3, 1, 1, 2)
+    assert judge["models"] == {"model-a", "model-b"}
+    assert (judge["prompt_tokens"], judge["cached_tokens"]) == (110, 80)
+    assert (judge["latency"], judge["max_latency"], judge["queue_time"]) == (3.0, 2.0, 0.75)
+    # 最初のトークンまでの時間は、その段階で最初に記録した呼び出しの値
+    assert summary["stages"]["answer"]["time_to_first_token"] == 0.4
+    assert summary["total"]["calls"] == 6
+    assert summary["total"]["prompt_tokens"] == 20 + 110 + 20
+    assert summary["spans"]["web_search"] >= 1.5
+
+
+def test_finish_freezes_wall_time():
+    turn = TurnTelemetry()
+    turn.finish()
+    wall_time = turn.wall_time
+    turn.finish()
+    assert turn.finished
+    assert turn.summary()["wall_time"] == wall_time
+
+
+def test_report_lists_stages_spans_and_total():
+    turn = TurnTelemetry()
+    turn.record(_record("judge", prompt_tokens=100, cached_tokens=50, attempts=2))
+    turn.record(_record("judge", source="cache"))
+    turn.add_span("web_search", 0.5)
+    turn.finish()
+    lines = turn.report().splitlines()
+    assert lines[0] == "【処理時間の内訳】"
+    assert lines[1].startswith("judge: model-a 2回（うち再利用 1回）")
+    assert "再試行 1回" in lines[1]
+    assert lines[2] == "web_search: 0.50秒"
+    assert lines[3].startswith("合計: LLM呼び出し 2回, 入力 110トークン（キャッシュ 45%）")
+
+
+def test_jsonl_sink_appends_records(tmp_path):
+    path = tmp_path / "telemetry" / "calls.jsonl"
+    sink = JsonlTelemetrySink(str(path))
+    sink.record(_record("judge"))
+    sink.record(_record("keywords", error_kind="timeout"))
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(row["stage"], row["error_kind"]) for row in rows] == [("judge", None), ("keywords", "timeout")]
+
+
+class _BrokenSink(TelemetrySink):
+    def record(self, record):
+        raise OSError("disk full")
+
+
+def test_adapter_turn_collects_calls_and_ignores_sink_errors(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    adapter = OpenaiAdapter(response_cache=ResponseCache(":memory:"), cache_policy="on", telemetry_sink=_BrokenSink())
+
+    def create(**request):
+        choice = SimpleNamespace(message=SimpleNamespace(content="応答"), finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=_usage(cached_tokens=4))
+
+    adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    turn = adapter.start_turn()
+    assert adapter.openai_chat(openai_model="model-a", prompt="保険", stage="judge") == "応答"
+    assert adapter.openai_chat(openai_model="model-a", prompt="保険", stage="judge") == "応答"
+    next_turn = adapter.start_turn()
+    adapter.openai_chat(openai_model="model-a", prompt="年金", stage="answer")
+
+    judge = turn.summary()["stages"]["judge"]
+    assert (judge["calls"], judge["reused"], judge["prompt_tokens"], judge["cached_tokens"]) == (2, 1, 10, 4)
+    # 終了したターンには、以降の呼び出しを集計しない
+    assert turn.finished
+    assert list(turn.summary()["stages"]) == ["judge"]
+    assert list(next_turn.summary()["stages"]) == ["answer"]
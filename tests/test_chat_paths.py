@@ -0,0 +1,159 @@
+import asyncio
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+import src.chat.openai_adapter as openai_adapter
+from src.chat.call_telemetry import CallbackTelemetrySink
+from src.chat.model_routing import ModelRouter, StageRoute
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.rate_governor import RateGovernor
+from src.chat.response_cache import ResponseCache
+from src.chat.retry_policy import ChatError, RetryPolicy
+
+TPM = 100000
+PATHS = ("chat", "achat", "stream", "astream")
+
+
+def _status_error(status_code, headers=None, body=None):
+    error_class = openai.RateLimitError if status_code == 429 else openai.APIStatusError
+    response = SimpleNamespace(status_code=status_code, headers=headers or {}, request=None)
+    return error_class("error", response=response, body=body)
+
+
+def _usage():
+    return SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15, prompt_tokens_details=None)
+
+
+def _response(content):
+    choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")
+    return SimpleNamespace(choices=[choice], usage=_usage())
+
+
+def _chunks(content):
+    choice = SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason="stop")
+    return [SimpleNamespace(choices=[choice], usage=None), SimpleNamespace(choices=[], usage=_usage())]
+
+
+class _AsyncChunks:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    records = []
+    adapter = OpenaiAdapter(
+        response_cache=ResponseCache(":memory:"),
+        cache_policy="on",
+        rate_governor=RateGovernor(tpm=TPM),
+        retry_policy=RetryPolicy(max_attempts=3, base_delay=0, max_delay=0),
+        telemetry_sink=CallbackTelemetrySink(records.append),
+        model_router=ModelRouter({"test": StageRoute("model-a", fallback_models=["model-b"])})
+    )
+    adapter.records = records
+    return adapter
+
+
+def _call(adapter, path, outcomes):
+    """
+    outcomesの順に、例外を送出するか応答のテキストを返す偽のクライアントで、pathの経路を実行する。
+    送信したモデル名のリストと結果を返す
+    """
+    models = []
+
+    def next_outcome(request):
+        models.append(request["model"])
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def create(**request):
+        content = next_outcome(request)
+        return iter(_chunks(content)) if request.get("stream") else _response(content)
+
+    async def acreate(**request):
+        content = next_outcome(request)
+        return _AsyncChunks(_chunks(content)) if request.get("stream") else _response(content)
+
+    adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    adapter._async_state = lambda: (
+        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))),
+        asyncio.Semaphore(2)
+    )
+    if path == "chat":
+        result = adapter.openai_chat(prompt="test", stage="test")
+    elif path == "achat":
+        result = asyncio.run(adapter.aopenai_chat(prompt="test", stage="test"))
+    elif path == "stream":
+        result = adapter.openai_chat_stream(prompt="test", stage="test").read()
+    else:
+        async def read():
+            return await adapter.aopenai_chat_stream(prompt="test", stage="test").read()
+        result = asyncio.run(read())
+    return models, result
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_overload_falls_back_then_caches(adapter, path):
+    models, result = _call(adapter, path, [_status_error(503), "応答"])
+    assert models == ["model-a", "model-b"]
+    assert result == "応答"
+    assert adapter.records[-1].model == "model-b"
+    assert adapter.records[-1].attempts == 2
+    assert adapter.rate_governor.stats()["actual_tokens"] == 15
+
+    # フォールバックのモデルの応答も、最初のモデルのリクエストのキーでキャッシュされる
+    models, result = _call(adapter, path, [])
+    assert models == []
+    assert result == "応答"
+    assert adapter.records[-1].source == "cache"
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_fatal_error_is_not_retried(adapter, path):
+    models, result = _call(adapter, path, [_status_error(401), "応答"])
+    assert models == ["model-a"]
+    assert isinstance(result, ChatError)
+    assert result.kind == "auth"
+    assert adapter.records[-1].error_kind == "auth"
+    # 失敗したリクエストの予約はすべて返却する
+    assert adapter.rate_governor.token_bucket.tokens == pytest.approx(TPM, abs=1)
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_retryable_error_is_retried_on_last_model(adapter, path):
+    models, result = _call(adapter, path, [_status_error(503), _status_error(500), "応答"])
+    assert models == ["model-a", "model-b", "model-b"]
+    assert result == "応答"
+    assert adapter.records[-1].attempts == 3
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_insufficient_quota_is_not_retried_or_routed(adapter, path):
+    error = _status_error(429, body={"code": "insufficient_quota", "message": "quota"})
+    models, result = _call(adapter, path, [error, "応答"])
+    assert models == ["model-a"]
+    assert isinstance(result, ChatError)
+    assert result.kind == "quota"
+    assert not result.retryable
+
+
+def test_retry_waits_for_retry_after_header(adapter, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(openai_adapter.time, "sleep", sleeps.append)
+    adapter.model_router.routes["test"].fallback_models = []
+    models, result = _call(adapter, "chat", [_status_error(429, {"retry-after-ms": "1500"}), "ok"])
+    assert result == "ok"
+    assert models == ["model-a", "model-a"]
+    assert sleeps == [1.5]
@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.chat.call_telemetry import CallbackTelemetrySink
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.rate_governor import RateGovernor
+from src.chat.response_cache import ResponseCache
+
+TPM = 100000
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None)
+
+
+class _SyncStream:
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        for delta in self.deltas:
+            yield _chunk(delta)
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+class _AsyncStream:
+    def __init__(self, deltas, delay):
+        self.deltas = deltas
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for delta in self.deltas:
+            await asyncio.sleep(self.delay)
+            yield _chunk(delta)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    records = []
+    adapter = OpenaiAdapter(
+        rate_governor=RateGovernor(tpm=TPM),
+        response_cache=ResponseCache(":memory:"),
+        telemetry_sink=CallbackTelemetrySink(records.append)
+    )
+    adapter.records = records
+    return adapter
+
+
+def _assert_refunded(adapter):
+    # 見積もったトークン数（1000以上）のうち、送信済みのプロンプトと受信済みの差分の分のみ消費している
+    tokens = adapter.rate_governor.token_bucket.tokens
+    assert TPM - 100 < tokens < TPM
+
+
+def test_closed_stream_refunds_reservation(adapter):
+    streams = []
+
+    def create(**request):
+        streams.append(_SyncStream(["a", "b", "c"]))
+        return streams[-1]
+
+    adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    stream = adapter.openai_chat_stream(prompt="test", stage="answer", cache=False)
+    assert next(stream) == "a"
+    stream.close()
+
+    assert stream.text == "a"
+    assert streams[0].closed
+    _assert_refunded(adapter)
+    assert len(adapter.records) == 1
+    assert adapter.records[0].error_kind == "cancelled"
+    assert adapter.records[0].latency is not None
+
+
+def test_abandoned_stream_refunds_reservation(adapter):
+    def create(**request):
+        return _SyncStream(["a", "b", "c"])
+
+    adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    stream = adapter.openai_chat_stream(prompt="test", stage="answer", cache=False)
+    next(stream)
+    del stream
+
+    _assert_refunded(adapter)
+    assert [record.error_kind for record in adapter.records] == ["cancelled"]
+
+
+def test_cancelled_async_stream_refunds_reservation(adapter):
+    streams = []
+
+    async def acreate(**request):
+        streams.append(_AsyncStream(["a", "b", "c"], delay=0.05))
+        return streams[-1]
+
+    async def consume():
+        stream = adapter.aopenai_chat_stream(prompt="test", stage="answer", cache=False)
+        return await stream.read()
+
+    async def main():
+        adapter._async_state = lambda: (
+            SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))),
+            asyncio.Semaphore(2)
+        )
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.07)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert streams[0].closed
+    _assert_refunded(adapter)
+    assert [record.error_kind for record in adapter.records] == ["cancelled"]
+
+
+def test_error_after_deltas_charges_received_tokens(adapter):
+    streams = []
+
+    def create(**request):
+        streams.append(_SyncStream(["a", "b"], error=ConnectionError("切断")))
+        return streams[-1]
+
+    adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    stream = adapter.openai_chat_stream(prompt="test", stage="answer", cache=False)
+    assert stream.read() == "ab"
+
+    # 受信を始めた後のエラーは再試行せず、予約は受信済みの分まで補正する
+    assert len(streams) == 1
+    assert isinstance(stream.error, ConnectionError)
+    _assert_refunded(adapter)
+    assert adapter.rate_governor.stats()["actual_tokens"] > 0
+    assert [record.error_kind for record in adapter.records] == ["connection"]
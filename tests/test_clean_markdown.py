@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from src.webscraping.web_scraping import WebScraper
+from tests.legacy_clean_markdown import legacy_clean_markdown
+from tests.markdown_samples import LINE_FRAGMENTS, random_markdown
+
+
+@pytest.fixture(scope="module")
+def scraper():
+    return WebScraper()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_legacy_on_generated_markdown(scraper, seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        markdown = random_markdown(rng)
+        assert scraper._clean_markdown(markdown) == legacy_clean_markdown(markdown), repr(markdown)
+
+
+def test_matches_legacy_on_all_fragment_pairs(scraper):
+    for first in LINE_FRAGMENTS:
+        for second in LINE_FRAGMENTS:
+            for separator in ("\n", "\n\n", "\n\n\n"):
+                markdown = first + separator + second
+                assert scraper._clean_markdown(markdown) == legacy_clean_markdown(markdown), repr(markdown)
+
+
+@pytest.mark.parametrize("markdown", [
+    "",
+    "\n\n\n",
+    "#\n## 見出し",
+    "#\n本文",
+    "#\n\n\n#",
+    "本文\n\n\n\n次の段落",
+    "      six spaces     inside",
+])
+def test_matches_legacy_on_edge_cases(scraper, markdown):
+    assert scraper._clean_markdown(markdown) == legacy_clean_markdown(markdown)
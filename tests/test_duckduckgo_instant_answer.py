@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("duckduckgo_search")
+
+from src.websearch import duckduckgo_instant_answer
+from src.websearch.duckduckgo_instant_answer import DuckDuckGoInstantAnswer
+
+RESULTS = [{"title": "保険", "href": "https://example.com", "body": "説明"}]
+
+
+class _FakeDDGS:
+    def text(self, keywords, region, safesearch, timelimit, max_results):
+        return iter(RESULTS[:max_results])
+
+
+class _FakeAsyncDDGS:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        return False
+
+    async def atext(self, keywords, region, safesearch, timelimit, max_results):
+        return [{**RESULTS[0], "title": "非同期"}]
+
+
+class _AsyncDDGSWithoutMethods:
+    """atextなどの非同期メソッドを持たないバージョンのAsyncDDGS"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+def test_asearch_falls_back_to_thread_without_async_ddgs(monkeypatch):
+    monkeypatch.setattr(duckduckgo_instant_answer, "DDGS", _FakeDDGS)
+    monkeypatch.setattr(duckduckgo_instant_answer, "AsyncDDGS", None)
+    assert asyncio.run(DuckDuckGoInstantAnswer().asearch("保険")) == RESULTS
+
+
+def test_asearch_falls_back_to_thread_without_async_method(monkeypatch):
+    monkeypatch.setattr(duckduckgo_instant_answer, "DDGS", _FakeDDGS)
+    monkeypatch.setattr(duckduckgo_instant_answer, "AsyncDDGS", _AsyncDDGSWithoutMethods)
+    assert asyncio.run(DuckDuckGoInstantAnswer().asearch("保険")) == RESULTS
+
+
+def test_asearch_uses_async_ddgs_when_available(monkeypatch):
+    monkeypatch.setattr(duckduckgo_instant_answer, "AsyncDDGS", _FakeAsyncDDGS)
+    assert asyncio.run(DuckDuckGoInstantAnswer().asearch("保険"))[0]["title"] == "非同期"
+
+
+def test_asearch_rejects_unknown_search_type(monkeypatch):
+    monkeypatch.setattr(duckduckgo_instant_answer, "AsyncDDGS", None)
+    with pytest.raises(ValueError):
+        asyncio.run(DuckDuckGoInstantAnswer().asearch("保険", search_type="maps"))
+
+
+class _BlockingDDGS:
+    instances = []
+
+    def __init__(self):
+        self.closed = False
+        _BlockingDDGS.instances.append(self)
+
+    def text(self, keywords, region, safesearch, timelimit, max_results):
+        # 2つのスレッドの検索が同時に実行されている場合のみ通過できる
+        _BlockingDDGS.barrier.wait(timeout=1)
+        return RESULTS
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.closed = True
+
+
+def test_searches_from_threads_run_in_parallel(monkeypatch):
+    monkeypatch.setattr(duckduckgo_instant_answer, "DDGS", _BlockingDDGS)
+    _BlockingDDGS.instances = []
+    _BlockingDDGS.barrier = threading.Barrier(2)
+    ddg = DuckDuckGoInstantAnswer()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda query: ddg.search(query), ["a", "b"]))
+    assert results == [RESULTS, RESULTS]
+    assert len(_BlockingDDGS.instances) == 2
+
+    ddg.close()
+    assert all(client.closed for client in _BlockingDDGS.instances)
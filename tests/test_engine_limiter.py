@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.websearch.engine_limiter import EngineLimiter, QuotaExceededError
+from src.websearch.web_search import WebSearch
+
+
+def test_daily_quota_counts_cost_and_raises():
+    limiter = EngineLimiter(daily_quota=3)
+    with limiter.slot(cost=2):
+        assert limiter.stats()["in_flight"] == 1
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire(cost=2)
+    assert limiter.stats() == {"used_today": 2, "daily_quota": 3, "remaining_today": 1, "in_flight": 0}
+
+
+def test_qps_allows_burst_then_waits():
+    limiter = EngineLimiter(qps=20)
+    start = time.monotonic()
+    for _ in range(20):
+        with limiter.slot():
+            pass
+    assert time.monotonic() - start < 0.05
+    with limiter.slot(cost=2):
+        pass
+    # 2クエリ分のトークンが貯まるまで（0.1秒）待機する
+    assert time.monotonic() - start >= 0.08
+
+
+def test_max_concurrency_is_shared_between_threads_and_asyncio():
+    limiter = EngineLimiter(max_concurrency=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def enter():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+
+    def leave():
+        with lock:
+            active.pop()
+
+    def thread_worker():
+        with limiter.slot():
+            enter()
+            time.sleep(0.02)
+            leave()
+
+    async def async_worker():
+        async with limiter.aslot():
+            enter()
+            await asyncio.sleep(0.02)
+            leave()
+
+    async def run_async():
+        await asyncio.gather(*[async_worker() for _ in range(4)])
+
+    threads = [threading.Thread(target=thread_worker) for _ in range(4)]
+    threads.append(threading.Thread(target=asyncio.run, args=(run_async(),)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.stats()["used_today"] == 8
+
+
+def test_cancelled_wait_refunds_quota_and_slot():
+    limiter = EngineLimiter(max_concurrency=1, daily_quota=5)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.create_task(limiter.aacquire(cost=2))
+        await asyncio.sleep(0.01)
+        assert limiter.stats()["used_today"] == 3
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        # 取り消した待機者が枠を保持していないため、すぐに取得できる
+        await asyncio.wait_for(limiter.aacquire(), timeout=1)
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter.stats()["used_today"] == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_cancelled_token_wait_refunds_quota():
+    limiter = EngineLimiter(qps=1, daily_quota=5)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter.stats()["used_today"] == 1
+
+
+def test_web_search_does_not_limit_by_default():
+    web_search = WebSearch()
+    web_search.register_engine("google", lambda query, max_results=4, **options: [])
+    for _ in range(5):
+        web_search.search("保険", engine="google")
+    assert web_search.quota_stats()["google"]["used_today"] == 5
+    assert web_search.quota_stats()["google"]["daily_quota"] is None
+
+
+def test_web_search_applies_given_limits():
+    web_search = WebSearch(engine_limits={"fake": {"daily_quota": 1}})
+    web_search.register_engine("fake", lambda query, max_results=4, **options: [])
+    web_search.search("保険", engine="fake")
+    with pytest.raises(QuotaExceededError):
+        web_search.search("保険", engine="fake")
+
+
+def test_daily_quota_resets_on_new_day(monkeypatch):
+    from datetime import date
+    from src.websearch import engine_limiter
+
+    today = [date(2024, 4, 1)]
+    monkeypatch.setattr(engine_limiter, "date", type("FakeDate", (), {"today": staticmethod(lambda: today[0])}))
+    limiter = EngineLimiter(daily_quota=1)
+    limiter.acquire()
+    limiter.release()
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire()
+    today[0] = date(2024, 4, 2)
+    with limiter.slot():
+        pass
+    assert limiter.stats()["used_today"] == 1
+
+
+def test_cost_above_bucket_capacity_waits_for_full_bucket():
+    limiter = EngineLimiter(qps=10)
+    with limiter.slot(cost=10):
+        pass
+    start = time.monotonic()
+    # 容量（10）を超えるコストでも、バケットが満杯になった時点で送信する
+    with limiter.slot(cost=25):
+        pass
+    assert 0.8 <= time.monotonic() - start < 1.5
+
+
+def test_web_search_counts_google_queries_per_ten_results():
+    web_search = WebSearch(engine_limits={"google": {"daily_quota": 3}})
+    web_search.register_engine("google", lambda query, max_results=4, **options: [])
+    web_search.search("保険", engine="google", max_results=25)
+    assert web_search.quota_stats()["google"]["used_today"] == 3
+    with pytest.raises(QuotaExceededError):
+        web_search.search("保険", engine="google", max_results=4)
+
+
+def test_search_many_respects_max_concurrency():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def search(query, max_results=4, **options):
+        with lock:
+            active.append(query)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(query)
+        return []
+
+    web_search = WebSearch(engine_limits={"fake": {"max_concurrency": 2}})
+    web_search.register_engine("fake", search)
+    web_search.search_many([f"保険{i}" for i in range(6)], engine="fake", max_workers=6, pipelined=False)
+    assert max(peak) == 2
@@ -0,0 +1,108 @@
+import sys
+from importlib import metadata
+
+import pytest
+
+from src.websearch import engine_registry
+from src.websearch.engine_registry import EngineRegistry
+
+ENGINE_MODULE = '''
+CREATED = []
+
+class FakeEngine:
+    def __init__(self):
+        CREATED.append(self)
+
+    def search(self, query, max_results=4, **options):
+        return [{"title": query, "link": "https://example.com", "snippet": "", "source": "fake"}]
+'''
+
+
+@pytest.fixture
+def engine_module(tmp_path, monkeypatch):
+    """初回使用時までimportされないことを確認するため、テストごとに新しいモジュールを用意する"""
+    (tmp_path / "fake_engine_plugin.py").write_text(ENGINE_MODULE, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "fake_engine_plugin", raising=False)
+    yield "fake_engine_plugin"
+    sys.modules.pop("fake_engine_plugin", None)
+
+
+def test_builtin_engines_are_not_imported_until_used():
+    registry = EngineRegistry(load_entry_points=False)
+    assert set(EngineRegistry.BUILTIN_ENGINES) <= set(registry.names())
+    assert registry.loaded() == {}
+
+
+def test_string_target_is_imported_and_created_once(engine_module):
+    registry = EngineRegistry(load_entry_points=False)
+    registry.register("plugin", f"{engine_module}:FakeEngine")
+    assert engine_module not in sys.modules
+
+    first = registry.get("plugin")
+    second = registry.get("plugin")
+    module = sys.modules[engine_module]
+    assert first is second
+    assert module.CREATED == [first["instance"]]
+    assert first["search_func"]("保険")[0]["title"] == "保険"
+    assert list(registry.loaded()) == ["plugin"]
+
+
+def test_register_discards_loaded_engine(engine_module):
+    registry = EngineRegistry(load_entry_points=False)
+    registry.register("plugin", f"{engine_module}:FakeEngine")
+    first = registry.get("plugin")
+    registry.register("plugin", f"{engine_module}:FakeEngine")
+    assert registry.loaded() == {}
+    assert registry.get("plugin")["instance"] is not first["instance"]
+
+
+def test_failed_creation_is_retried():
+    attempts = []
+
+    class FlakyEngine:
+        def __init__(self):
+            attempts.append(self)
+            if len(attempts) == 1:
+                raise ValueError("APIキーが設定されていません。")
+
+        def search(self, query, max_results=4, **options):
+            return []
+
+    registry = EngineRegistry(load_entry_points=False)
+    registry.register("flaky", FlakyEngine)
+    with pytest.raises(RuntimeError, match="flaky"):
+        registry.get("flaky")
+    assert registry.loaded() == {}
+    assert registry.get("flaky")["instance"] is attempts[1]
+
+
+def test_unknown_engine_raises_value_error():
+    with pytest.raises(ValueError):
+        EngineRegistry(load_entry_points=False).get("missing")
+
+
+def test_async_only_engine_gets_sync_search():
+    async def asearch(query, max_results=4, **options):
+        return [{"title": query}]
+
+    engine_data = EngineRegistry(load_entry_points=False)._create(asearch)
+    assert engine_data["asearch_func"] is asearch
+    assert engine_data["search_func"]("保険") == [{"title": "保険"}]
+
+
+def test_entry_points_are_registered_lazily(engine_module, monkeypatch):
+    group = EngineRegistry.ENTRY_POINT_GROUP
+    entry_points = [
+        metadata.EntryPoint("plugin", f"{engine_module}:FakeEngine", group),
+        metadata.EntryPoint("google", f"{engine_module}:FakeEngine", group),
+    ]
+    monkeypatch.setattr(engine_registry.metadata, "entry_points",
+                        lambda group: [ep for ep in entry_points if ep.group == group])
+
+    registry = EngineRegistry()
+    assert "plugin" in registry
+    assert engine_module not in sys.modules
+    # 組み込みのエンジンと同名のエントリーポイントは無視する
+    assert registry._targets["google"] == EngineRegistry.BUILTIN_ENGINES["google"]
+    assert registry.get("plugin")["search_func"]("保険")[0]["source"] == "fake"
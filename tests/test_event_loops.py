@@ -0,0 +1,148 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import src.chat.openai_adapter as openai_adapter
+from src.chat.event_loops import BackgroundLoop, LoopSafeSemaphore
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.response_cache import ResponseCache
+from tests.test_research_orchestrator import _FakeAsyncOpenAI
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(openai_adapter, "AsyncOpenAI", _FakeAsyncOpenAI)
+    _FakeAsyncOpenAI.instances = []
+    return OpenaiAdapter(response_cache=ResponseCache(":memory:"), max_concurrency=2)
+
+
+def test_chat_many_reuses_one_client_and_closes_it(adapter):
+    loops = set()
+    for i in range(3):
+        results = adapter.openai_chat_many([{"prompt": f"test {i}", "stage": "summarize", "cache": False}] * 2)
+        assert all(results)
+        loops.update(client.loop for client in _FakeAsyncOpenAI.instances)
+    assert len(_FakeAsyncOpenAI.instances) == 1
+    assert len(loops) == 1
+    assert not _FakeAsyncOpenAI.instances[0].closed
+
+    adapter.close()
+    assert _FakeAsyncOpenAI.instances[0].closed
+
+
+def test_adapter_context_manager_closes_client(adapter):
+    with adapter:
+        adapter.openai_chat_many([{"prompt": "test", "stage": "summarize", "cache": False}])
+    assert [client.closed for client in _FakeAsyncOpenAI.instances] == [True]
+
+
+def test_semaphore_limits_across_loops():
+    semaphore = LoopSafeSemaphore(2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    async def work():
+        async with semaphore:
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            await asyncio.sleep(0.02)
+            with lock:
+                active.pop()
+
+    async def run_many():
+        await asyncio.gather(*[work() for _ in range(4)])
+
+    threads = [threading.Thread(target=asyncio.run, args=(run_many(),)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+    assert semaphore.in_use == 0
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    semaphore = LoopSafeSemaphore(1)
+
+    async def main():
+        await semaphore.acquire()
+        waiter = asyncio.create_task(semaphore.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        semaphore.release()
+        await asyncio.wait_for(semaphore.acquire(), timeout=1)
+        semaphore.release()
+
+    asyncio.run(main())
+    assert semaphore.in_use == 0
+
+
+def test_background_loop_runs_on_one_thread_until_closed():
+    background = BackgroundLoop("test")
+    first = background.run(_current_thread())
+    second = background.run(_current_thread())
+    assert first == second == "test"
+    closed = []
+
+    async def shutdown():
+        closed.append(True)
+
+    background.close(shutdown)
+    assert closed == [True]
+    # 終了後に実行した場合は、新しいイベントループで開始する
+    assert background.run(_current_thread()) == "test"
+    background.close()
+
+
+async def _current_thread():
+    return threading.current_thread().name
+
+
+class _CountingAsyncOpenAI(_FakeAsyncOpenAI):
+    """同時に実行中のリクエスト数を、すべてのクライアント（イベントループ）で合計して記録する"""
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    async def create(self, **request):
+        cls = _CountingAsyncOpenAI
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+        # プロンプトをそのまま返し、結果の順序を確認できるようにする
+        message = SimpleNamespace(content=request["messages"][-1]["content"])
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+
+def test_gather_chat_keeps_order_and_shares_limit_across_loops(adapter, monkeypatch):
+    monkeypatch.setattr(openai_adapter, "AsyncOpenAI", _CountingAsyncOpenAI)
+    _CountingAsyncOpenAI.active = _CountingAsyncOpenAI.peak = 0
+    calls = [{"prompt": f"prompt {i}", "stage": "summarize", "cache": False} for i in range(6)]
+    results = {}
+
+    def run_on_own_loop():
+        results["thread"] = asyncio.run(adapter.agather_chat(calls))
+
+    thread = threading.Thread(target=run_on_own_loop)
+    thread.start()
+    results["background"] = adapter.openai_chat_many(calls)
+    thread.join()
+    adapter.close()
+
+    expected = [call["prompt"] for call in calls]
+    assert results["thread"] == results["background"] == expected
+    # max_concurrency=2 はイベントループをまたいで適用される
+    assert _CountingAsyncOpenAI.peak == 2
@@ -0,0 +1,55 @@
+import requests
+
+from src.webscraping.web_scraping import WebScraper
+
+
+class _FakeResponse:
+    def __init__(self, status_code=200, body=b"<html><body>ok</body></html>"):
+        self.status_code = status_code
+        self.headers = {"content-type": "text/html; charset=utf-8"}
+        self.encoding = "utf-8"
+        self.content = body
+        self.closed = False
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.returned = []
+
+    def get(self, url, **kwargs):
+        response = self.responses.pop(0)
+        self.returned.append(response)
+        return response
+
+
+def _scraper(responses):
+    scraper = WebScraper()
+    scraper.session = _FakeSession(responses)
+    scraper.retry_delay = 0
+    scraper.rate_limiter.wait_if_needed = lambda url: None
+    return scraper
+
+
+def test_response_closed_on_success():
+    scraper = _scraper([_FakeResponse()])
+    assert scraper.fetch_html("https://example.com") == "<html><body>ok</body></html>"
+    assert all(response.closed for response in scraper.session.returned)
+
+
+def test_response_closed_on_http_error():
+    scraper = _scraper([_FakeResponse(status_code=503) for _ in range(3)])
+    assert scraper.fetch_html("https://example.com") is None
+    assert len(scraper.session.returned) == scraper.max_retries
+    assert all(response.closed for response in scraper.session.returned)
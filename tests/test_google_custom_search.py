@@ -0,0 +1,44 @@
+import logging
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("googleapiclient")
+
+from src.websearch import google_custom_search
+from src.websearch.web_search import WebSearch
+
+
+def _page(start, num):
+    return {"items": [{"title": f"結果{i}", "link": f"https://example.com/{i}", "snippet": ""} for i in range(start, start + num)]}
+
+
+def _fake_fetch(failing_start):
+    def fetch(keyword, custom_search_engine_id, start, num):
+        if start == failing_start:
+            raise RuntimeError("HTTP 429")
+        return _page(start, num)
+    return fetch
+
+
+def test_first_page_failure_propagates(monkeypatch):
+    monkeypatch.setattr(google_custom_search, "_fetch_page", _fake_fetch(1))
+    with pytest.raises(RuntimeError):
+        google_custom_search.get_search_response("保険", max_results=10)
+
+
+def test_later_page_failure_keeps_earlier_pages(monkeypatch, caplog):
+    monkeypatch.setattr(google_custom_search, "_fetch_page", _fake_fetch(21))
+    with caplog.at_level(logging.WARNING, logger=google_custom_search.__name__):
+        responses = google_custom_search.get_search_response("保険", max_results=30)
+    assert [item["link"] for item in responses[0]["items"]] == [f"https://example.com/{i}" for i in range(1, 21)]
+    assert "3ページ目" in caplog.text
+
+
+def test_web_search_records_engine_error(monkeypatch):
+    monkeypatch.setattr(google_custom_search, "_fetch_page", _fake_fetch(1))
+    web_search = WebSearch()
+    web_search.register_engine("google", google_custom_search.GoogleCustomSearch)
+    with pytest.raises(Exception):
+        web_search.search("保険", engine="google")
+    assert web_search.latency_stats()["google"]["error_rate"] == 1.0
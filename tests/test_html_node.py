@@ -0,0 +1,50 @@
+import copy
+import json
+import pickle
+
+from src.webscraping.html_node import HtmlNode
+
+
+def _sample_tree():
+    return HtmlNode("div", {"class": "content"}, [
+        HtmlNode("h1", None, ["タイトル"]),
+        HtmlNode("p", {"id": "intro"}, ["本文", HtmlNode("a", {"href": "https://example.com"}, ["リンク"])]),
+        "末尾のテキスト",
+    ])
+
+
+def test_deepcopy_round_trip():
+    node = _sample_tree()
+    copied = copy.deepcopy(node)
+    assert isinstance(copied, HtmlNode)
+    assert copied == node
+    assert copied.to_dict() == node.to_dict()
+    assert isinstance(copied.children[0], HtmlNode)
+    assert copied.children is not node.children
+
+
+def test_pickle_round_trip():
+    node = _sample_tree()
+    restored = pickle.loads(pickle.dumps(node))
+    assert isinstance(restored, HtmlNode)
+    assert restored.to_dict() == node.to_dict()
+    assert restored.tag is node.tag
+
+
+def test_dict_compatible_access():
+    node = _sample_tree()
+    assert "tag" in node
+    assert "children" in node
+    assert "missing" not in node
+    assert node.get("tag") == "div"
+    assert node.get("missing", "default") == "default"
+    assert node["attributes"] == {"class": "content"}
+    assert node.children[0]["attributes"] == {}
+    assert list(node.keys()) == ["tag", "attributes", "children"]
+    assert dict(node.as_dict())["tag"] == "div"
+
+
+def test_json_serialization():
+    node = _sample_tree()
+    assert json.loads(json.dumps(node))[0] == "div"
+    assert json.loads(json.dumps(node.to_dict()))["children"][0]["tag"] == "h1"
@@ -0,0 +1,144 @@
+import asyncio
+import configparser
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.chat.batch_job import parse_batch_output
+from src.chat.model_routing import DEFAULT_ROUTES, ModelRouter
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.output_specs import WEB_RESEARCH_JUDGE
+from src.chat.response_cache import ResponseCache
+from src.chat.retry_policy import ChatError
+
+
+def _response(content, finish_reason="stop"):
+    usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, prompt_tokens_details=None)
+    choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice], usage=usage)
+
+
+def _chunk(content, finish_reason=None):
+    choice = SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice], usage=None)
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return OpenaiAdapter(response_cache=ResponseCache(":memory:"))
+
+
+def _set_client(adapter, create):
+    adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_default_routes_have_no_output_cap():
+    assert all(route.max_tokens is None for route in DEFAULT_ROUTES.values())
+
+
+def test_config_sets_max_tokens():
+    config = configparser.ConfigParser()
+    config.read_string("[ROUTE.judge]\nmax_tokens = 800\n")
+    route = ModelRouter.from_config(config).route("judge")
+    assert route.max_tokens == 800
+    assert route.model == DEFAULT_ROUTES["judge"].model
+
+
+def test_truncated_response_is_length_error_and_not_cached(adapter):
+    requests = []
+
+    def create(**request):
+        requests.append(request)
+        return _response('{"reasoning": "長い理由', finish_reason="length")
+
+    _set_client(adapter, create)
+    result = adapter.openai_chat(prompt="test", stage="judge", max_tokens=5)
+    assert isinstance(result, ChatError)
+    assert result.kind == "length"
+    assert requests[0]["max_completion_tokens"] == 5
+
+    # キャッシュされていないため、再度APIを呼び出す
+    adapter.openai_chat(prompt="test", stage="judge", max_tokens=5)
+    assert len(requests) == 2
+
+
+def test_structured_call_reports_truncation(adapter):
+    _set_client(adapter, lambda **request: _response('{"reasoning": "途中', finish_reason="length"))
+    result = adapter.openai_chat_structured(spec=WEB_RESEARCH_JUDGE, stage="judge", prompt="test")
+    assert isinstance(result, ChatError)
+    assert result.kind == "length"
+
+
+def test_async_truncated_response_is_length_error(adapter):
+    async def acreate(**request):
+        return _response("途中", finish_reason="length")
+
+    async def main():
+        adapter._async_state = lambda: (
+            SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))),
+            asyncio.Semaphore(2)
+        )
+        return await adapter.aopenai_chat(prompt="test", stage="summarize")
+
+    result = asyncio.run(main())
+    assert isinstance(result, ChatError)
+    assert result.kind == "length"
+
+
+def test_truncated_stream_records_length(adapter):
+    records = []
+    adapter.telemetry_sink.record = records.append
+    _set_client(adapter, lambda **request: iter([_chunk("a"), _chunk("b", finish_reason="length")]))
+    stream = adapter.openai_chat_stream(prompt="test", stage="answer")
+    result = stream.read()
+    assert isinstance(result, ChatError)
+    assert result.kind == "length"
+    assert not result
+    assert stream.finish_reason == "length"
+    assert stream.error.kind == "length"
+    assert stream.partial_text == "ab"
+    assert records[0].error_kind == "length"
+
+
+def test_completed_stream_reports_stop(adapter):
+    _set_client(adapter, lambda **request: iter([_chunk("a"), _chunk("b", finish_reason="stop")]))
+    stream = adapter.openai_chat_stream(prompt="test", stage="answer")
+    assert stream.read() == "ab"
+    assert stream.finish_reason == "stop"
+    assert stream.error is None
+
+
+def test_async_truncated_stream_is_length_error(adapter):
+    async def acreate(**request):
+        async def chunks():
+            yield _chunk("a")
+            yield _chunk("b", finish_reason="length")
+        return chunks()
+
+    async def main():
+        adapter._async_state = lambda: (
+            SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=acreate))),
+            asyncio.Semaphore(2)
+        )
+        stream = adapter.aopenai_chat_stream(prompt="test", stage="answer")
+        return stream, await stream.read()
+
+    stream, result = asyncio.run(main())
+    assert isinstance(result, ChatError)
+    assert result.kind == "length"
+    assert stream.partial_text == "ab"
+
+
+def test_truncated_batch_result_is_length_error():
+    line = {
+        "custom_id": "request-0",
+        "response": {
+            "status_code": 200,
+            "body": {"choices": [{"message": {"content": "途中"}, "finish_reason": "length"}]}
+        }
+    }
+    result = parse_batch_output(json.dumps(line))["request-0"]
+    assert isinstance(result, ChatError)
+    assert result.kind == "length"
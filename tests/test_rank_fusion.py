@@ -0,0 +1,61 @@
+import pytest
+
+from src.websearch.rank_fusion import canonicalize_url, reciprocal_rank_fusion
+
+
+def _result(link, title="", source="fake"):
+    return {"title": title, "link": link, "snippet": "", "source": source}
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/plan",
+    "http://www.example.com/plan/",
+    "https://EXAMPLE.com:443/plan#section",
+    "https://example.com/plan?utm_source=news&gclid=abc",
+    " https://example.com/plan?fbclid=x&ref=top ",
+])
+def test_canonicalize_url_ignores_presentation_differences(url):
+    assert canonicalize_url(url) == "example.com/plan"
+
+
+def test_canonicalize_url_keeps_meaningful_differences():
+    assert canonicalize_url("https://example.com:8080/plan") == "example.com:8080/plan"
+    assert canonicalize_url("https://example.com/plan?b=2&a=1") == canonicalize_url("https://example.com/plan?a=1&b=2")
+    assert canonicalize_url("https://example.com/plan?id=1") != canonicalize_url("https://example.com/plan?id=2")
+    assert canonicalize_url("https://example.com/plan") != canonicalize_url("https://example.com/plans")
+
+
+def test_results_returned_by_several_engines_rank_first():
+    fused = reciprocal_rank_fusion({
+        "google": [_result("https://a.example/"), _result("https://b.example/"), _result("https://c.example/")],
+        "bing": [_result("https://c.example/"), _result("https://d.example/")],
+    }, k=60)
+    # c: 1/63 + 1/61 > a: 1/61 > b = d: 1/62（同点は最初に出現した順）
+    assert [result["link"] for result in fused] == [
+        "https://c.example/", "https://a.example/", "https://b.example/", "https://d.example/"
+    ]
+    assert fused[0]["sources"] == ["google", "bing"]
+    assert fused[1]["sources"] == ["google"]
+
+
+def test_duplicates_keep_the_best_ranked_entry():
+    fused = reciprocal_rank_fusion({
+        "google": [_result("https://x.example/"), _result("https://www.example.com/plan/", "下位", "google")],
+        "bing": [_result("https://example.com/plan?utm_medium=ad", "上位", "bing")],
+    })
+    plan = next(result for result in fused if result["title"] in ("上位", "下位"))
+    assert len(fused) == 2
+    assert plan["title"] == "上位"
+    assert plan["source"] == "bing"
+    assert plan["sources"] == ["google", "bing"]
+
+
+def test_results_without_link_are_skipped():
+    fused = reciprocal_rank_fusion({"google": [_result(""), _result("https://a.example/")]})
+    assert [result["link"] for result in fused] == ["https://a.example/"]
+
+
+def test_inputs_are_not_mutated():
+    results = [_result("https://a.example/")]
+    reciprocal_rank_fusion({"google": results, "bing": list(results)})
+    assert "sources" not in results[0]
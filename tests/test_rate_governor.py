@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.chat.rate_governor import MESSAGE_OVERHEAD_TOKENS, RateGovernor, TokenBucket
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(per_minute=60)
+    bucket._updated = 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=1.0) == 0.0
+    # 実際の使用量が見積もりを超えた場合は負の値になり、その分だけ待ち時間が延びる
+    bucket.adjust(-10)
+    assert bucket.wait_time(1, now=1.0) == pytest.approx(10.0)
+
+
+def test_disabled_governor_does_not_wait_or_count():
+    governor = RateGovernor()
+    assert not governor.enabled
+    governor.acquire(10 ** 9)
+    governor.reconcile(10, 5)
+    assert governor.stats()["admitted"] == 0
+
+
+def test_estimate_tokens_adds_completion_budget():
+    governor = RateGovernor(tpm=1000, default_completion_tokens=100)
+    messages = [{"role": "system", "content": "あなたは保険の営業です。"}, {"role": "user", "content": None}]
+    prompt_tokens = governor.count_prompt_tokens("gpt-4o", messages)
+    assert prompt_tokens > 2 * MESSAGE_OVERHEAD_TOKENS
+    assert governor.estimate_tokens("gpt-4o", messages) == prompt_tokens + 100
+    assert governor.estimate_tokens("gpt-4o", messages, max_tokens=10) == prompt_tokens + 10
+    assert governor.count_text_tokens("unknown-model", "hello") > 0
+
+
+def test_waits_until_tokens_recover():
+    governor = RateGovernor(tpm=6000)
+    governor.token_bucket.tokens = 0
+    start = time.monotonic()
+    governor.acquire(20)
+    # 1秒あたり100トークン回復するため、20トークンは0.2秒後に取得できる
+    assert 0.15 <= time.monotonic() - start < 1
+    assert governor.stats()["waited"] == 1
+
+
+def test_request_larger_than_bucket_is_admitted_when_full():
+    governor = RateGovernor(tpm=60)
+    governor.acquire(10 ** 6)
+    assert governor.token_bucket.tokens < 0
+    assert governor.stats()["estimated_tokens"] == 10 ** 6
+
+
+def test_queue_is_fifo_and_reconcile_wakes_waiters():
+    governor = RateGovernor(tpm=600)
+    governor.token_bucket.tokens = 0
+    admitted = []
+
+    def request(name, tokens):
+        governor.acquire(tokens)
+        admitted.append(name)
+
+    large = threading.Thread(target=request, args=("large", 300))
+    large.start()
+    while governor.stats()["queued"] < 1:
+        time.sleep(0.001)
+    small = threading.Thread(target=request, args=("small", 1))
+    small.start()
+    while governor.stats()["queued"] < 2:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    # 小さいリクエストも、先に待っている大きいリクエストを追い越さない
+    assert admitted == []
+
+    # 先に完了したリクエストの見積もりとの差分が返却されると、待機中のリクエストがすぐに送信される
+    start = time.monotonic()
+    governor.reconcile(estimated_tokens=400, actual_tokens=0)
+    large.join(timeout=2)
+    small.join(timeout=2)
+    assert admitted == ["large", "small"]
+    assert time.monotonic() - start < 0.5
+    stats = governor.stats()
+    assert (stats["admitted"], stats["max_queue"], stats["queued"]) == (2, 2, 0)
+
+
+def test_reconcile_charges_over_usage():
+    governor = RateGovernor(tpm=6000)
+    governor.acquire(100)
+    governor.reconcile(estimated_tokens=100, actual_tokens=7000)
+    assert governor.token_bucket.tokens < 0
+    stats = governor.stats()
+    assert (stats["estimated_tokens"], stats["actual_tokens"]) == (100, 7000)
+
+
+def test_rpm_limits_requests():
+    governor = RateGovernor(rpm=600)
+    governor.request_bucket.tokens = 1
+    start = time.monotonic()
+    governor.acquire(1)
+    governor.acquire(1)
+    assert 0.05 <= time.monotonic() - start < 1
+
+
+def test_cancelled_async_waiter_leaves_queue():
+    governor = RateGovernor(tpm=60, poll_interval=0.01)
+    governor.token_bucket.tokens = 0
+
+    async def main():
+        waiter = asyncio.create_task(governor.aacquire(30))
+        await asyncio.sleep(0.05)
+        assert governor.stats()["queued"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        governor.reconcile(estimated_tokens=5, actual_tokens=0)
+        # 取り消したリクエストに順番を塞がれない
+        await asyncio.wait_for(governor.aacquire(5), timeout=1)
+
+    asyncio.run(main())
+    stats = governor.stats()
+    assert (stats["queued"], stats["admitted"]) == (0, 1)
+
+
+def test_async_waiters_are_admitted_in_order():
+    governor = RateGovernor(tpm=6000, poll_interval=0.005)
+    governor.token_bucket.tokens = 0
+    admitted = []
+
+    async def request(name, tokens):
+        await governor.aacquire(tokens)
+        admitted.append(name)
+
+    async def main():
+        first = asyncio.create_task(request("first", 10))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(request("second", 1))
+        await asyncio.gather(first, second)
+
+    asyncio.run(main())
+    assert admitted == ["first", "second"]
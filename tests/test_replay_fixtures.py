@@ -0,0 +1,41 @@
+from src.replay.fixture_store import FixtureStore
+from src.webscraping.web_scraping import WebScraper
+from src.websearch.replay_search import ReplaySearchEngine
+from src.websearch.web_search import WebSearch
+from tests.test_fetch_html import _FakeResponse, _FakeSession
+
+HTML = b"<html><body><h1>Title</h1><p>Body text</p></body></html>"
+
+
+def test_scraped_html_is_recorded_and_replayed(tmp_path):
+    store = FixtureStore(str(tmp_path / "custom_fixture_dir"))
+    recorder = WebScraper(fixture_recorder=store)
+    recorder.session = _FakeSession([_FakeResponse(body=HTML)])
+    recorder.rate_limiter.wait_if_needed = lambda url: None
+    recorded = recorder.scrape_url("https://example.com/page")
+
+    replayer = WebScraper(replay_store=store)
+    replayer.session = _FakeSession([])
+    replayed = replayer.scrape_url("https://example.com/page")
+
+    assert replayed["raw_html"] == recorded["raw_html"]
+    assert replayed["markdown_data"] == recorded["markdown_data"]
+    assert replayer.session.returned == []
+
+
+def test_missing_scrape_fixture_is_treated_as_failed_fetch(tmp_path):
+    replayer = WebScraper(replay_store=FixtureStore(str(tmp_path)))
+    assert replayer.fetch_html("https://example.com/missing") is None
+
+
+def test_replay_engine_uses_the_recording_store(tmp_path):
+    store = FixtureStore(str(tmp_path / "custom_fixture_dir"))
+    results = [{"title": "t", "link": "https://example.com", "snippet": "s"}]
+
+    recorder = WebSearch(fixture_recorder=store)
+    recorder.register_engine("fake", lambda query, max_results=4, **kwargs: results)
+    recorder.search("保険", engine="fake", max_results=3)
+
+    replayer = WebSearch()
+    replayer.register_engine("replay", ReplaySearchEngine(store))
+    assert [result["link"] for result in replayer.search("保険", engine="replay", max_results=3)] == ["https://example.com"]
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import src.chat.openai_adapter as openai_adapter
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.research_orchestrator import ResearchOrchestrator
+from src.chat.response_cache import ResponseCache
+
+JUDGE_MESSAGES = [{"role": "system", "content": "JUDGE"}]
+KEYWORDS_MESSAGES = [{"role": "system", "content": "KEYWORDS"}]
+
+
+class _FakeAsyncOpenAI:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.loop = None
+        self.closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.decision = 1
+        self.judge_delay = 0.01
+        self.keywords_delay = 0.01
+        _FakeAsyncOpenAI.instances.append(self)
+
+    async def create(self, **request):
+        self.loop = asyncio.get_running_loop()
+        if "JUDGE" in json.dumps(request["messages"]):
+            await asyncio.sleep(self.judge_delay)
+            content = json.dumps({"reasoning": "理由", "decision": self.decision})
+        else:
+            await asyncio.sleep(self.keywords_delay)
+            content = json.dumps({"keywords": ["a", "b"]})
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeWebSearch:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.started = []
+        self.cancelled = []
+        self.background_done = []
+
+    async def asearch_and_standardize(self, query, **kwargs):
+        self.started.append(query)
+        # 検索のキャッシュのバックグラウンドでの更新を模擬する
+        asyncio.get_running_loop().create_task(self._refresh(query))
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(query)
+            raise
+        return {"search_results": [query], "scraped_data": None, "snippets_only": True}
+
+    async def _refresh(self, query):
+        await asyncio.sleep(0.05)
+        self.background_done.append(query)
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(openai_adapter, "AsyncOpenAI", _FakeAsyncOpenAI)
+    _FakeAsyncOpenAI.instances = []
+    return OpenaiAdapter(response_cache=ResponseCache(":memory:"))
+
+
+def test_plan_reuses_one_loop_and_client(adapter):
+    web_search = _FakeWebSearch()
+    with ResearchOrchestrator(adapter, web_search) as research:
+        first = research.plan(JUDGE_MESSAGES, KEYWORDS_MESSAGES)
+        second = research.plan(JUDGE_MESSAGES + [{"role": "user", "content": "2"}], KEYWORDS_MESSAGES)
+    assert first.needs_research and second.needs_research
+    assert [keyword for keyword, _ in first.results()] == ["a", "b"]
+    assert len(_FakeAsyncOpenAI.instances) == 1
+    assert _FakeAsyncOpenAI.instances[0].closed
+
+
+def test_close_waits_for_background_tasks(adapter):
+    web_search = _FakeWebSearch()
+    research = ResearchOrchestrator(adapter, web_search)
+    research.plan(JUDGE_MESSAGES, KEYWORDS_MESSAGES)
+    assert web_search.background_done == []
+    research.close()
+    assert sorted(web_search.background_done) == ["a", "b"]
+
+
+def test_negative_decision_cancels_speculative_search(adapter):
+    web_search = _FakeWebSearch(delay=0.5)
+    with ResearchOrchestrator(adapter, web_search) as research:
+        loop = research._background.get_loop()
+        client = asyncio.run_coroutine_threadsafe(_client_for(adapter), loop).result()
+        client.decision = 0
+        client.judge_delay = 0.2
+        plan = research.plan(JUDGE_MESSAGES, KEYWORDS_MESSAGES)
+    assert not plan.needs_research
+    assert plan.cancelled_queries == 1
+    assert web_search.cancelled == ["a"]
+
+
+async def _client_for(adapter):
+    client, _ = adapter._async_state()
+    return client
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.chat import response_cache
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.response_cache import ResponseCache
+
+
+def _request(prompt, model="model-a", temperature=0):
+    return {"model": model, "messages": [{"role": "user", "content": prompt}], "temperature": temperature}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """response_cacheが参照する現在時刻を固定し、テストから進められるようにする"""
+    now = [1000.0]
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_key_ignores_dict_order_but_not_content():
+    request = _request("保険")
+    reordered = {"temperature": 0, "messages": request["messages"], "model": "model-a"}
+    assert ResponseCache.make_key(request) == ResponseCache.make_key(reordered)
+    assert ResponseCache.make_key(request) != ResponseCache.make_key(_request("保険", temperature=1))
+    assert ResponseCache.make_key(request) != ResponseCache.make_key(_request("保険", model="model-b"))
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(":memory:", ttl=60)
+    cache.set(_request("a"), "応答A")
+    cache.set(_request("b"), "応答B", ttl=10)
+    clock[0] += 10
+    assert cache.get(_request("b")) is None
+    assert cache.get(_request("a")) == "応答A"
+    clock[0] += 50
+    assert cache.get(_request("a")) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"], stats["size"]) == (1, 2, 2, 0)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(":memory:", max_entries=2)
+    cache.set(_request("a"), "A")
+    clock[0] += 1
+    cache.set(_request("b"), "B")
+    clock[0] += 1
+    assert cache.get(_request("a")) == "A"
+    clock[0] += 1
+    cache.set(_request("c"), "C")
+    assert cache.get(_request("b")) is None
+    assert cache.get(_request("a")) == "A"
+    assert cache.get(_request("c")) == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_removed_before_evicting(clock):
+    cache = ResponseCache(":memory:", max_entries=2)
+    cache.set(_request("old"), "old", ttl=1)
+    cache.set(_request("a"), "A")
+    clock[0] += 2
+    cache.set(_request("b"), "B")
+    assert cache.stats()["evictions"] == 0
+    assert cache.get(_request("a")) == "A"
+
+
+def test_non_string_responses_are_not_stored():
+    cache = ResponseCache(":memory:")
+    cache.set(_request("a"), None)
+    assert cache.get(_request("a")) is None
+    assert cache.stats()["writes"] == 0
+
+
+def test_delete_and_clear():
+    cache = ResponseCache(":memory:")
+    cache.set(_request("a"), "A")
+    cache.set(_request("b"), "B")
+    cache.delete(_request("a"))
+    assert cache.get(_request("a")) is None
+    cache.clear()
+    assert cache.stats()["size"] == 0
+
+
+def test_responses_survive_restart(tmp_path):
+    path = str(tmp_path / "cache" / "llm.sqlite3")
+    cache = ResponseCache(path)
+    cache.set(_request("a"), "応答A")
+    cache.close()
+    assert ResponseCache(path).get(_request("a")) == "応答A"
+
+
+def test_invalid_max_entries():
+    with pytest.raises(ValueError):
+        ResponseCache(":memory:", max_entries=0)
+
+
+@pytest.mark.parametrize("policy, temperature, cache, expected", [
+    ("auto", 0, None, True),
+    ("auto", 0.7, None, False),
+    ("auto", 0.7, True, True),
+    ("on", 1, None, True),
+    ("off", 0, None, False),
+    ("on", 0, False, False),
+])
+def test_adapter_cache_policy(monkeypatch, policy, temperature, cache, expected):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    adapter = OpenaiAdapter(response_cache=ResponseCache(":memory:"), cache_policy=policy)
+    assert (adapter._cache_for(temperature, cache) is not None) is expected
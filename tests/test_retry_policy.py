@@ -0,0 +1,111 @@
+import time
+from email.utils import formatdate
+
+import openai
+import pytest
+
+from src.chat.retry_policy import (
+    ChatError, RetryPolicy, classify_error, is_retryable, parse_duration, retry_after_seconds
+)
+from tests.test_chat_paths import _status_error
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1s", 1.0),
+    ("6m0s", 360.0),
+    ("1h2m3s", 3723.0),
+    ("20ms", 0.02),
+    ("1.5s", 1.5),
+    ("2", 2.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == (pytest.approx(expected) if expected is not None else None)
+
+
+def test_retry_after_prefers_milliseconds_then_seconds():
+    error = _status_error(429, {"retry-after-ms": "250", "retry-after": "5"})
+    assert retry_after_seconds(error) == 0.25
+    assert retry_after_seconds(_status_error(429, {"retry-after": "5"})) == 5.0
+
+
+def test_retry_after_http_date():
+    error = _status_error(503, {"retry-after": formatdate(time.time() + 30, usegmt=True)})
+    assert 28 <= retry_after_seconds(error) <= 30
+
+
+def test_retry_after_uses_exhausted_rate_limit_reset():
+    headers = {
+        "x-ratelimit-reset-requests": "1s",
+        "x-ratelimit-remaining-requests": "10",
+        "x-ratelimit-reset-tokens": "6m0s",
+        "x-ratelimit-remaining-tokens": "0",
+    }
+    assert retry_after_seconds(_status_error(429, headers)) == 360.0
+    headers["x-ratelimit-remaining-tokens"] = "100"
+    # 残りが0の制限がない場合は、最も早く回復する制限を待つ
+    assert retry_after_seconds(_status_error(429, headers)) == 1.0
+
+
+def test_retry_after_without_headers():
+    assert retry_after_seconds(_status_error(500)) is None
+    assert retry_after_seconds(ValueError("no response")) is None
+
+
+def test_backoff_doubles_up_to_max_delay():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0, seed=0)
+    for attempt, ceiling in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 4.0), (8, 4.0)]:
+        delays = [policy.delay_for(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        # Full Jitter: 上限の近くまで分布する
+        assert max(delays) > ceiling * 0.8
+
+
+def test_retry_after_overrides_backoff_and_is_capped():
+    policy = RetryPolicy(base_delay=0.5, max_delay=1.0, max_retry_after=10.0, seed=0)
+    delay = policy.delay_for(1, _status_error(429, {"retry-after": "3"}))
+    assert 3.0 <= delay <= 3.5
+    delay = policy.delay_for(1, _status_error(429, {"retry-after": "600"}))
+    assert 10.0 <= delay <= 10.5
+
+
+def test_seeded_policies_repeat_delays():
+    first = RetryPolicy(seed=42)
+    second = RetryPolicy(seed=42)
+    assert [first.delay_for(n) for n in range(1, 5)] == [second.delay_for(n) for n in range(1, 5)]
+
+
+def test_invalid_max_attempts():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+
+
+@pytest.mark.parametrize("error, kind, retryable", [
+    (_status_error(429), "rate_limit", True),
+    (_status_error(429, body={"code": "insufficient_quota"}), "quota", False),
+    (_status_error(500), "server", True),
+    (_status_error(503), "server", True),
+    (_status_error(408), "timeout", True),
+    (_status_error(401), "auth", False),
+    (_status_error(400), "bad_request", False),
+    (openai.APIConnectionError(request=None), "connection", True),
+    (TimeoutError(), "timeout", True),
+    (ValueError("bug"), "unknown", False),
+])
+def test_classify_and_retryable(error, kind, retryable):
+    assert classify_error(error) == kind
+    assert is_retryable(error) is retryable
+    result = ChatError.from_exception(error, attempts=2)
+    assert not result
+    assert (result.kind, result.retryable, result.attempts) == (kind, retryable, 2)
+
+
+def test_should_retry_stops_at_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    error = _status_error(503)
+    assert policy.should_retry(error, 1)
+    assert policy.should_retry(error, 2)
+    assert not policy.should_retry(error, 3)
+    assert not policy.should_retry(_status_error(401), 1)
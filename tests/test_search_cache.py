@@ -0,0 +1,131 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.websearch import search_cache
+from src.websearch.search_cache import SearchCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """search_cacheが参照する現在時刻を固定し、テストから進められるようにする"""
+    now = [1000.0]
+    monkeypatch.setattr(search_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+class _Fetch:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def _wait_for(cache, name, count=1):
+    deadline = time.monotonic() + 2
+    while cache.stats()[name] < count:
+        assert time.monotonic() < deadline, cache.stats()
+        time.sleep(0.01)
+
+
+def test_hit_until_ttl_then_miss(clock):
+    cache = SearchCache(default_ttl=60, stale_ttl=0)
+    fetch = _Fetch(["v1"], ["v2"])
+    assert cache.get_or_fetch("保険", "google", {}, fetch) == ["v1"]
+    clock[0] += 59
+    assert cache.get_or_fetch("保険", "google", {}, fetch) == ["v1"]
+    clock[0] += 1
+    assert cache.get_or_fetch("保険", "google", {}, fetch) == ["v2"]
+    assert fetch.calls == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_key_normalizes_query_and_separates_engine_and_params():
+    cache = SearchCache()
+    assert cache.make_key("ＡＢＣ  保険", "google") == cache.make_key("abc 保険", "google", {})
+    assert cache.make_key("保険", "google") != cache.make_key("保険", "bing")
+    assert cache.make_key("保険", "google", {"max_results": 4}) != cache.make_key("保険", "google", {"max_results": 8})
+
+
+def test_ttl_uses_shortest_of_engine_and_query_class():
+    cache = SearchCache(default_ttl=3600, engine_ttls={"bing": 600},
+                        query_class_ttls={"time_sensitive": 300})
+    assert cache.ttl_for("保険 比較", "google") == 3600
+    assert cache.ttl_for("保険 比較", "bing") == 600
+    assert cache.ttl_for("今日の天気", "google") == 300
+    assert cache.ttl_for("保険 比較", ["google", "bing"]) == 600
+
+
+def test_stale_result_is_returned_while_refreshing(clock):
+    cache = SearchCache(default_ttl=60, stale_ttl=60)
+    assert cache.get_or_fetch("保険", "google", {}, _Fetch(["v1"])) == ["v1"]
+    clock[0] += 90
+
+    refresh = _Fetch(["v2"])
+    assert cache.get_or_fetch("保険", "google", {}, refresh) == ["v1"]
+    _wait_for(cache, "refreshes")
+    assert cache.get_or_fetch("保険", "google", {}, _Fetch()) == ["v2"]
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_stale_result_expires_after_grace_period(clock):
+    cache = SearchCache(default_ttl=60, stale_ttl=60)
+    cache.get_or_fetch("保険", "google", {}, _Fetch(["v1"]))
+    clock[0] += 120
+    assert cache.get_or_fetch("保険", "google", {}, _Fetch(["v2"])) == ["v2"]
+    assert cache.stats()["stale_hits"] == 0
+
+
+def test_failed_refresh_keeps_stale_value(clock):
+    cache = SearchCache(default_ttl=60, stale_ttl=60)
+    cache.get_or_fetch("保険", "google", {}, _Fetch(["v1"]))
+    clock[0] += 90
+    assert cache.get_or_fetch("保険", "google", {}, _Fetch(RuntimeError("API error"))) == ["v1"]
+    _wait_for(cache, "refresh_errors")
+    assert cache.get(cache.make_key("保険", "google", {})) == ("stale", ["v1"])
+
+
+def test_async_stale_refresh_runs_on_the_loop(clock):
+    cache = SearchCache(default_ttl=60, stale_ttl=60)
+
+    async def scenario():
+        async def fetch_v1():
+            return ["v1"]
+
+        async def fetch_v2():
+            return ["v2"]
+
+        assert await cache.aget_or_fetch("保険", "google", {}, fetch_v1) == ["v1"]
+        clock[0] += 90
+        assert await cache.aget_or_fetch("保険", "google", {}, fetch_v2) == ["v1"]
+        await asyncio.gather(*cache._refresh_tasks)
+        return await cache.aget_or_fetch("保険", "google", {}, fetch_v1)
+
+    assert asyncio.run(scenario()) == ["v2"]
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_lru_eviction():
+    cache = SearchCache(max_entries=2)
+    for name in ("a", "b"):
+        cache.set(name, [name], ttl=60)
+    cache.get("a")
+    cache.set("c", ["c"], ttl=60)
+    assert cache.get("b") == ("miss", None)
+    assert cache.get("a") == ("hit", ["a"])
+    assert cache.stats()["evictions"] == 1
+
+
+def test_persisted_results_survive_restart(tmp_path):
+    path = str(tmp_path / "cache" / "search.sqlite")
+    SearchCache(persist_path=path).set("key", [{"title": "保険"}], ttl=60)
+    assert SearchCache(persist_path=path).get("key") == ("hit", [{"title": "保険"}])
@@ -0,0 +1,162 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from src.websearch.rank_fusion import reciprocal_rank_fusion
+from src.websearch.search_cache import SearchCache
+from src.websearch.search_result import SearchResult
+from src.websearch.web_search import WebSearch
+
+RAW_RESULTS = [
+    {"title": "保険A", "link": "https://example.com/a", "snippet": "説明A", "source": "fake"},
+    {"title": "保険B", "link": "https://example.com/b", "snippet": "説明B", "source": "fake"},
+]
+
+
+def _web_search(**kwargs):
+    web_search = WebSearch(**kwargs)
+    web_search.register_engine("fake", lambda query, max_results=4, **options: [dict(r) for r in RAW_RESULTS])
+    return web_search
+
+
+def test_process_results_serialize_to_json():
+    web_search = _web_search()
+    results = web_search.process_results(web_search.search("保険", engine="fake"), "fake")
+    assert all(isinstance(result, SearchResult) for result in results)
+    assert json.loads(json.dumps(results, ensure_ascii=False)) == RAW_RESULTS
+
+
+def test_search_and_standardize_response_serializes_to_json():
+    response = _web_search().search_and_standardize("保険", engine="fake")
+    decoded = json.loads(json.dumps(response, ensure_ascii=False))
+    assert decoded["search_results"][0]["link"] == "https://example.com/a"
+
+
+def test_optional_fields_appear_only_when_set():
+    result = SearchResult(**RAW_RESULTS[0])
+    assert "relevance" not in result
+    assert result.relevance is None
+    scored = result.replace(relevance=0.5)
+    assert json.loads(json.dumps(scored))["relevance"] == 0.5
+    scored["relevance"] = None
+    assert "relevance" not in scored
+
+
+def test_fused_results_serialize_to_json():
+    fused = reciprocal_rank_fusion({
+        "fake": [SearchResult(**r) for r in RAW_RESULTS],
+        "other": [SearchResult(**RAW_RESULTS[1])],
+    })
+    decoded = json.loads(json.dumps(fused))
+    assert decoded[0]["link"] == "https://example.com/b"
+    assert decoded[0]["sources"] == ["fake", "other"]
+
+
+def test_attribute_and_mapping_access():
+    result = SearchResult(**RAW_RESULTS[0])
+    assert result.link == result["link"] == result.get("link")
+    result.title = "変更後"
+    assert result["title"] == "変更後"
+    with pytest.raises(AttributeError):
+        result.unknown = 1
+
+
+def test_callers_can_add_their_own_keys():
+    result = SearchResult(**RAW_RESULTS[0])
+    result["rank"] = 1
+    assert result.replace(title="別").to_dict()["rank"] == 1
+    assert pickle.loads(pickle.dumps(result))["rank"] == 1
+    assert json.loads(json.dumps(result))["rank"] == 1
+
+
+def test_plugin_results_keep_extra_keys():
+    web_search = WebSearch()
+    web_search.register_engine(
+        "plugin", lambda query, max_results=4, **options: [dict(RAW_RESULTS[0], published="2026-01-01")]
+    )
+    results = web_search.process_results(web_search.search("保険", engine="plugin"), "plugin")
+    assert isinstance(results[0], SearchResult)
+    assert results[0]["published"] == "2026-01-01"
+
+
+def test_copy_and_pickle_round_trip():
+    result = SearchResult(sources=["fake"], **RAW_RESULTS[0])
+    for restored in (copy.deepcopy(result), pickle.loads(pickle.dumps(result))):
+        assert isinstance(restored, SearchResult)
+        assert restored == result
+
+
+def test_search_cache_persists_search_results(tmp_path):
+    path = str(tmp_path / "search_cache.sqlite3")
+    _web_search(cache=SearchCache(persist_path=path)).search("保険", engine="fake")
+
+    reloaded = SearchCache(persist_path=path)
+    web_search = WebSearch(cache=reloaded)
+    web_search.register_engine("fake", lambda query, max_results=4, **options: pytest.fail("キャッシュを使用していません"))
+    assert [result["link"] for result in web_search.search("保険", engine="fake")] == [r["link"] for r in RAW_RESULTS]
+
+
+class _FakeScraper:
+    def scrape_and_save(self, url, **kwargs):
+        return {"url": url}
+
+
+class _ClosableEngine:
+    def __init__(self):
+        self.closed = False
+
+    def search(self, query, max_results=4, **options):
+        return [dict(r) for r in RAW_RESULTS]
+
+    def close(self):
+        self.closed = True
+
+
+def test_close_shuts_down_scrape_scheduler_and_engines():
+    engine = _ClosableEngine()
+    with _web_search() as web_search:
+        web_search.register_engine("closable", engine)
+        web_search.scraper = _FakeScraper()
+        response = web_search.search_and_standardize("保険", engine="fake", scrape_urls=True, pipelined=True)
+        assert response["scraped_data"] == {r["link"]: {"url": r["link"]} for r in RAW_RESULTS}
+        web_search.search("保険", engine="closable")
+        scheduler = web_search.scrape_scheduler
+    assert scheduler._executor._shutdown
+    assert web_search._scrape_scheduler is None
+    assert engine.closed
+
+
+def test_replacing_scraper_shuts_down_previous_scheduler():
+    web_search = _web_search()
+    web_search.scraper = _FakeScraper()
+    scheduler = web_search.scrape_scheduler
+    web_search.scraper = _FakeScraper()
+    assert scheduler._executor._shutdown
+    assert web_search.scrape_scheduler is not scheduler
+    web_search.close()
+
+
+def test_triage_does_not_mutate_cached_results():
+    cache = SearchCache()
+    web_search = _web_search(cache=cache)
+    options = {"top_k": 1, "save_json": False, "save_markdown": False}
+    web_search.scraper = _FakeScraper()
+    response = web_search.search_and_standardize("保険A", engine="fake", scrape_urls=True,
+                                                 scrape_options=options, pipelined=True)
+    assert list(response["scraped_data"]) == ["https://example.com/a"]
+    assert all("relevance" not in result for result in response["search_results"])
+    cached = web_search.search_and_standardize("保険A", engine="fake")["search_results"]
+    assert all("relevance" not in result for result in cached)
+    web_search.close()
+
+
+def test_triage_returns_scored_copies():
+    from src.websearch.relevance import triage_results
+    results = [SearchResult(**RAW_RESULTS[0]), dict(RAW_RESULTS[1])]
+    selected, snippets_only = triage_results("保険B 説明B", results, top_k=1)
+    assert not snippets_only
+    assert selected[0]["link"] == "https://example.com/b"
+    assert selected[0]["relevance"] > 0
+    assert results == RAW_RESULTS
@@ -0,0 +1,134 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.chat.openai_adapter import OpenaiAdapter
+from src.chat.output_specs import WEB_RESEARCH_JUDGE, WEB_RESEARCH_KEYWORDS
+from src.chat.response_cache import ResponseCache
+from src.chat.retry_policy import ChatError
+from src.chat.structured_output import (
+    OutputSpec, StructuredOutputError, extract_json, object_schema, validate_schema
+)
+
+SCHEMA = object_schema({
+    "name": {"type": "string"},
+    "age": {"type": ["integer", "null"]},
+    "tags": {"type": "array", "items": {"type": "string", "enum": ["a", "b"]}},
+})
+
+
+def test_validate_schema_accepts_matching_value():
+    validate_schema({"name": "山田", "age": None, "tags": ["a", "b"]}, SCHEMA)
+    validate_schema({"name": "山田", "age": 30, "tags": []}, SCHEMA)
+
+
+@pytest.mark.parametrize("value, message", [
+    ({"name": "山田", "age": 30}, r"\$\.tags がありません"),
+    ({"name": "山田", "age": 30, "tags": [], "extra": 1}, r"\$\.extra は定義されていない項目"),
+    ({"name": "山田", "age": True, "tags": []}, r"\$\.age は integer/null"),
+    ({"name": "山田", "age": 1.5, "tags": []}, r"\$\.age は integer/null"),
+    ({"name": "山田", "age": 30, "tags": ["a", "c"]}, r"\$\.tags\[1\] は \['a', 'b'\]"),
+    (["山田"], r"\$ は object"),
+])
+def test_validate_schema_reports_path(value, message):
+    with pytest.raises(StructuredOutputError, match=message):
+        validate_schema(value, SCHEMA)
+
+
+@pytest.mark.parametrize("text", [
+    '{"keywords": ["a"]}',
+    '<keywords>{"keywords": ["a"]}</keywords>',
+    '結果です。\n```json\n{"keywords": ["a"]}\n```',
+    '以下の通りです: {"keywords": ["a"]} 以上。',
+])
+def test_extract_json_candidates(text):
+    assert extract_json(text, tag="keywords") == {"keywords": ["a"]}
+
+
+@pytest.mark.parametrize("text", ["", "キーワードはありません", "{broken"])
+def test_extract_json_failure_keeps_text(text):
+    with pytest.raises(StructuredOutputError) as info:
+        extract_json(text)
+    assert info.value.text == text
+
+
+def test_parse_normalizes_and_transforms():
+    assert WEB_RESEARCH_KEYWORDS.parse('<keywords>["保険", "年金"]</keywords>') == ["保険", "年金"]
+    assert WEB_RESEARCH_JUDGE.parse('{"reasoning": "必要", "decision": "1"}') == {"reasoning": "必要", "decision": True}
+
+
+def test_parse_falls_back_to_legacy_tags():
+    text = "<reasoning>情報が古い</reasoning>\n<decision>0</decision>"
+    assert WEB_RESEARCH_JUDGE.parse(text) == {"reasoning": "情報が古い", "decision": False}
+
+
+def test_parse_error_keeps_original_text():
+    text = '{"reasoning": "理由", "decision": 2}'
+    with pytest.raises(StructuredOutputError) as info:
+        WEB_RESEARCH_JUDGE.parse(text)
+    assert info.value.text == text
+
+
+def test_response_format_modes():
+    spec = OutputSpec("person", SCHEMA)
+    strict = spec.response_format("json_schema")
+    assert strict["json_schema"] == {"name": "person", "strict": True, "schema": SCHEMA}
+    assert spec.response_format("json_object") == {"type": "json_object"}
+    assert spec.response_format("prompt") is None
+    with pytest.raises(ValueError):
+        spec.response_format("xml")
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    adapter = OpenaiAdapter(response_cache=ResponseCache(":memory:"), cache_policy="on")
+    adapter.requests = []
+
+    def respond(*outputs):
+        outputs = list(outputs)
+
+        def create(**request):
+            adapter.requests.append(request)
+            usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15, prompt_tokens_details=None)
+            choice = SimpleNamespace(message=SimpleNamespace(content=outputs.pop(0)), finish_reason="stop")
+            return SimpleNamespace(choices=[choice], usage=usage)
+
+        adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    adapter.respond = respond
+    return adapter
+
+
+def test_repair_resends_only_this_call_with_error(adapter):
+    adapter.respond('{"reasoning": "理由"}', json.dumps({"reasoning": "理由", "decision": 1}))
+    result = adapter.openai_chat_structured(openai_model="model-a", spec=WEB_RESEARCH_JUDGE, prompt="判定してください",
+                                            max_repairs=1)
+    assert result == {"reasoning": "理由", "decision": True}
+
+    first, repair = adapter.requests
+    assert first["response_format"] == repair["response_format"]
+    assert repair["messages"][:len(first["messages"])] == first["messages"]
+    assistant, user = repair["messages"][len(first["messages"]):]
+    assert assistant == {"role": "assistant", "content": '{"reasoning": "理由"}'}
+    assert "decision がありません" in user["content"]
+    assert "JSONスキーマ" in user["content"]
+
+
+def test_unparsable_response_is_not_reused_from_cache(adapter):
+    adapter.respond("判定できません", "判定できません", json.dumps({"reasoning": "理由", "decision": 0}))
+    result = adapter.openai_chat_structured(openai_model="model-a", spec=WEB_RESEARCH_JUDGE, prompt="判定", max_repairs=1)
+    assert isinstance(result, ChatError)
+    assert (result.kind, result.attempts) == ("parse", 2)
+    assert len(adapter.requests) == 2
+
+    # 解析できなかった応答はキャッシュから削除され、同じ呼び出しで再び送信される
+    result = adapter.openai_chat_structured(openai_model="model-a", spec=WEB_RESEARCH_JUDGE, prompt="判定", max_repairs=0)
+    assert result == {"reasoning": "理由", "decision": False}
+    assert len(adapter.requests) == 3
+
+
+def test_spec_is_required(adapter):
+    with pytest.raises(ValueError):
+        adapter.openai_chat_structured(openai_model="model-a", prompt="判定")